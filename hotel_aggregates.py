@@ -0,0 +1,103 @@
+"""
+Totales de hoteles por estado, mantenidos con el flujo de cambios.
+
+``EstadoAggregates`` guarda, por estado, el número de hoteles, de
+habitaciones y de habitaciones disponibles. Se construye una vez a partir
+de la tabla de hoteles (``rebuild``) y después se actualiza en O(1) con
+cada ``ChangeEvent`` de la tabla ``Hotels`` (``apply``), así que consultar
+los totales no vuelve a leer Hotels.json.
+
+Los totales reflejan los cambios publicados por este proceso; los cambios
+de una ``Session`` se aplican cuando la sesión se escribe. Si otro proceso
+modifica las tablas, ``rebuild`` vuelve a calcularlos desde cero. Cada
+objeto corresponde a las tablas de un directorio (``directory``).
+"""
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+from hotel_changes import ChangeEvent
+
+_FIELDS = ('estado', 'habitaciones', 'habitaciones_disponibles')
+
+
+class EstadoAggregates:
+    """Hoteles, habitaciones y habitaciones disponibles por estado.
+
+    Attributes:
+        directory: Directorio de la tabla de hoteles (None si no se
+            indicó).
+    """
+
+    def __init__(self, directory: Optional[Path] = None):
+        self.directory = None if directory is None else Path(directory)
+        self._totals: Dict[str, Dict[str, int]] = {}
+        self._hotels: Dict[int, Tuple[str, int, int]] = {}
+        self._lock = threading.Lock()
+
+    def rebuild(self, hotels: Iterable[Dict]) -> None:
+        """Recalcula los totales desde los registros de hoteles."""
+        with self._lock:
+            self._totals = {}
+            self._hotels = {}
+            for hotel in hotels:
+                if isinstance(hotel, dict) and 'id' in hotel:
+                    self._add(hotel['id'], hotel)
+
+    def apply(self, event: ChangeEvent) -> None:
+        """Actualiza los totales con un cambio de la tabla ``Hotels``.
+
+        Los eventos de los contadores compartidos sólo traen
+        ``habitaciones_disponibles``; el resto se toma de lo ya conocido
+        del hotel.
+        """
+        if event.table != "Hotels":
+            return
+        with self._lock:
+            known = self._remove(event.id)
+            if event.after is None:
+                return
+            hotel = dict(zip(_FIELDS, known)) if known else {}
+            hotel.update(event.after)
+            if 'estado' in hotel:
+                self._add(event.id, hotel)
+
+    def totals(self, estado: Optional[str] = None) -> Dict:
+        """Devuelve los totales.
+
+        Args:
+            estado: Estado a consultar (None para todos).
+
+        Returns:
+            Dict: ``{hoteles, habitaciones, disponibles}`` del estado, o
+            ``{estado: {...}}`` para todos.
+        """
+        with self._lock:
+            if estado is not None:
+                return dict(self._totals.get(
+                    estado,
+                    {'hoteles': 0, 'habitaciones': 0, 'disponibles': 0}))
+            return {name: dict(total)
+                    for name, total in sorted(self._totals.items())}
+
+    def _add(self, hotel_id: int, hotel: Dict) -> None:
+        entry = (hotel.get('estado'), hotel.get('habitaciones', 0),
+                 hotel.get('habitaciones_disponibles', 0))
+        self._hotels[hotel_id] = entry
+        total = self._totals.setdefault(
+            entry[0], {'hoteles': 0, 'habitaciones': 0, 'disponibles': 0})
+        total['hoteles'] += 1
+        total['habitaciones'] += entry[1]
+        total['disponibles'] += entry[2]
+
+    def _remove(self, hotel_id: int) -> Optional[Tuple[str, int, int]]:
+        entry = self._hotels.pop(hotel_id, None)
+        if entry is None:
+            return None
+        total = self._totals[entry[0]]
+        total['hoteles'] -= 1
+        total['habitaciones'] -= entry[1]
+        total['disponibles'] -= entry[2]
+        if not total['hoteles']:
+            del self._totals[entry[0]]
+        return entry
@@ -0,0 +1,291 @@
+"""
+Contadores de disponibilidad de hoteles en memoria compartida.
+
+Varios procesos pueden compartir un segmento de
+``multiprocessing.shared_memory`` con las habitaciones disponibles de cada
+hotel. Con ``Hotel.availability`` asignado, ``Hotel.reserve_room`` y
+``Hotel.cancel_reservation`` sólo modifican el contador (protegido por un
+candado entre procesos) en lugar de leer y reescribir ``Hotels.json``; los
+contadores modificados se guardan en el archivo de forma asíncrona con
+``start()`` o explícitamente con ``persist()``. Mientras los contadores
+estén activos son la fuente de verdad de ``habitaciones_disponibles`` y el
+archivo puede ir atrasado; ``close()`` guarda todos los valores.
+
+Cada hotel ocupa una posición fija (su id) en el segmento; los hoteles con
+id mayor que la capacidad siguen usando el archivo.
+
+Uso:
+    counters = AvailabilityCounters.create()   # carga Hotels.json
+    Hotel.availability = counters
+    counters.start(interval=0.5)
+    # En cada proceso hijo:
+    Hotel.availability = AvailabilityCounters.attach(*counters.handle())
+    ...
+    counters.close()
+    counters.unlink()
+"""
+import multiprocessing
+import struct
+import threading
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+from hotel_reservation import Hotel, bulk_update, load_table
+
+_HEADER = struct.Struct('q')
+_SLOT = struct.Struct('qqq')
+_KNOWN = 1
+_PENDING = 2
+
+
+class AvailabilityCounters:
+    """Disponibilidad por hotel en un segmento de memoria compartida.
+
+    Cada posición guarda ``(disponibles, habitaciones, banderas)``.
+
+    Attributes:
+        capacity: Número de posiciones (ids de hotel de 0 a capacity - 1).
+    """
+
+    def __init__(self, memory: shared_memory.SharedMemory, lock,
+                 persist_lock):
+        self._memory = memory
+        self._lock = lock
+        self._persist_lock = persist_lock
+        self.capacity = _HEADER.unpack_from(memory.buf, 0)[0]
+        self._stop = threading.Event()
+        self._persister: Optional[threading.Thread] = None
+
+    @classmethod
+    def create(cls, hotels: Optional[List[Dict]] = None,
+               capacity: Optional[int] = None) -> 'AvailabilityCounters':
+        """Crea el segmento y lo llena con los hoteles indicados.
+
+        Args:
+            hotels: Registros de hoteles; por defecto la tabla actual.
+            capacity: Posiciones a reservar; por defecto el doble del
+                mayor id más 1024.
+
+        Returns:
+            AvailabilityCounters: Contadores listos para compartir.
+        """
+        hotels = load_table(Hotel) if hotels is None else hotels
+        ids = [hotel.get('id') for hotel in hotels
+               if isinstance(hotel, dict) and isinstance(hotel.get('id'),
+                                                         int)]
+        capacity = capacity or max(ids, default=0) * 2 + 1024
+        memory = shared_memory.SharedMemory(
+            create=True, size=_HEADER.size + _SLOT.size * capacity)
+        _HEADER.pack_into(memory.buf, 0, capacity)
+        counters = cls(memory, multiprocessing.Lock(), multiprocessing.Lock())
+        counters.load(hotels)
+        return counters
+
+    @classmethod
+    def attach(cls, name: str, lock, persist_lock) -> 'AvailabilityCounters':
+        """Se conecta a un segmento creado por otro proceso.
+
+        Los argumentos son los que devuelve ``handle()``; los candados
+        sólo se pueden pasar al crear el proceso (por ejemplo en el
+        ``initializer`` de un pool).
+        """
+        return cls(shared_memory.SharedMemory(name=name), lock,
+                   persist_lock)
+
+    def handle(self) -> Tuple:
+        """Devuelve lo necesario para ``attach`` en otro proceso."""
+        return self._memory.name, self._lock, self._persist_lock
+
+    def _offset(self, hotel_id) -> Optional[int]:
+        if not isinstance(hotel_id, int) or not (
+                0 <= hotel_id < self.capacity):
+            return None
+        return _HEADER.size + hotel_id * _SLOT.size
+
+    def _read(self, offset: int) -> Tuple[int, int, int]:
+        return _SLOT.unpack_from(self._memory.buf, offset)
+
+    def _write(self, offset: int, available: int, total: int,
+               flags: int) -> None:
+        _SLOT.pack_into(self._memory.buf, offset, available, total, flags)
+
+    def load(self, hotels: List[Dict]) -> int:
+        """Copia a los contadores la disponibilidad de los registros.
+
+        Returns:
+            int: Hoteles cargados.
+        """
+        loaded = 0
+        with self._lock:
+            for hotel in hotels:
+                if not isinstance(hotel, dict):
+                    continue
+                offset = self._offset(hotel.get('id'))
+                if offset is None:
+                    continue
+                self._write(offset, hotel.get('habitaciones_disponibles', 0),
+                            hotel.get('habitaciones', 0), _KNOWN)
+                loaded += 1
+        return loaded
+
+    def set(self, hotel_id: int, available: int, total: int) -> bool:
+        """Registra (o reemplaza) el contador de un hotel ya guardado.
+
+        Returns:
+            bool: False si el id no cabe en el segmento.
+        """
+        offset = self._offset(hotel_id)
+        if offset is None:
+            return False
+        with self._lock:
+            self._write(offset, available, total, _KNOWN)
+        return True
+
+    def forget(self, hotel_id: int) -> None:
+        """Quita un hotel de los contadores (p. ej. al eliminarlo)."""
+        offset = self._offset(hotel_id)
+        if offset is not None:
+            with self._lock:
+                self._write(offset, 0, 0, 0)
+
+    def get(self, hotel_id) -> Optional[Tuple[int, int]]:
+        """Devuelve ``(disponibles, habitaciones)`` o None si no se conoce."""
+        offset = self._offset(hotel_id)
+        if offset is None:
+            return None
+        available, total, flags = self._read(offset)
+        return (available, total) if flags & _KNOWN else None
+
+    def reserve(self, hotel_id: int) -> Optional[bool]:
+        """Descuenta una habitación de forma atómica.
+
+        Returns:
+            Optional[bool]: True si se descontó, False si no hay
+            habitaciones y None si el hotel no está en los contadores.
+        """
+        offset = self._offset(hotel_id)
+        if offset is None:
+            return None
+        with self._lock:
+            available, total, flags = self._read(offset)
+            if not flags & _KNOWN:
+                return None
+            if available <= 0:
+                return False
+            self._write(offset, available - 1, total, flags | _PENDING)
+        return True
+
+    def release(self, hotel_id: int) -> Optional[bool]:
+        """Devuelve una habitación de forma atómica.
+
+        Returns:
+            Optional[bool]: True si se liberó, False si no había
+            habitaciones ocupadas y None si el hotel no se conoce.
+        """
+        offset = self._offset(hotel_id)
+        if offset is None:
+            return None
+        with self._lock:
+            available, total, flags = self._read(offset)
+            if not flags & _KNOWN:
+                return None
+            if available >= total:
+                return False
+            self._write(offset, available + 1, total, flags | _PENDING)
+        return True
+
+    def resize(self, hotel_id: int, total: int) -> Optional[int]:
+        """Cambia las habitaciones de un hotel conservando las ocupadas.
+
+        Returns:
+            Optional[int]: Nuevas habitaciones disponibles, o None si el
+            hotel no se conoce.
+        """
+        offset = self._offset(hotel_id)
+        if offset is None:
+            return None
+        with self._lock:
+            available, old_total, flags = self._read(offset)
+            if not flags & _KNOWN:
+                return None
+            available = total - (old_total - available)
+            self._write(offset, available, total, flags)
+        return available
+
+    def _collect(self, everything: bool) -> Dict[int, Dict]:
+        changes = {}
+        with self._lock:
+            for hotel_id in range(self.capacity):
+                offset = _HEADER.size + hotel_id * _SLOT.size
+                available, total, flags = self._read(offset)
+                if flags & _KNOWN and (everything or flags & _PENDING):
+                    changes[hotel_id] = {'habitaciones_disponibles':
+                                         available}
+                    self._write(offset, available, total, _KNOWN)
+        return changes
+
+    def _restore(self, hotel_ids) -> None:
+        """Vuelve a marcar como pendientes contadores que no se guardaron."""
+        with self._lock:
+            for hotel_id in hotel_ids:
+                offset = _HEADER.size + hotel_id * _SLOT.size
+                available, total, flags = self._read(offset)
+                if flags & _KNOWN:
+                    self._write(offset, available, total, flags | _PENDING)
+
+    def persist(self, everything: bool = False) -> int:
+        """Guarda en Hotels.json los contadores modificados.
+
+        Un solo proceso escribe a la vez, y los valores se leen después
+        de tomar el candado, así que el archivo termina con el valor más
+        reciente aunque varios procesos guarden al mismo tiempo. Si la
+        escritura falla, los contadores siguen pendientes y se guardan
+        en el siguiente intento.
+
+        Args:
+            everything: Si se guardan todos los contadores y no sólo los
+                modificados desde el último guardado.
+
+        Returns:
+            int: Hoteles actualizados en el archivo.
+        """
+        with self._persist_lock:
+            changes = self._collect(everything)
+            if not changes:
+                return 0
+            updated = bulk_update(Hotel, changes)
+            if not updated:
+                self._restore(changes)
+            return updated
+
+    def _run(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            self.persist()
+
+    def start(self, interval: float = 0.5) -> None:
+        """Inicia el guardado asíncrono cada ``interval`` segundos."""
+        if self._persister is not None:
+            return
+        self._stop.clear()
+        self._persister = threading.Thread(
+            target=self._run, args=(interval,), name="availability-persist",
+            daemon=True)
+        self._persister.start()
+
+    def stop(self) -> None:
+        """Detiene el guardado asíncrono y guarda lo pendiente."""
+        if self._persister is not None:
+            self._stop.set()
+            self._persister.join()
+            self._persister = None
+        self.persist()
+
+    def close(self) -> None:
+        """Guarda todos los contadores y se desconecta del segmento."""
+        self.stop()
+        self.persist(everything=True)
+        self._memory.close()
+
+    def unlink(self) -> None:
+        """Libera el segmento; sólo lo debe llamar el proceso creador."""
+        self._memory.unlink()
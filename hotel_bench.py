@@ -0,0 +1,497 @@
+"""
+Pruebas de rendimiento del Sistema de Gestión de Hoteles.
+
+Uso:
+    python hotel_bench.py durability [--operations N] [--group-commit-ms N]
+                                     [--writers N]
+    python hotel_bench.py server [--operations N]
+    python hotel_bench.py search [--records N] [--queries N]
+    python hotel_bench.py startup [--reservations N] [--tail N]
+    python hotel_bench.py memory [--customers N] [--lookups N] [--cache N]
+    python hotel_bench.py unknown [--customers N] [--requests N]
+"""
+import argparse
+import contextlib
+import http.client
+import io
+import json
+import random
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List
+
+import hotel_bloom
+import hotel_metrics
+import hotel_records
+import hotel_storage
+from hotel_checkpoint import recover, write_checkpoint
+from hotel_durability import (DURABILITY_LEVELS, append_durable,
+                              atomic_write, background_fsyncs,
+                              get_durability, set_durability)
+from hotel_reservation import Customer, Hotel, Reservation, Session
+from hotel_search import TrigramIndex
+from hotel_server import make_server
+
+FIRST_NAMES = (
+    "Ana Luis María José Carlos Lucía Sofía Jorge Elena Pedro Fernanda "
+    "Ricardo Valeria Diego Camila Andrés Paola Héctor Gabriela Rodrigo "
+    "Juan Miguel Alejandro Daniel Fernando Javier Roberto Guadalupe "
+    "Patricia Verónica Rosa Adriana Mónica Claudia Ximena Renata Regina "
+    "Mariana Santiago Mateo").split()
+LAST_NAMES = (
+    "Hernández García Martínez López González Rodríguez Pérez Sánchez "
+    "Ramírez Cruz Flores Gómez Morales Vázquez Reyes Jiménez Torres Díaz "
+    "Gutiérrez Ruiz Mendoza Aguilar Ortiz Moreno Castillo Romero Álvarez "
+    "Méndez Chávez Rivera Juárez Ramos Domínguez Herrera Medina Castro "
+    "Vargas Guzmán Velázquez Muñoz Rojas Contreras Salazar Luna Ortega "
+    "Estrada Bautista Cortés Soto Alvarado Espinoza Lara Ávila Ríos "
+    "Cervantes Silva Delgado Vega Zúñiga Castañeda").split()
+
+
+@contextlib.contextmanager
+def bench_directory():
+    """Dirige las tablas a un directorio temporal durante la prueba."""
+    previous = (Hotel.output_dir, Customer.output_dir,
+                Reservation.output_dir)
+    directory = Path(tempfile.mkdtemp(prefix="hotel-bench-"))
+    Hotel.output_dir = Customer.output_dir = directory
+    Reservation.output_dir = directory
+    try:
+        yield directory
+    finally:
+        (Hotel.output_dir, Customer.output_dir,
+         Reservation.output_dir) = previous
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _single_writer(level: str, operations: int) -> Dict:
+    with bench_directory(), contextlib.redirect_stdout(io.StringIO()):
+        hotel = Hotel("Bench", "Puebla", operations)
+        hotel.create()
+        hotel_metrics.reset_stats()
+        background = background_fsyncs()
+        start = time.perf_counter()
+        for customer_id in range(operations):
+            hotel.reserve_room(customer_id)
+        elapsed = time.perf_counter() - start
+        background = background_fsyncs() - background
+    op_stats = hotel_metrics.stats()['Hotel.reserve_room']
+    return {
+        'level': level, 'writers': 1,
+        'ops_per_second': operations / elapsed if elapsed else 0.0,
+        'p50_ms': op_stats['latency']['p50'] * 1000,
+        'p99_ms': op_stats['latency']['p99'] * 1000,
+        'fsyncs': op_stats['io']['total']['fsyncs'] + background,
+    }
+
+
+def _multi_writer(level: str, operations: int, writers: int) -> Dict:
+    histograms: List[hotel_metrics.Histogram] = []
+    fsyncs = []
+    with bench_directory() as directory:
+        background = background_fsyncs()
+
+        def write(number: int) -> None:
+            table = directory / f"Tabla{number}.json"
+            latencies = hotel_metrics.Histogram()
+            total = 0
+            for seq in range(operations // writers):
+                start = time.perf_counter()
+                total += atomic_write(table, b"[]")
+                total += append_durable(directory / "Changes.jsonl",
+                                        f'{{"seq": {seq}}}\n'.encode())
+                latencies.observe(time.perf_counter() - start)
+            histograms.append(latencies)
+            fsyncs.append(total)
+        threads = [threading.Thread(target=write, args=(number,))
+                   for number in range(writers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        background = background_fsyncs() - background
+    latencies = hotel_metrics.Histogram()
+    for histogram in histograms:
+        latencies.merge(histogram)
+    done = operations // writers * writers
+    return {
+        'level': level, 'writers': writers,
+        'ops_per_second': done / elapsed if elapsed else 0.0,
+        'p50_ms': latencies.percentile(0.5) * 1000,
+        'p99_ms': latencies.percentile(0.99) * 1000,
+        'fsyncs': sum(fsyncs) + background,
+    }
+
+
+def bench_durability(operations: int = 200, group_commit_ms: float = 10.0,
+                     writers: int = 4) -> List[Dict]:
+    """Mide las escrituras con cada nivel de durabilidad.
+
+    Con un escritor se mide ``Hotel.reserve_room``. Con varios, cada hilo
+    hace por operación las mismas escrituras que una reservación (reescribe
+    su propio archivo de tabla y agrega una línea al registro de cambios
+    compartido), porque los métodos de las tablas no se llaman desde
+    varios hilos de un proceso.
+
+    Args:
+        operations: Operaciones por nivel y número de escritores.
+        group_commit_ms: Espera máxima de un ciclo de ``group-commit``.
+        writers: Hilos de la fila con varios escritores.
+
+    Returns:
+        List[Dict]: Dos filas por nivel (un escritor y ``writers``) con
+        operaciones/s, p50, p99 y fsyncs, incluidos los del hilo de
+        ``group-commit``.
+    """
+    previous = get_durability()
+    results = []
+    try:
+        for level in DURABILITY_LEVELS:
+            set_durability(level, group_commit_ms)
+            results.append(_single_writer(level, operations))
+            results.append(_multi_writer(level, operations, writers))
+    finally:
+        set_durability(previous, group_commit_ms)
+    return results
+
+
+def _seed(rooms: int) -> None:
+    with contextlib.redirect_stdout(io.StringIO()):
+        Hotel("Bench", "Puebla", rooms).create()
+        Customer("Bench", "bench@email.com", "2220000000").create()
+
+
+def bench_server(operations: int = 500) -> Dict:
+    """Compara reservaciones por la biblioteca contra el servicio HTTP.
+
+    La ruta de biblioteca lee y escribe los archivos en cada llamada; la
+    ruta HTTP usa una sola conexión keep-alive contra el motor en memoria.
+
+    Args:
+        operations: Reservaciones a crear por cada ruta.
+
+    Returns:
+        Dict: Operaciones por segundo de ``library`` y ``http``.
+    """
+    results = {}
+    with bench_directory():
+        _seed(operations)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(operations):
+                Reservation(1, 1).create()
+        results['library'] = operations / (time.perf_counter() - start)
+
+    with bench_directory():
+        _seed(operations)
+        server = make_server(port=0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            connection = http.client.HTTPConnection(
+                "127.0.0.1", server.server_address[1])
+            body = json.dumps({'customer_id': 1,
+                               'hotel_id': 1}).encode('utf-8')
+            headers = {'Content-Type': 'application/json'}
+            start = time.perf_counter()
+            for _ in range(operations):
+                connection.request("POST", "/reservations", body, headers)
+                connection.getresponse().read()
+            results['http'] = operations / (time.perf_counter() - start)
+            connection.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+    return results
+
+
+def _misspell(name: str, rng: random.Random) -> str:
+    """Quita, cambia o corta una letra del nombre."""
+    position = rng.randrange(1, len(name))
+    change = rng.choice(("quitar", "cambiar", "cortar"))
+    if change == "quitar":
+        return name[:position] + name[position + 1:]
+    if change == "cambiar":
+        return name[:position] + "x" + name[position + 1:]
+    return name[:max(position, 3)]
+
+
+def bench_search(records: int = 1000000, queries: int = 200) -> Dict:
+    """Mide el índice de trigramas con nombres sintéticos.
+
+    Los nombres combinan un nombre y dos apellidos comunes; las consultas
+    son nombres completos o parciales con una letra de menos, cambiada o
+    cortada.
+
+    Args:
+        records: Registros indexados.
+        queries: Búsquedas a medir.
+
+    Returns:
+        Dict: Segundos de construcción y p50/p99 de búsqueda en ms.
+    """
+    rng = random.Random(0)
+    index = TrigramIndex("Customers")
+    start = time.perf_counter()
+    for record_id in range(1, records + 1):
+        index.add(record_id, f"{rng.choice(FIRST_NAMES)} "
+                             f"{rng.choice(LAST_NAMES)} "
+                             f"{rng.choice(LAST_NAMES)}")
+    build = time.perf_counter() - start
+    latency = hotel_metrics.Histogram()
+    for _ in range(queries):
+        words = [rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)]
+        text = " ".join(_misspell(word, rng) if rng.random() < 0.5
+                        else word for word in words)
+        start = time.perf_counter()
+        index.search(text, 10)
+        latency.observe(time.perf_counter() - start)
+    return {'build_s': build, 'vocabulary': index.vocabulary,
+            'p50_ms': latency.percentile(0.5) * 1000,
+            'p99_ms': latency.percentile(0.99) * 1000}
+
+
+def _cold_start(directory: Path, use_checkpoint: bool) -> float:
+    """Segundos para tener las tres tablas decodificadas en memoria."""
+    hotel_storage.invalidate()
+    start = time.perf_counter()
+    if use_checkpoint:
+        recover(directory)
+    for table in ("Hotels", "Customers", "Reservations"):
+        hotel_storage.read_shared(directory / f"{table}.json")
+    return time.perf_counter() - start
+
+
+def bench_startup(reservations: int = 1000000, tail: int = 1000,
+                  target: float = 1.0) -> Dict:
+    """Compara el arranque desde el JSON contra checkpoint y cambios.
+
+    Escribe ``reservations`` reservaciones, un checkpoint y después
+    ``tail`` reservaciones más que sólo el registro de cambios tiene
+    además de la tabla.
+
+    Args:
+        reservations: Reservaciones en el checkpoint.
+        tail: Reservaciones posteriores al checkpoint.
+        target: Segundos objetivo del arranque con checkpoint.
+
+    Returns:
+        Dict: Segundos de arranque de ``json`` y ``checkpoint``, y si se
+        cumplió el objetivo.
+    """
+    rng = random.Random(0)
+    with bench_directory() as directory:
+        _seed(tail)
+        hotel_storage.write_document(
+            directory / "Reservations.json",
+            [{'id': record_id, 'customer_id': rng.randint(1, 100000),
+              'hotel_id': rng.randint(1, 1000),
+              'habitacion': rng.randint(1, 300)}
+             for record_id in range(1, reservations + 1)])
+        write_checkpoint(directory)
+        with contextlib.redirect_stdout(io.StringIO()), Session():
+            for _ in range(tail):
+                Reservation(1, 1).create()
+        json_start = _cold_start(directory, use_checkpoint=False)
+        checkpoint_start = _cold_start(directory, use_checkpoint=True)
+    return {'json_s': json_start, 'checkpoint_s': checkpoint_start,
+            'target_met': checkpoint_start <= target}
+
+
+def _lookup_pass(ids: List[int]) -> Dict:
+    """Ejecuta ``display_info`` por cada id y mide memoria y latencia."""
+    latency = hotel_metrics.Histogram()
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for record_id in ids:
+            start = time.perf_counter()
+            Customer("", "", "", customer_id=record_id).display_info()
+            latency.observe(time.perf_counter() - start)
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    stats = hotel_records.cache_stats()
+    return {'retained_mb': retained / 1e6,
+            'p50_ms': latency.percentile(0.5) * 1000,
+            'hit_rate': next(iter(stats.values()))['hit_rate']
+            if stats else None}
+
+
+def bench_memory(customers: int = 1000000, lookups: int = 50000,
+                 cache: int = 10000) -> List[Dict]:
+    """Compara la memoria de leer clientes con y sin caché acotado.
+
+    Las consultas siguen una distribución sesgada (el 80% va al 1% de
+    los clientes) para que el caché LRU tenga aciertos.
+
+    Args:
+        customers: Clientes en la tabla.
+        lookups: ``display_info`` a medir.
+        cache: Registros del caché LRU en el modo acotado.
+
+    Returns:
+        List[Dict]: Por modo, MB retenidos tras las consultas, p50 en ms
+        y tasa de aciertos.
+    """
+    rng = random.Random(0)
+    hot = max(1, customers // 100)
+    ids = [rng.randint(1, hot) if rng.random() < 0.8
+           else rng.randint(1, customers) for _ in range(lookups)]
+    results = []
+    with bench_directory() as directory:
+        hotel_storage.write_document(
+            directory / "Customers.json",
+            [{'id': record_id,
+              'nombre': f"{rng.choice(FIRST_NAMES)} "
+                        f"{rng.choice(LAST_NAMES)}",
+              'email': f"cliente{record_id}@email.com",
+              'telefono': "2220000000"}
+             for record_id in range(1, customers + 1)])
+        previous = Customer.record_cache_size
+        try:
+            for mode, size in (("tabla completa", None), ("acotado", cache)):
+                hotel_storage.invalidate()
+                hotel_records.reset()
+                Customer.record_cache_size = size
+                results.append({'mode': mode, **_lookup_pass(ids)})
+        finally:
+            Customer.record_cache_size = previous
+            hotel_records.reset()
+            hotel_storage.invalidate()
+    return results
+
+
+def bench_unknown(customers: int = 1000000,
+                  requests: int = 1000) -> List[Dict]:
+    """Compara reservar con clientes inexistentes con y sin filtro de ids.
+
+    Antes de cada reservación se descarta el caché de documentos, como
+    cuando otro proceso escribió la tabla o el proceso acaba de arrancar.
+
+    Args:
+        customers: Clientes en la tabla.
+        requests: ``Reservation.create`` con ids inexistentes.
+
+    Returns:
+        List[Dict]: Por modo, p50 en ms y MB leídos por reservación.
+    """
+    rng = random.Random(0)
+    results = []
+    with bench_directory() as directory:
+        hotel_storage.write_document(
+            directory / "Customers.json",
+            [{'id': record_id, 'nombre': f"Cliente {record_id}",
+              'email': f"cliente{record_id}@email.com",
+              'telefono': "2220000000"}
+             for record_id in range(1, customers + 1)])
+        previous = Customer.bloom_error_rate
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                Hotel("Hotel", "Puebla", 10).create()
+            for mode, error_rate in (("sin filtro", None),
+                                     ("filtro", previous or 0.01)):
+                hotel_bloom.reset()
+                Customer.bloom_error_rate = error_rate
+                with contextlib.redirect_stdout(io.StringIO()):
+                    Customer("", "", "", customer_id=1).display_info()
+                hotel_metrics.reset_stats()
+                latency = hotel_metrics.Histogram()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    for _ in range(requests):
+                        customer_id = rng.randint(customers + 1,
+                                                  2 * customers)
+                        hotel_storage.invalidate()
+                        start = time.perf_counter()
+                        Reservation(customer_id, 1).create()
+                        latency.observe(time.perf_counter() - start)
+                read = hotel_metrics.stats()['Reservation.create'][
+                    'io']['total']['bytes_read']
+                results.append({'mode': mode,
+                                'p50_ms': latency.percentile(0.5) * 1000,
+                                'mb_read': read / requests / 1e6})
+        finally:
+            Customer.bloom_error_rate = previous
+            hotel_bloom.reset()
+            hotel_storage.invalidate()
+    return results
+
+
+def main(argv=None) -> int:
+    """Punto de entrada de la línea de comandos."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+    durability = commands.add_parser(
+        "durability", help="Compara los niveles de durabilidad.")
+    durability.add_argument("--operations", type=int, default=200)
+    durability.add_argument("--group-commit-ms", type=float, default=10.0)
+    durability.add_argument("--writers", type=int, default=4)
+    server = commands.add_parser(
+        "server", help="Compara la biblioteca contra el servicio HTTP.")
+    server.add_argument("--operations", type=int, default=500)
+    search = commands.add_parser(
+        "search", help="Mide la búsqueda por trigramas.")
+    search.add_argument("--records", type=int, default=1000000)
+    search.add_argument("--queries", type=int, default=200)
+    startup = commands.add_parser(
+        "startup", help="Mide el arranque con y sin checkpoint.")
+    startup.add_argument("--reservations", type=int, default=1000000)
+    startup.add_argument("--tail", type=int, default=1000)
+    startup.add_argument("--target", type=float, default=1.0)
+    memory = commands.add_parser(
+        "memory", help="Mide la memoria con el caché de registros.")
+    memory.add_argument("--customers", type=int, default=1000000)
+    memory.add_argument("--lookups", type=int, default=50000)
+    memory.add_argument("--cache", type=int, default=10000)
+    unknown = commands.add_parser(
+        "unknown", help="Mide reservar con clientes inexistentes.")
+    unknown.add_argument("--customers", type=int, default=1000000)
+    unknown.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    if args.command == "durability":
+        print(f"{'nivel':<18}{'hilos':>6}{'ops/s':>10}{'p50 ms':>10}"
+              f"{'p99 ms':>10}{'fsyncs':>8}")
+        for row in bench_durability(args.operations, args.group_commit_ms,
+                                    args.writers):
+            print(f"{row['level']:<18}{row['writers']:>6}"
+                  f"{row['ops_per_second']:>10.1f}"
+                  f"{row['p50_ms']:>10.3f}{row['p99_ms']:>10.3f}"
+                  f"{row['fsyncs']:>8}")
+    elif args.command == "server":
+        for path, rate in bench_server(args.operations).items():
+            print(f"{path:<10}{rate:>10.1f} reservaciones/s")
+    elif args.command == "search":
+        result = bench_search(args.records, args.queries)
+        print(f"{args.records} registros, {result['vocabulary']} palabras, "
+              f"índice en {result['build_s']:.1f} s")
+        print(f"búsqueda p50 {result['p50_ms']:.2f} ms, "
+              f"p99 {result['p99_ms']:.2f} ms")
+    elif args.command == "startup":
+        result = bench_startup(args.reservations, args.tail, args.target)
+        print(f"arranque desde el JSON: {result['json_s']:.2f} s")
+        print(f"arranque con checkpoint y {args.tail} cambios: "
+              f"{result['checkpoint_s']:.2f} s "
+              f"(objetivo {args.target:.2f} s: "
+              f"{'cumplido' if result['target_met'] else 'no cumplido'})")
+    elif args.command == "memory":
+        print(f"{'modo':<16}{'MB':>10}{'p50 ms':>10}{'aciertos':>10}")
+        for row in bench_memory(args.customers, args.lookups, args.cache):
+            hit_rate = ("-" if row['hit_rate'] is None
+                        else f"{row['hit_rate']:.1%}")
+            print(f"{row['mode']:<16}{row['retained_mb']:>10.1f}"
+                  f"{row['p50_ms']:>10.3f}{hit_rate:>10}")
+    elif args.command == "unknown":
+        print(f"{'modo':<12}{'p50 ms':>10}{'MB leídos':>12}")
+        for row in bench_unknown(args.customers, args.requests):
+            print(f"{row['mode']:<12}{row['p50_ms']:>10.3f}"
+                  f"{row['mb_read']:>12.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,252 @@
+"""
+Filtros de Bloom sobre los ids de los archivos de tablas.
+
+Un ``IdFilter`` responde si un id puede estar en un archivo de tabla sin
+leerlo. Si responde que no, el id seguro no existe; si responde que sí,
+hay que buscarlo, y con probabilidad ``error_rate`` no está. Así
+``Reservation.create`` rechaza un ``customer_id`` o ``hotel_id``
+inventado con un ``stat`` en lugar de decodificar Customers.json.
+
+El filtro se construye con los ids del archivo en la primera consulta y
+se vuelve a construir cuando el archivo cambia (inodo, fecha de
+modificación o tamaño), igual que el caché de ``hotel_storage``. Las
+escrituras propias no lo obligan a reconstruirse: quien agrega registros
+a un archivo anota sus ids con ``note_ids`` antes de escribirlo, y la
+escritura se hace dentro de ``writing``, que adopta la nueva firma del
+archivo si el filtro estaba al día. Los registros borrados siguen en el
+filtro hasta la siguiente reconstrucción, lo que sólo cuesta una
+búsqueda de más. Si se anotan más ids de los previstos, el filtro se
+reconstruye más grande en la siguiente consulta.
+"""
+import math
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Collection, Dict, Iterable, Optional, Set, Tuple
+
+from hotel_storage import file_signature
+
+# Capacidad mínima de un filtro: los archivos chicos crecen sin tener que
+# reconstruirlo a cada alta.
+MIN_CAPACITY = 1024
+
+_MASK = (1 << 64) - 1
+
+
+def _mix(value: int) -> int:
+    """Dispersa un entero en 64 bits (splitmix64).
+
+    Los ids son consecutivos; sin mezclarlos, caerían en bits contiguos.
+    """
+    value = (value + 0x9E3779B97F4A7C15) & _MASK
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK
+    return value ^ (value >> 31)
+
+
+class BloomFilter:
+    """Filtro de Bloom de enteros.
+
+    Las posiciones de cada entero salen de dos mitades de un solo hash
+    (``h1 + i * h2``), así que agregar o consultar cuesta un hash.
+
+    Attributes:
+        capacity: Enteros previstos; pasado ese número la tasa de falsos
+            positivos sube.
+        error_rate: Tasa de falsos positivos con ``capacity`` enteros.
+        size: Bits del filtro.
+        hashes: Posiciones por entero.
+        count: Enteros agregados.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate debe estar entre 0 y 1.")
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(
+            -self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def add(self, item: int) -> None:
+        """Agrega un entero."""
+        self.update((item,))
+
+    def update(self, items: Iterable[int]) -> None:
+        """Agrega varios enteros."""
+        bits, size, hashes = self._bits, self.size, self.hashes
+        for item in items:
+            mixed = _mix(item)
+            position, step = mixed & 0xFFFFFFFF, (mixed >> 32) | 1
+            for _ in range(hashes):
+                position %= size
+                bits[position >> 3] |= 1 << (position & 7)
+                position += step
+            self.count += 1
+
+    def __contains__(self, item: int) -> bool:
+        bits, size = self._bits, self.size
+        mixed = _mix(item)
+        position, step = mixed & 0xFFFFFFFF, (mixed >> 32) | 1
+        for _ in range(self.hashes):
+            position %= size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+            position += step
+        return True
+
+
+# El filtro guarda sus bits, parámetros y firma del archivo que indexa.
+class IdFilter:  # pylint: disable=too-many-instance-attributes
+    """Filtro de Bloom de los ids de un archivo de tabla.
+
+    Attributes:
+        path: Archivo de la tabla.
+        builds: Veces que se construyó el filtro leyendo la tabla.
+        rejected: Consultas respondidas con "no existe".
+        passed: Consultas que hubo que buscar en la tabla.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.builds = 0
+        self.rejected = 0
+        self.passed = 0
+        self._filter: Optional[BloomFilter] = None
+        self._signature: Optional[Tuple[int, int, int]] = None
+        # Ids anotados que quizá todavía no están en el archivo (p. ej.
+        # dentro de una sesión); se agregan también al reconstruir.
+        self._pending: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def might_contain(self, record_id,
+                      load_ids: Callable[[], Collection[int]],
+                      error_rate: float = 0.01) -> bool:
+        """Indica si el id puede estar en el archivo.
+
+        Args:
+            record_id: Id a consultar; si no es entero la respuesta es
+                siempre True.
+            load_ids: Devuelve los ids del archivo para construir el
+                filtro.
+            error_rate: Tasa de falsos positivos del filtro.
+
+        Returns:
+            bool: False sólo si el id seguro no está. Si el archivo no
+            existe o no se puede leer, True (la búsqueda normal reporta
+            el error).
+        """
+        if not isinstance(record_id, int) or isinstance(record_id, bool):
+            return True
+        with self._lock:
+            try:
+                self._refresh(load_ids, error_rate)
+            except (OSError, ValueError):
+                return True
+            if record_id in self._filter:
+                self.passed += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def note(self, record_ids: Iterable) -> None:
+        """Agrega ids que se van a escribir en el archivo."""
+        with self._lock:
+            for record_id in record_ids:
+                if (not isinstance(record_id, int)
+                        or isinstance(record_id, bool)):
+                    continue
+                self._pending.add(record_id)
+                if self._filter is not None:
+                    self._filter.add(record_id)
+
+    def written(self, before: Optional[Tuple[int, int, int]]) -> None:
+        """Registra una escritura propia del archivo.
+
+        Args:
+            before: Firma del archivo antes de escribirlo. Si coincide con
+                la del filtro, el filtro sigue al día con la nueva.
+        """
+        with self._lock:
+            if self._signature is not None and self._signature == before:
+                self._signature = file_signature(self.path, missing_ok=True)
+            self._pending.clear()
+
+    def stats(self) -> Dict:
+        """Tamaño del filtro y consultas rechazadas y buscadas."""
+        with self._lock:
+            bloom = self._filter
+            return {'ids': bloom.count if bloom else 0,
+                    'capacity': bloom.capacity if bloom else 0,
+                    'bytes': (bloom.size + 7) // 8 if bloom else 0,
+                    'builds': self.builds, 'rejected': self.rejected,
+                    'passed': self.passed}
+
+    def _refresh(self, load_ids: Callable[[], Collection[int]],
+                 error_rate: float) -> None:
+        signature = file_signature(self.path)
+        bloom = self._filter
+        if (bloom is not None and signature == self._signature
+                and bloom.error_rate == error_rate
+                and bloom.count <= bloom.capacity):
+            return
+        self._signature = None
+        ids = load_ids()
+        bloom = BloomFilter(max(2 * (len(ids) + len(self._pending)),
+                                MIN_CAPACITY), error_rate)
+        bloom.update(record_id for record_id in ids
+                     if isinstance(record_id, int))
+        bloom.update(self._pending)
+        self._filter = bloom
+        self._signature = signature
+        self.builds += 1
+
+
+_FILTERS: Dict[Path, IdFilter] = {}
+_FILTERS_LOCK = threading.Lock()
+
+
+def id_filter(file_path: Path) -> IdFilter:
+    """Devuelve el filtro de ids de un archivo de tabla."""
+    file_path = Path(file_path)
+    with _FILTERS_LOCK:
+        if file_path not in _FILTERS:
+            _FILTERS[file_path] = IdFilter(file_path)
+        return _FILTERS[file_path]
+
+
+def note_ids(file_path: Path, record_ids: Iterable) -> None:
+    """Anota en el filtro de un archivo los ids que se le agregan."""
+    id_filter(file_path).note(record_ids)
+
+
+@contextmanager
+def writing(file_path: Path):
+    """Envuelve una escritura propia de un archivo de tabla.
+
+    Si el filtro del archivo estaba al día antes de escribir, adopta la
+    firma nueva del archivo en lugar de reconstruirse.
+    """
+    file_path = Path(file_path)
+    before = file_signature(file_path, missing_ok=True)
+    yield
+    with _FILTERS_LOCK:
+        existing = _FILTERS.get(file_path)
+    if existing is not None:
+        existing.written(before)
+
+
+def filter_stats() -> Dict[str, Dict]:
+    """Métricas de los filtros de ids por archivo."""
+    with _FILTERS_LOCK:
+        filters = list(_FILTERS.items())
+    return {str(path): existing.stats() for path, existing in filters
+            if existing.builds}
+
+
+def reset() -> None:
+    """Olvida los filtros (se reconstruyen en la siguiente consulta)."""
+    with _FILTERS_LOCK:
+        _FILTERS.clear()
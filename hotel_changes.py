@@ -0,0 +1,297 @@
+"""
+Flujo de cambios (change data capture) de las tablas.
+
+Cada método que modifica datos publica un ``ChangeEvent`` con la tabla,
+la operación, el id y el registro antes y después del cambio. El evento
+se entrega a los suscriptores del proceso (``subscribe``) y se agrega a
+``Changes.jsonl`` en el directorio de las tablas con un número de
+secuencia creciente, de modo que un consumidor externo puede guardar el
+último ``seq`` que procesó y continuar desde ahí con ``read_changes``.
+Cada evento guarda también la firma del archivo de su tabla en ese
+momento, con la que ``hotel_checkpoint`` sabe si el archivo cambió
+después del último evento registrado.
+
+Dentro de una ``Session`` los eventos se publican cuando la sesión se
+escribe, con una sola escritura al registro, y se descartan si se
+revierte. Cada escritura toma un candado exclusivo (``fcntl.flock``)
+sobre ``Changes.jsonl`` y vuelve a leer el último ``seq`` del archivo,
+así que varios procesos escribiendo el mismo directorio no repiten
+números. En sistemas sin ``fcntl`` (Windows) la secuencia sólo es única
+dentro de cada proceso.
+
+Operaciones (``op``): ``create``, ``modify``, ``delete``, ``reserve`` y
+``release`` (habitaciones de un hotel) y ``cancel`` (reservaciones).
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from hotel_durability import append_durable
+from hotel_metrics import record_io
+from hotel_storage import file_signature
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+LOG_NAME = "Changes.jsonl"
+_TAIL_CHUNK = 64 * 1024
+
+# (tabla, operación, id, antes, después)
+Change = Tuple[str, str, Any, Optional[Dict], Optional[Dict]]
+
+
+class ChangeEvent(NamedTuple):
+    """Cambio de un registro.
+
+    Attributes:
+        seq: Número de secuencia en el registro de cambios.
+        table: Tabla afectada (``Hotels``, ``Customers``, ``Reservations``).
+        op: Operación que produjo el cambio.
+        id: Id del registro.
+        before: Registro antes del cambio (None al crear).
+        after: Registro después del cambio (None al eliminar).
+        ts: Hora del cambio, en segundos desde la época.
+        signature: ``[inodo, fecha de modificación en ns, tamaño]`` de
+            ``<tabla>.json`` al registrar el cambio (None si no existe o
+            si el evento es de un registro anterior a este campo).
+    """
+    seq: int
+    table: str
+    op: str
+    id: Any
+    before: Optional[Dict]
+    after: Optional[Dict]
+    ts: float
+    signature: Optional[List[int]] = None
+
+    def to_json(self) -> str:
+        """Codifica el evento como una línea JSON."""
+        # pylint no ve los métodos que NamedTuple genera en la clase.
+        # pylint: disable-next=no-member
+        return json.dumps(self._asdict(), ensure_ascii=False)
+
+
+def _table_signature(directory: Path, table: str) -> Optional[List[int]]:
+    """Firma del archivo de una tabla, o None si no existe."""
+    signature = file_signature(Path(directory) / f"{table}.json",
+                               missing_ok=True)
+    return None if signature is None else list(signature)
+
+
+class ChangeLog:
+    """Registro de cambios de un directorio (``Changes.jsonl``).
+
+    Attributes:
+        path: Archivo del registro.
+    """
+
+    def __init__(self, directory: Path):
+        self.path = Path(directory) / LOG_NAME
+        self._last_seq = 0
+        self._lock = threading.Lock()
+
+    def last_seq(self) -> int:
+        """Devuelve el último número de secuencia escrito."""
+        return self.position()[0]
+
+    def position(self) -> Tuple[int, int]:
+        """Devuelve el último ``seq`` escrito y el tamaño del registro.
+
+        Los dos valores se toman juntos, entre dos escrituras (también
+        las de otros procesos), así que el tamaño sirve como ``offset``
+        de ``read_changes``.
+        """
+        try:
+            file = open(self.path, 'rb')
+        except FileNotFoundError:
+            return self._last_seq, 0
+        with self._lock, file:
+            _lock_file(file)
+            seq = self._sync_last_seq(file)
+            size = os.fstat(file.fileno()).st_size
+        return seq, size
+
+    def _sync_last_seq(self, file) -> int:
+        """Toma en cuenta los eventos que escribieron otros procesos."""
+        self._last_seq = max(self._last_seq, _tail_seq(self.path, file))
+        return self._last_seq
+
+    def append(self, changes: List[Change]) -> List[ChangeEvent]:
+        """Numera los cambios y los agrega al final con una escritura.
+
+        El número se calcula con el candado del archivo tomado, a partir
+        del último evento escrito por cualquier proceso.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(self.path, 'ab+') as file:
+            _lock_file(file)
+            seq = self._sync_last_seq(file)
+            now = time.time()
+            signatures = {table: _table_signature(self.path.parent, table)
+                          for table in {change[0] for change in changes}}
+            events = [ChangeEvent(seq + offset, *change, now,
+                                  signatures[change[0]])
+                      for offset, change in enumerate(changes, 1)]
+            raw = "".join(event.to_json() + "\n"
+                          for event in events).encode('utf-8')
+            fsyncs = append_durable(self.path, raw, file)
+            record_io(self.path, bytes_written=len(raw), opens=1,
+                      fsyncs=fsyncs)
+            self._last_seq = seq + len(events)
+        return events
+
+
+def _lock_file(file) -> None:
+    """Toma el candado exclusivo del registro (se suelta al cerrarlo)."""
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+
+
+def _tail_seq(path: Path, file) -> int:
+    """``seq`` del último evento completo de un registro abierto.
+
+    Lee el archivo desde el final en bloques, así que no depende de su
+    tamaño; las líneas dañadas del final se omiten.
+    """
+    end = file.seek(0, os.SEEK_END)
+    chunk = _TAIL_CHUNK
+    while True:
+        start = max(end - chunk, 0)
+        file.seek(start)
+        lines = file.read(end - start).splitlines()
+        record_io(path, bytes_read=end - start)
+        if start > 0:
+            lines = lines[1:]  # la primera puede estar incompleta
+        for line in reversed(lines):
+            try:
+                return int(json.loads(line)['seq'])
+            except (ValueError, TypeError, KeyError):
+                continue
+        if start == 0:
+            return 0
+        chunk *= 2
+
+
+class ChangeFeed:
+    """Suscriptores del proceso y registros de cambios por directorio."""
+
+    def __init__(self):
+        self._subscribers: List[Tuple[Callable[[ChangeEvent], None],
+                                      Optional[Path]]] = []
+        self._logs: Dict[Path, ChangeLog] = {}
+        self._lock = threading.Lock()
+
+    def log(self, directory: Path) -> ChangeLog:
+        """Devuelve el registro de cambios de un directorio."""
+        directory = Path(directory)
+        with self._lock:
+            if directory not in self._logs:
+                self._logs[directory] = ChangeLog(directory)
+            return self._logs[directory]
+
+    def subscribe(self, callback: Callable[[ChangeEvent], None],
+                  directory: Optional[Path] = None) -> Callable[[], None]:
+        """Registra un suscriptor.
+
+        Args:
+            callback: Función que recibe cada evento.
+            directory: Si se indica, sólo se entregan los cambios de las
+                tablas de ese directorio.
+
+        Returns:
+            Callable: Función que cancela la suscripción.
+        """
+        entry = (callback, None if directory is None else Path(directory))
+        with self._lock:
+            self._subscribers.append(entry)
+
+        def unsubscribe():
+            with self._lock:
+                if entry in self._subscribers:
+                    self._subscribers.remove(entry)
+        return unsubscribe
+
+    def publish(self, directory: Path,
+                changes: List[Change]) -> List[ChangeEvent]:
+        """Registra cambios y los entrega a los suscriptores.
+
+        Un suscriptor que falla no interrumpe la operación ni a los
+        demás suscriptores.
+        """
+        if not changes:
+            return []
+        directory = Path(directory)
+        events = self.log(directory).append(changes)
+        subscribers = [callback for callback, only in self._subscribers
+                       if only is None or only == directory]
+        for event in events:
+            for callback in subscribers:
+                try:
+                    callback(event)
+                # Un suscriptor es código ajeno y puede lanzar cualquier
+                # excepción; la operación ya está guardada.
+                except Exception as error:  # pylint: disable=broad-except
+                    print(f"Error en suscriptor de cambios: {error}")
+        return events
+
+    def reset(self) -> None:
+        """Quita los suscriptores y olvida los registros abiertos."""
+        with self._lock:
+            self._subscribers.clear()
+            self._logs.clear()
+
+
+FEED = ChangeFeed()
+
+
+def subscribe(callback: Callable[[ChangeEvent], None],
+              directory: Optional[Path] = None) -> Callable[[], None]:
+    """Registra un suscriptor en el flujo del proceso."""
+    return FEED.subscribe(callback, directory)
+
+
+def publish(directory: Path, changes: List[Change]) -> List[ChangeEvent]:
+    """Publica cambios en el flujo del proceso."""
+    return FEED.publish(directory, changes)
+
+
+def read_changes(directory: Path, cursor: int = 0,
+                 limit: Optional[int] = None,
+                 offset: int = 0) -> List[ChangeEvent]:
+    """Lee los cambios con ``seq`` mayor que ``cursor``.
+
+    Args:
+        directory: Directorio de las tablas.
+        cursor: Último ``seq`` ya procesado (0 para leer desde el inicio).
+        limit: Máximo de eventos a devolver (None para todos).
+        offset: Byte donde empezar a leer, tomado de
+            ``ChangeLog.position`` (0 para leer todo el archivo).
+
+    Returns:
+        List[ChangeEvent]: Eventos en orden de secuencia. Las líneas
+        dañadas (p. ej. una escritura interrumpida) se omiten.
+    """
+    path = Path(directory) / LOG_NAME
+    if not path.exists():
+        return []
+    events = []
+    bytes_read = 0
+    with open(path, 'rb') as file:
+        file.seek(offset)
+        for line in file:
+            bytes_read += len(line)
+            try:
+                event = ChangeEvent(**json.loads(line))
+            except (ValueError, TypeError):
+                continue
+            if event.seq > cursor:
+                events.append(event)
+                if limit is not None and len(events) >= limit:
+                    break
+    record_io(path, bytes_read=bytes_read, opens=1)
+    return events
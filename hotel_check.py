@@ -0,0 +1,257 @@
+"""
+Verificación de consistencia entre hoteles y reservaciones.
+
+Cuenta las reservaciones por ``hotel_id`` con una agregación por hash
+(``Counter``) y compara el resultado con las habitaciones ocupadas que
+indica cada hotel (``habitaciones - habitaciones_disponibles``). Con
+varios procesos, cada uno cuenta un archivo (shard) distinto o, si la
+tabla está en un solo archivo, un rango de bytes del archivo: cada
+proceso lee y decodifica sólo los registros que empiezan en su rango.
+Con ``--repair`` se corrige ``habitaciones_disponibles`` en una sola
+escritura por archivo y se reconstruye el inventario de habitaciones
+(``hotel_rooms``) de cada hotel corregido a partir de sus reservaciones;
+un hotel con más reservaciones que habitaciones queda en 0 y se reporta
+como sobrevendido.
+
+Uso:
+    python hotel_check.py [--workers 4] [--repair] [--output-dir Results]
+"""
+import argparse
+import json
+import os
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from hotel_reservation import (Hotel, Reservation, bulk_update, load_table,
+                               table_files)
+from hotel_rooms import rebuild_inventory
+from hotel_tombstones import tombstones
+
+# Inicio de un elemento del arreglo con el formato de ``hotel_storage``
+# (``indent=2``): un salto de línea y dos espacios antes de la llave.
+_RECORD_START = re.compile(rb'\n  \{')
+_CHUNK_SIZE = 1 << 20
+
+
+def count_records(records: List) -> Counter:
+    """Cuenta reservaciones por ``hotel_id``."""
+    return Counter(r.get('hotel_id') for r in records if isinstance(r, dict))
+
+
+def count_file(file_path) -> Counter:
+    """Lee un archivo de reservaciones y lo cuenta por ``hotel_id``.
+
+    Las reservaciones con lápida (canceladas) no se cuentan.
+    """
+    try:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            content = file.read().strip()
+        records = json.loads(content) if content else []
+    except (OSError, json.JSONDecodeError) as error:
+        print(f"Error: No se pudo leer {file_path}: {error}")
+        return Counter()
+    if not isinstance(records, list):
+        return Counter()
+    dead = tombstones(file_path).ids
+    return count_records([r for r in records if not (
+        isinstance(r, dict) and r.get('id') in dead)])
+
+
+def _read_range(file_path, start: int, end: int) -> Tuple[bytes, List[int]]:
+    """Lee un rango de bytes y ubica los registros que empiezan en él.
+
+    Si el último registro cruza el final del rango, se sigue leyendo
+    hasta el inicio del siguiente (o el final del archivo).
+
+    Returns:
+        tuple: ``(datos, límites)``; el registro ``i`` va de
+        ``límites[i]`` a ``límites[i + 1]``.
+    """
+    owned = end - start
+    with open(file_path, 'rb') as file:
+        file.seek(start)
+        # Tres bytes más para ver un inicio que cruce el final del rango.
+        data = file.read(owned + 3)
+        starts = [match.start() for match in _RECORD_START.finditer(data)
+                  if match.start() < owned]
+        following = None
+        searched = owned
+        while starts and following is None:
+            match = _RECORD_START.search(data, searched)
+            if match is not None:
+                following = match.start()
+                break
+            searched = max(len(data) - 3, owned)
+            chunk = file.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            data += chunk
+    return data, starts + [len(data) if following is None else following]
+
+
+def count_range(file_path, start: int, end: int) -> Optional[Counter]:
+    """Cuenta por ``hotel_id`` las reservaciones que empiezan en un rango.
+
+    Cada registro pertenece al rango donde empieza, así que varios
+    procesos con rangos contiguos cuentan cada registro una vez. Las
+    reservaciones con lápida no se cuentan.
+
+    Args:
+        file_path: Archivo con el formato de ``hotel_storage``.
+        start: Primer byte del rango.
+        end: Byte siguiente al último del rango.
+
+    Returns:
+        Optional[Counter]: ``{hotel_id: reservaciones}``, o None si el
+        rango no tiene ese formato.
+    """
+    data, bounds = _read_range(file_path, start, end)
+    records = []
+    for first, last in zip(bounds, bounds[1:]):
+        try:
+            records.append(json.loads(
+                data[first + 1:last].rstrip(b" \t\r\n,]").decode('utf-8')))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            return None
+    dead = tombstones(file_path).ids
+    return count_records([r for r in records if not (
+        isinstance(r, dict) and r.get('id') in dead)])
+
+
+def _byte_ranges(file_path: Path, parts: int) -> Optional[List[tuple]]:
+    """Parte un archivo en rangos de bytes, o None si no tiene el formato
+    de ``hotel_storage``."""
+    with open(file_path, 'rb') as file:
+        head = file.read(5)
+    if head != b"[\n  {":
+        return None
+    size = os.stat(file_path).st_size
+    step = max(1, -(-size // parts))
+    return [(file_path, start, min(start + step, size))
+            for start in range(0, size, step)]
+
+
+def count_reservations(workers: int = 1) -> Counter:
+    """Cuenta las reservaciones de todos los archivos por ``hotel_id``.
+
+    Args:
+        workers: Procesos a usar en la agregación.
+
+    Returns:
+        Counter: ``{hotel_id: reservaciones}``.
+    """
+    files = [path for path in table_files(Reservation) if path.exists()]
+    ranges = None
+    if workers > 1 and len(files) == 1:
+        ranges = _byte_ranges(files[0], workers)
+    if workers <= 1 or (len(files) <= 1 and ranges is None):
+        return count_records(load_table(Reservation))
+    totals = Counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        if ranges is None:
+            partials = list(pool.map(count_file, files))
+        else:
+            partials = list(pool.map(count_range, *zip(*ranges)))
+    if any(partial is None for partial in partials):
+        return count_records(load_table(Reservation))
+    for partial in partials:
+        totals.update(partial)
+    return totals
+
+
+def check(workers: int = 1, repair: bool = False) -> Dict:
+    """Compara hoteles contra reservaciones y opcionalmente repara.
+
+    Args:
+        workers: Procesos a usar en la agregación.
+        repair: Si se corrigen los hoteles inconsistentes.
+
+    Returns:
+        Dict: ``mismatches`` (lista de diferencias por hotel), ``orphans``
+        (reservaciones de hoteles inexistentes por ``hotel_id``),
+        ``overbooked`` (hoteles con más reservaciones que habitaciones;
+        al repararlos quedan con 0 disponibles) y ``repaired`` (hoteles
+        corregidos).
+    """
+    counts = count_reservations(workers)
+    mismatches = []
+    overbooked = []
+    changes = {}
+    hotel_ids = set()
+    hotels = load_table(Hotel)
+    for hotel in hotels:
+        hotel_id = hotel['id']
+        hotel_ids.add(hotel_id)
+        total = hotel['habitaciones']
+        occupied = total - hotel['habitaciones_disponibles']
+        reserved = counts.get(hotel_id, 0)
+        if occupied != reserved:
+            mismatches.append({'hotel_id': hotel_id, 'ocupadas': occupied,
+                               'reservaciones': reserved})
+            changes[hotel_id] = {'habitaciones_disponibles':
+                                 max(total - reserved, 0)}
+        if reserved > total:
+            overbooked.append({'hotel_id': hotel_id, 'habitaciones': total,
+                               'reservaciones': reserved})
+    orphans = {hotel_id: count for hotel_id, count in counts.items()
+               if hotel_id not in hotel_ids}
+    repaired = 0
+    if repair and changes:
+        _add_inventories(hotels, changes)
+        repaired = bulk_update(Hotel, changes)
+    return {'mismatches': mismatches, 'orphans': orphans,
+            'overbooked': overbooked, 'repaired': repaired}
+
+
+def _add_inventories(hotels: List[Dict], changes: Dict[int, Dict]) -> None:
+    """Agrega a los cambios el inventario reconstruido de cada hotel."""
+    taken: Dict[int, List] = {hotel_id: [] for hotel_id in changes}
+    for reservation in load_table(Reservation):
+        rooms = taken.get(reservation['hotel_id'])
+        if rooms is not None:
+            rooms.append(reservation.get('habitacion'))
+    for hotel in hotels:
+        change = changes.get(hotel['id'])
+        if change is not None:
+            change['inventario'] = rebuild_inventory(
+                {**hotel, **change}, taken[hotel['id']])
+
+
+def main(argv=None) -> int:
+    """Punto de entrada de la línea de comandos."""
+    parser = argparse.ArgumentParser(
+        description="Verifica habitaciones_disponibles contra "
+                    "Reservations.json.")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--repair", action="store_true")
+    parser.add_argument("--output-dir", type=Path)
+    args = parser.parse_args(argv)
+
+    if args.output_dir is not None:
+        Hotel.output_dir = Reservation.output_dir = args.output_dir
+    report = check(args.workers, args.repair)
+    for mismatch in report['mismatches']:
+        print(f"Hotel {mismatch['hotel_id']}: {mismatch['ocupadas']} "
+              f"habitaciones ocupadas, {mismatch['reservaciones']} "
+              f"reservaciones")
+    for hotel_id, count in report['orphans'].items():
+        print(f"Hotel {hotel_id} no existe pero tiene {count} "
+              f"reservaciones")
+    for hotel in report['overbooked']:
+        print(f"Hotel {hotel['hotel_id']} sobrevendido: "
+              f"{hotel['reservaciones']} reservaciones para "
+              f"{hotel['habitaciones']} habitaciones")
+    if args.repair:
+        print(f"Hoteles corregidos: {report['repaired']}")
+    if not report['mismatches'] and not report['orphans']:
+        print("Sin inconsistencias.")
+        return 0
+    return 0 if args.repair and not (report['orphans']
+                                     or report['overbooked']) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,135 @@
+"""
+Línea de comandos del Sistema de Gestión de Hoteles.
+
+Uso:
+    python hotel_cli.py [demo]
+    python hotel_cli.py replay operaciones.jsonl [--flush-every N]
+    python hotel_cli.py export hotels hoteles.jsonl [--from N] [--to N]
+
+``python hotel_reservation.py`` acepta los mismos argumentos.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+from hotel_replay import run_replay
+from hotel_reservation import Customer, Hotel, Reservation
+from hotel_tables import export_ordered
+
+
+def _demo() -> None:
+    """Ejecuta la demostración del sistema sobre ``Results``."""
+    print("\n Sistema de reservación de hoteles")
+
+    # Crear hoteles
+    print("\n Crear Hotel ")
+    hotel1 = Hotel("Grand Palace", "Veracruz", 100)
+    hotel1.create()
+    print("\n Crear Hotel ")
+    hotel2 = Hotel("Fiesta Americana", "Puebla", 200)
+    hotel2.create()
+
+    # Mostrar información del hotel
+    print("\n Mostrar Información del Hotel")
+    hotel1.display_info()
+
+    # Modificar información del hotel
+    print("\n Modificar nombre y No. de habitaciones del hotel")
+    hotel1.modify_info(nombre="Grand Palace Hotel", habitaciones=200)
+    print("\n Verificar cambios ")
+    hotel1.display_info()
+
+    # Crear clientes
+    print("\n Crear Cliente ")
+    customer1 = Customer("Anuar", "anuar@email.com", "2227709000")
+    customer1.create()
+    print("\n Crear Cliente ")
+    customer2 = Customer("Alejandro", "Alejandro@email.com", "2227701234")
+    customer2.create()
+
+    # Mostrar información del cliente
+    print("\n Mostrar Información del Cliente ")
+    customer1.display_info()
+
+    # Modificar información del cliente
+    print("\n Modificar Cliente ")
+    customer1.modify_info(nombre="Anuar Olmos Lopez",
+                          email="anuar.olmos@email.com")
+    print("\n Verificar cambios ")
+    customer1.display_info()
+
+    # Crear reservación, utiliza internamente Hotel.reserve_room()
+    print("\n Crear Reservación")
+    reservation1 = Reservation(customer1.id, hotel1.id)
+    reservation1.create()
+
+    # Verificar habitaciones disponibles
+    print("\n Verificar habitaciones disponibles del hotel")
+    hotel1.display_info()
+
+    # Cancelar reservación
+    print("\n Cancelar reservación 1")
+    reservation1.cancel()
+
+    # Verificar que se liberó la habitación
+    print("\n Verificar habitaciones disponibles del hotel")
+    hotel1.display_info()
+
+    # Eliminar cliente
+    print("\n Eliminar cliente")
+    customer2.delete()
+
+    # Eliminar hotel
+    print("\n Eliminar Hotel")
+    hotel2.delete()
+
+
+def main(argv=None) -> int:
+    """Punto de entrada de la línea de comandos.
+
+    Sin argumentos ejecuta la demostración; ``replay`` ejecuta un flujo
+    de operaciones JSONL (ver ``hotel_replay``) y ``export`` exporta una
+    tabla (o un rango de ids) en orden de id a JSONL.
+    """
+    parser = argparse.ArgumentParser(
+        description="Sistema de reservación de hoteles.")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("demo", help="Ejecuta la demostración.")
+    replay_parser = commands.add_parser(
+        "replay", help="Ejecuta un flujo de operaciones JSONL.")
+    replay_parser.add_argument(
+        "file", help="Archivo JSONL de operaciones, o - para stdin.")
+    replay_parser.add_argument(
+        "--flush-every", type=int, default=0,
+        help="Operaciones entre escrituras a disco (0 = sólo al final).")
+    replay_parser.add_argument("--output-dir", type=Path)
+    replay_parser.add_argument("--verbose", action="store_true")
+    export_parser = commands.add_parser(
+        "export", help="Exporta una tabla en orden de id a JSONL.")
+    export_parser.add_argument(
+        "table", choices=["hotels", "customers", "reservations"])
+    export_parser.add_argument("file", help="Archivo JSONL de salida.")
+    export_parser.add_argument("--from", dest="low", type=int)
+    export_parser.add_argument("--to", dest="high", type=int)
+    export_parser.add_argument("--output-dir", type=Path)
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        entity = {'hotels': Hotel, 'customers': Customer,
+                  'reservations': Reservation}[args.table]
+        if args.output_dir is not None:
+            entity.output_dir = args.output_dir
+        exported = export_ordered(entity, args.file, args.low, args.high)
+        if exported < 0:
+            return 1
+        print(f"{exported} registros exportados a {args.file}")
+        return 0
+    if args.command != "replay":
+        _demo()
+        return 0
+    return run_replay(args.file, args.flush_every, args.output_dir,
+                      args.verbose)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""
+Apartados temporales de habitaciones con vencimiento.
+
+Un apartado descuenta una habitación como una reservación, pero vence
+después de ``ttl`` segundos si no se confirma. Los vencimientos se guardan
+en una rueda de tiempo (``TimingWheel``): agregar y quitar un apartado es
+O(1), y avanzar el reloj sólo revisa las casillas de los ticks
+transcurridos, así que liberar miles de apartados vencidos no recorre los
+que siguen vigentes.
+
+Los apartados viven en la memoria del proceso (``Hotel.holds``); si el
+proceso termina sin liberarlos, ``python hotel_check.py --repair``
+devuelve la disponibilidad que tenían descontada.
+"""
+import math
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Hashable, List, Optional
+
+
+class TimingWheel:
+    """Rueda de tiempo de un nivel con rondas.
+
+    Cada clave se guarda en la casilla ``tick % size`` de su vencimiento;
+    las claves que vencen dentro de más de ``size`` ticks comparten
+    casilla y se saltan hasta su ronda.
+
+    Attributes:
+        tick: Duración de una casilla, en segundos.
+        size: Número de casillas.
+    """
+
+    def __init__(self, tick: float = 1.0, size: int = 512,
+                 start: Optional[float] = None):
+        if tick <= 0 or size < 1:
+            raise ValueError("tick y size deben ser mayores que 0.")
+        self.tick = tick
+        self.size = size
+        self._slots: List[Dict[Hashable, int]] = [{} for _ in range(size)]
+        self._where: Dict[Hashable, int] = {}
+        self._current = int((time.time() if start is None else start)
+                            // tick)
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def schedule(self, key: Hashable, expires_at: float) -> None:
+        """Programa (o reprograma) el vencimiento de una clave."""
+        self.cancel(key)
+        due = max(math.ceil(expires_at / self.tick), self._current)
+        slot = due % self.size
+        self._slots[slot][key] = due
+        self._where[key] = slot
+
+    def cancel(self, key: Hashable) -> bool:
+        """Quita una clave; devuelve False si no estaba programada."""
+        slot = self._where.pop(key, None)
+        if slot is None:
+            return False
+        del self._slots[slot][key]
+        return True
+
+    def advance(self, now: float) -> List[Hashable]:
+        """Avanza el reloj hasta ``now`` y devuelve las claves vencidas."""
+        target = int(now // self.tick)
+        expired = []
+        steps = min(target - self._current + 1, self.size)
+        for offset in range(max(steps, 0)):
+            slot = self._slots[(self._current + offset) % self.size]
+            due = [key for key, tick in slot.items() if tick <= target]
+            for key in due:
+                del slot[key]
+                del self._where[key]
+            expired.extend(due)
+        self._current = max(self._current, target)
+        return expired
+
+
+class HoldRegistry:
+    """Apartados vigentes de un proceso.
+
+    Attributes:
+        clock: Función que devuelve la hora actual en segundos.
+    """
+
+    def __init__(self, tick: float = 1.0, size: int = 512,
+                 clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self._holds: Dict[str, Dict] = {}
+        self._wheel = TimingWheel(tick, size, clock())
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._holds)
+
+    def add(self, hotel_id: int, customer_id: int,
+            habitacion: Optional[int], ttl: float) -> str:
+        """Registra un apartado y devuelve su id."""
+        hold_id = uuid.uuid4().hex
+        expires_at = self.clock() + ttl
+        with self._lock:
+            self._holds[hold_id] = {
+                'id': hold_id, 'hotel_id': hotel_id,
+                'customer_id': customer_id, 'habitacion': habitacion,
+                'vence': expires_at}
+            self._wheel.schedule(hold_id, expires_at)
+        return hold_id
+
+    def get(self, hold_id: str) -> Optional[Dict]:
+        """Devuelve un apartado vigente sin quitarlo."""
+        return self._holds.get(hold_id)
+
+    def take(self, hold_id: str, hotel_id: int) -> Optional[Dict]:
+        """Quita y devuelve un apartado del hotel indicado.
+
+        Returns:
+            Optional[Dict]: El apartado, o None si no existe, es de otro
+            hotel o ya venció (los vencidos se dejan para ``expired``).
+        """
+        with self._lock:
+            hold = self._holds.get(hold_id)
+            if (hold is None or hold['hotel_id'] != hotel_id
+                    or hold['vence'] <= self.clock()):
+                return None
+            del self._holds[hold_id]
+            self._wheel.cancel(hold_id)
+        return hold
+
+    def discard(self, hold_id: str) -> None:
+        """Olvida un apartado aunque ya haya vencido, sin liberar nada.
+
+        Lo usa una ``Session`` que se revierte: la habitación del
+        apartado nunca llegó a descontarse.
+        """
+        with self._lock:
+            if self._holds.pop(hold_id, None) is not None:
+                self._wheel.cancel(hold_id)
+
+    def expired(self, now: Optional[float] = None) -> List[Dict]:
+        """Quita y devuelve los apartados vencidos hasta ``now``."""
+        now = self.clock() if now is None else now
+        with self._lock:
+            return [self._holds.pop(hold_id)
+                    for hold_id in self._wheel.advance(now)]
@@ -0,0 +1,128 @@
+"""
+Claves de idempotencia para ``Reservation.create``.
+
+Cuando un cliente reintenta una reservación con la misma clave, la
+respuesta sale de un caché LRU acotado en lugar de ejecutar otra vez la
+operación (que reescribiría dos tablas y descontaría otra habitación).
+Cada clave nueva se agrega a ``Idempotency.jsonl`` en el directorio de
+las tablas, así que el caché sobrevive a reinicios; el archivo se
+compacta a las ``capacity`` claves más recientes cuando crece al doble.
+
+Mientras una operación con una clave está en curso, la clave queda
+apartada (``claim``/``release``) y otra petición con la misma clave no
+se ejecuta al mismo tiempo.
+"""
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Set
+
+from hotel_storage import append_bytes, read_bytes, replace_bytes
+
+
+class IdempotencyCache:
+    """Caché LRU de resultados por clave, respaldado en un archivo JSONL.
+
+    Attributes:
+        path: Archivo de respaldo.
+        capacity: Máximo de claves que se recuerdan.
+    """
+
+    def __init__(self, path: Path, capacity: int = 10000):
+        if capacity < 1:
+            raise ValueError("capacity debe ser mayor que 0.")
+        self.path = Path(path)
+        self.capacity = capacity
+        self._entries: OrderedDict = OrderedDict()
+        self._in_flight: Set[str] = set()
+        self._lines = 0
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._load()
+            return len(self._entries)
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path.exists():
+            return
+        for line in read_bytes(self.path).decode('utf-8').splitlines():
+            try:
+                entry = json.loads(line)
+                key, result = entry['key'], entry['result']
+            except (ValueError, KeyError, TypeError):
+                continue
+            self._lines += 1
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Devuelve el resultado guardado para la clave, si existe."""
+        with self._lock:
+            self._load()
+            result = self._entries.get(key)
+            if result is None:
+                return None
+            self._entries.move_to_end(key)
+            return dict(result)
+
+    def claim(self, key: str) -> bool:
+        """Aparta una clave para ejecutar su operación.
+
+        Returns:
+            bool: False si la clave ya tiene resultado o si otra
+            operación con ella está en curso.
+        """
+        with self._lock:
+            self._load()
+            if key in self._entries or key in self._in_flight:
+                return False
+            self._in_flight.add(key)
+            return True
+
+    def release(self, key: str) -> None:
+        """Libera una clave apartada con ``claim``."""
+        with self._lock:
+            self._in_flight.discard(key)
+
+    def remember(self, key: str, result: Dict) -> None:
+        """Guarda el resultado de una clave en memoria."""
+        with self._lock:
+            self._load()
+            self._entries[key] = dict(result)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def forget(self, key: str) -> None:
+        """Olvida una clave (p. ej. si la operación se revirtió)."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def persist(self, key: str, result: Dict) -> None:
+        """Agrega la clave al archivo de respaldo."""
+        raw = (json.dumps({'key': key, 'result': result},
+                          ensure_ascii=False) + "\n").encode('utf-8')
+        with self._lock:
+            append_bytes(self.path, raw)
+            self._lines += 1
+            if self._lines > 2 * self.capacity:
+                self.compact()
+
+    def compact(self) -> None:
+        """Reescribe el respaldo sólo con las claves en memoria."""
+        with self._lock:
+            self._load()
+            raw = "".join(
+                json.dumps({'key': key, 'result': result},
+                           ensure_ascii=False) + "\n"
+                for key, result in self._entries.items()).encode('utf-8')
+            replace_bytes(self.path, raw)
+            self._lines = len(self._entries)
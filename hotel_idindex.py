@@ -0,0 +1,131 @@
+"""
+Índice ordenado por id para recorridos por rango.
+
+Los métodos de creación agregan cada registro con un id mayor que los
+existentes, así que una tabla normalmente ya está ordenada por id y el
+índice es la propia lista: ubicar un id es una búsqueda binaria y el
+menor y el mayor id son el primer y el último registro. Si la lista no
+está ordenada (editada a mano o con registros inválidos), el índice
+guarda un arreglo ordenado de ids con la posición de cada registro.
+
+``IdIndex.scan`` recorre en orden los registros de un rango de ids sin
+copiar ni ordenar la lista, y ``merge`` junta en orden los recorridos de
+varios archivos (tablas particionadas) con un heap, sin ordenar la
+tabla completa.
+"""
+import heapq
+import threading
+from array import array
+from pathlib import Path
+from typing import Container, Dict, Iterable, Iterator, Optional, Tuple
+
+from hotel_storage import file_signature
+
+
+def _is_ordered(records: list) -> bool:
+    try:
+        return all(records[i]['id'] < records[i + 1]['id']
+                   for i in range(len(records) - 1))
+    except (KeyError, TypeError):
+        return False
+
+
+class IdIndex:
+    """Índice ordenado por id sobre una lista de registros.
+
+    Attributes:
+        records: Lista indexada; el índice no la copia.
+    """
+
+    def __init__(self, records: list, ordered: Optional[bool] = None):
+        self.records = records
+        self._ids: Optional[array] = None
+        self._positions: Optional[array] = None
+        if ordered is None:
+            ordered = _is_ordered(records)
+        if not ordered:
+            valid = [position for position, record in enumerate(records)
+                     if isinstance(record, dict)
+                     and isinstance(record.get('id'), int)]
+            valid.sort(key=lambda position: records[position]['id'])
+            self._positions = array('q', valid)
+            self._ids = array('q', (records[position]['id']
+                                    for position in valid))
+
+    def __len__(self) -> int:
+        if self._positions is None:
+            return len(self.records)
+        return len(self._positions)
+
+    def _id(self, rank: int) -> int:
+        if self._ids is None:
+            return self.records[rank]['id']
+        return self._ids[rank]
+
+    def bisect(self, record_id: int) -> int:
+        """Posición (en orden de id) del primer id mayor o igual."""
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self._id(middle) < record_id:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def scan(self, low: Optional[int] = None, high: Optional[int] = None,
+             skip: Container = ()) -> Iterator[Dict]:
+        """Recorre en orden los registros con ``low <= id <= high``.
+
+        Args:
+            low: Menor id incluido (None para empezar por el primero).
+            high: Mayor id incluido (None para terminar en el último).
+            skip: Ids a omitir (p. ej. con lápida).
+        """
+        start = 0 if low is None else self.bisect(low)
+        end = len(self) if high is None else self.bisect(high + 1)
+        if self._positions is None:
+            selected = (self.records[rank] for rank in range(start, end))
+        else:
+            selected = (self.records[self._positions[rank]]
+                        for rank in range(start, end))
+        for record in selected:
+            if record['id'] not in skip:
+                yield record
+
+    def bounds(self, skip: Container = ()) -> Tuple[Optional[int],
+                                                    Optional[int]]:
+        """Devuelve el menor y el mayor id, omitiendo ``skip``."""
+        first = next((self._id(rank) for rank in range(len(self))
+                      if self._id(rank) not in skip), None)
+        last = next((self._id(rank) for rank in range(len(self) - 1, -1, -1)
+                     if self._id(rank) not in skip), None)
+        return first, last
+
+
+def merge(scans: Iterable[Iterator[Dict]]) -> Iterator[Dict]:
+    """Junta recorridos ya ordenados por id en un solo recorrido."""
+    return heapq.merge(*scans, key=lambda record: record['id'])
+
+
+_INDEXES: Dict[Path, Tuple[tuple, IdIndex]] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def index_for(file_path: Path, records: list) -> IdIndex:
+    """Devuelve el índice de la lista leída de un archivo.
+
+    El índice se reutiliza mientras el archivo no cambie y la lista sea
+    la misma, así que revisar si la tabla está ordenada se paga una vez
+    por versión del archivo.
+    """
+    file_path = Path(file_path)
+    key = file_signature(file_path) + (id(records), len(records))
+    with _INDEXES_LOCK:
+        cached = _INDEXES.get(file_path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+    index = IdIndex(records)
+    with _INDEXES_LOCK:
+        _INDEXES[file_path] = (key, index)
+    return index
@@ -0,0 +1,232 @@
+"""
+Importación masiva de hoteles y clientes desde CSV o JSONL.
+
+El archivo de entrada se lee en bloques (sin cargarlo completo y con a lo
+sumo dos bloques en vuelo por proceso), cada bloque se valida y normaliza
+en un pool de procesos, y los registros válidos se escriben en las tablas
+existentes con un solo guardado por archivo (``bulk_insert``), asignando
+los ids como un rango contiguo.
+
+Uso:
+    python hotel_import.py hotels socios.csv --workers 4
+    python hotel_import.py customers clientes.jsonl --chunk-size 20000
+"""
+import argparse
+import csv
+import json
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from hotel_reservation import Customer, Hotel, bulk_insert
+
+ENTITIES = {'hotels': Hotel, 'customers': Customer}
+
+_EMAIL = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+
+def _text(row: Dict, field: str) -> str:
+    value = row.get(field)
+    if value is None or not str(value).strip():
+        raise ValueError(f"falta el campo '{field}'")
+    return ' '.join(str(value).split())
+
+
+def normalize_hotel(row: Dict) -> Dict:
+    """Valida y normaliza un registro de hotel.
+
+    Raises:
+        ValueError: Si el registro no es válido.
+    """
+    try:
+        habitaciones = int(str(row.get('habitaciones', '')).strip())
+    except ValueError as error:
+        raise ValueError("'habitaciones' debe ser un entero") from error
+    if habitaciones < 0:
+        raise ValueError("'habitaciones' no puede ser negativo")
+    return {
+        'nombre': _text(row, 'nombre'),
+        'estado': _text(row, 'estado'),
+        'habitaciones': habitaciones,
+        'habitaciones_disponibles': habitaciones,
+    }
+
+
+def normalize_customer(row: Dict) -> Dict:
+    """Valida y normaliza un registro de cliente.
+
+    Raises:
+        ValueError: Si el registro no es válido.
+    """
+    email = _text(row, 'email').lower()
+    if not _EMAIL.match(email):
+        raise ValueError(f"email inválido: {email}")
+    telefono = re.sub(r'[^\d+]', '', _text(row, 'telefono'))
+    if not telefono:
+        raise ValueError("'telefono' no contiene dígitos")
+    return {
+        'nombre': _text(row, 'nombre'),
+        'email': email,
+        'telefono': telefono,
+    }
+
+
+NORMALIZERS = {'hotels': normalize_hotel, 'customers': normalize_customer}
+
+
+def validate_chunk(table: str, chunk: List[Tuple[int, Dict]]):
+    """Valida un bloque de filas; se ejecuta en los procesos del pool.
+
+    Args:
+        table: ``hotels`` o ``customers``.
+        chunk: Pares ``(numero_de_linea, fila)``.
+
+    Returns:
+        tuple: (registros válidos, errores como ``(linea, mensaje)``).
+    """
+    normalize = NORMALIZERS[table]
+    valid, errors = [], []
+    for line, row in chunk:
+        try:
+            if not isinstance(row, dict):
+                raise ValueError("la fila no es un objeto")
+            valid.append(normalize(row))
+        except ValueError as error:
+            errors.append((line, str(error)))
+    return valid, errors
+
+
+def read_rows(file_path: Path,
+              file_format: Optional[str] = None) -> Iterator[Tuple[int, Dict]]:
+    """Lee las filas del archivo de entrada de forma incremental.
+
+    Args:
+        file_path: Archivo CSV (con encabezados) o JSONL.
+        file_format: ``csv`` o ``jsonl``; por defecto según la extensión.
+
+    Yields:
+        tuple: ``(numero_de_linea, fila)``. Las líneas JSONL inválidas
+        se entregan como cadena para que se reporten como error.
+    """
+    file_format = file_format or (
+        'csv' if file_path.suffix.lower() == '.csv' else 'jsonl')
+    with open(file_path, 'r', encoding='utf-8', newline='') as file:
+        if file_format == 'csv':
+            for line, row in enumerate(csv.DictReader(file), start=2):
+                yield line, row
+            return
+        for line, text in enumerate(file, start=1):
+            if not text.strip():
+                continue
+            try:
+                yield line, json.loads(text)
+            except json.JSONDecodeError:
+                yield line, text
+
+
+def chunked(rows: Iterator, size: int) -> Iterator[List]:
+    """Agrupa un iterador en listas de ``size`` elementos."""
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _validated(table: str, chunks: Iterator[List],
+               workers: int) -> Iterator[Tuple[tuple, int]]:
+    """Valida los bloques en orden, en ``workers`` procesos si es más de 1.
+
+    Yields:
+        tuple: Resultado de ``validate_chunk`` y filas del bloque.
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            yield validate_chunk(table, chunk), len(chunk)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append((pool.submit(validate_chunk, table, chunk),
+                            len(chunk)))
+            if len(pending) >= 2 * workers:
+                future, chunk_rows = pending.popleft()
+                yield future.result(), chunk_rows
+        for future, chunk_rows in pending:
+            yield future.result(), chunk_rows
+
+
+def import_file(table: str, file_path, workers: int = 1,
+                chunk_size: int = 10000,
+                file_format: Optional[str] = None) -> Dict:
+    """Importa un archivo CSV/JSONL en la tabla indicada.
+
+    Args:
+        table: ``hotels`` o ``customers``.
+        file_path: Archivo de entrada.
+        workers: Procesos para validar (1 valida en el proceso actual).
+        chunk_size: Filas por bloque.
+        file_format: ``csv`` o ``jsonl`` (opcional).
+
+    Returns:
+        Dict: Resumen con filas leídas, importadas, rechazadas, errores,
+        primer y último id asignados, segundos y filas por segundo.
+    """
+    start = time.perf_counter()
+    chunks = chunked(read_rows(Path(file_path), file_format), chunk_size)
+    valid: List[Dict] = []
+    errors: List[Tuple[int, str]] = []
+    rows = 0
+    for (chunk_valid, chunk_errors), chunk_rows in _validated(
+            table, chunks, workers):
+        rows += chunk_rows
+        valid.extend(chunk_valid)
+        errors.extend(chunk_errors)
+
+    ids = bulk_insert(ENTITIES[table], valid) if valid else []
+    elapsed = time.perf_counter() - start
+    return {
+        'rows': rows,
+        'imported': len(ids),
+        'rejected': len(errors),
+        'errors': errors,
+        'first_id': ids[0] if ids else None,
+        'last_id': ids[-1] if ids else None,
+        'seconds': elapsed,
+        'rows_per_second': rows / elapsed if elapsed else 0.0,
+    }
+
+
+def main(argv=None) -> int:
+    """Punto de entrada de la línea de comandos."""
+    parser = argparse.ArgumentParser(
+        description="Importa hoteles o clientes desde CSV o JSONL.")
+    parser.add_argument("table", choices=sorted(ENTITIES))
+    parser.add_argument("file", type=Path)
+    parser.add_argument("--format", choices=("csv", "jsonl"))
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--output-dir", type=Path)
+    args = parser.parse_args(argv)
+
+    if args.output_dir is not None:
+        ENTITIES[args.table].output_dir = args.output_dir
+    summary = import_file(args.table, args.file, args.workers,
+                          args.chunk_size, args.format)
+    for line, message in summary['errors'][:20]:
+        print(f"Línea {line}: {message}")
+    print(f"Filas: {summary['rows']}, importadas: {summary['imported']}, "
+          f"rechazadas: {summary['rejected']}")
+    if summary['imported']:
+        print(f"Ids asignados: {summary['first_id']}-{summary['last_id']}")
+    print(f"Tiempo: {summary['seconds']:.2f} s "
+          f"({summary['rows_per_second']:.0f} filas/s)")
+    return 0 if summary['imported'] or not summary['rows'] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
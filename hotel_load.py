@@ -0,0 +1,258 @@
+"""
+Generador de carga con varios procesos y detector de sobreventa.
+
+Siembra hoteles y clientes en un directorio, lanza ``N`` procesos que
+ejecutan al mismo tiempo una mezcla aleatoria de ``Reservation.create`` y
+``Reservation.cancel`` sobre los mismos archivos, y reporta el rendimiento
+(operaciones por segundo) y los percentiles de latencia. Al terminar
+verifica que ningún hotel sembrado tenga ``habitaciones_disponibles``
+negativas, más reservaciones que habitaciones, o habitaciones ocupadas
+distintas al número de reservaciones. Con ``--shared-availability`` los
+procesos usan contadores de disponibilidad en memoria compartida
+(``hotel_availability``) en lugar de reescribir ``Hotels.json``.
+
+Uso:
+    python hotel_load.py --workers 4 --operations 500 --hotels 10 --rooms 20
+"""
+import argparse
+import contextlib
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from hotel_availability import AvailabilityCounters
+from hotel_check import count_reservations
+from hotel_metrics import Histogram
+from hotel_reservation import (Customer, Hotel, Reservation, bulk_insert,
+                               load_table)
+
+
+def _use_directory(output_dir: Path) -> None:
+    Hotel.output_dir = Customer.output_dir = Path(output_dir)
+    Reservation.output_dir = Path(output_dir)
+
+
+def seed(hotels: int = 10, rooms: int = 20,
+         customers: int = 100) -> Tuple[List[int], List[int]]:
+    """Agrega hoteles y clientes de prueba a las tablas actuales.
+
+    Args:
+        hotels: Hoteles a crear.
+        rooms: Habitaciones por hotel.
+        customers: Clientes a crear.
+
+    Returns:
+        tuple: (ids de hoteles, ids de clientes) creados.
+    """
+    hotel_ids = bulk_insert(Hotel, [
+        {'nombre': f"Hotel de carga {number}", 'estado': "Carga",
+         'habitaciones': rooms, 'habitaciones_disponibles': rooms}
+        for number in range(1, hotels + 1)])
+    customer_ids = bulk_insert(Customer, [
+        {'nombre': f"Cliente de carga {number}",
+         'email': f"carga{number}@email.com", 'telefono': str(number)}
+        for number in range(1, customers + 1)])
+    return hotel_ids, customer_ids
+
+
+def _attach_availability(handle: Tuple) -> None:
+    Hotel.availability = AvailabilityCounters.attach(*handle)
+
+
+def run_worker(task: Dict) -> Dict:
+    """Ejecuta la mezcla de operaciones de un proceso.
+
+    Cada proceso sólo cancela reservaciones que él mismo creó.
+
+    Args:
+        task: ``output_dir``, ``operations``, ``seed``, ``cancel_ratio``,
+            ``hotel_ids`` y ``customer_ids``.
+
+    Returns:
+        Dict: Histograma de latencias y conteo de reservaciones creadas,
+        rechazadas, canceladas y cancelaciones fallidas.
+    """
+    _use_directory(task['output_dir'])
+    rng = random.Random(task['seed'])
+    latency = Histogram()
+    result = {'created': 0, 'rejected': 0, 'cancelled': 0,
+              'cancel_failed': 0}
+    mine: List[int] = []
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, \
+            contextlib.redirect_stdout(devnull):
+        for _ in range(task['operations']):
+            if mine and rng.random() < task['cancel_ratio']:
+                reservation_id = mine.pop(rng.randrange(len(mine)))
+                reservation = Reservation(0, 0,
+                                          reservation_id=reservation_id)
+                start = time.perf_counter()
+                succeeded = reservation.cancel()
+                latency.observe(time.perf_counter() - start)
+                result['cancelled' if succeeded else 'cancel_failed'] += 1
+                continue
+            reservation = Reservation(rng.choice(task['customer_ids']),
+                                      rng.choice(task['hotel_ids']))
+            start = time.perf_counter()
+            succeeded = reservation.create()
+            latency.observe(time.perf_counter() - start)
+            if succeeded:
+                result['created'] += 1
+                mine.append(reservation.id)
+            else:
+                result['rejected'] += 1
+    result['latency'] = latency
+    return result
+
+
+def _combine(results: Iterable[Dict]) -> Dict:
+    """Suma los conteos de los procesos y junta sus latencias."""
+    latency = Histogram()
+    summary = {'created': 0, 'rejected': 0, 'cancelled': 0,
+               'cancel_failed': 0}
+    for result in results:
+        latency.merge(result.pop('latency'))
+        for key, value in result.items():
+            summary[key] += value
+    summary['latency'] = latency
+    return summary
+
+
+# Los parámetros son las opciones de la línea de comandos, con valores
+# por defecto.
+# pylint: disable-next=too-many-arguments,too-many-positional-arguments
+def run_load(hotel_ids: Sequence[int], customer_ids: Sequence[int],
+             workers: int = 4, operations: int = 500,
+             cancel_ratio: float = 0.3, seed_value: int = 0,
+             counters: AvailabilityCounters = None) -> Dict:
+    """Lanza los procesos de carga y combina sus resultados.
+
+    Args:
+        hotel_ids: Hoteles sobre los que se reserva.
+        customer_ids: Clientes que reservan.
+        workers: Procesos concurrentes.
+        operations: Operaciones por proceso.
+        cancel_ratio: Probabilidad de cancelar en lugar de reservar.
+        seed_value: Semilla base; cada proceso usa ``seed_value + n``.
+        counters: Contadores compartidos que usarán los procesos
+            (opcional).
+
+    Returns:
+        Dict: Operaciones, segundos, operaciones por segundo, resumen de
+        latencia (``p50``/``p95``/``p99`` en segundos) y conteos.
+    """
+    tasks = [{'output_dir': str(Reservation.output_dir),
+              'operations': operations, 'seed': seed_value + number,
+              'cancel_ratio': cancel_ratio,
+              'hotel_ids': list(hotel_ids),
+              'customer_ids': list(customer_ids)}
+             for number in range(workers)]
+    start = time.perf_counter()
+    options = {}
+    if counters is not None:
+        options = {'initializer': _attach_availability,
+                   'initargs': (counters.handle(),)}
+    with ProcessPoolExecutor(max_workers=workers, **options) as pool:
+        summary = _combine(pool.map(run_worker, tasks))
+    elapsed = time.perf_counter() - start
+    latency = summary['latency']
+    summary['operations'] = latency.count
+    summary['seconds'] = elapsed
+    summary['ops_per_second'] = latency.count / elapsed if elapsed else 0.0
+    summary['latency'] = latency.summary()
+    return summary
+
+
+def verify(hotel_ids: Sequence[int]) -> Dict:
+    """Busca sobreventa e inconsistencias en los hoteles indicados.
+
+    Args:
+        hotel_ids: Hoteles a revisar.
+
+    Returns:
+        Dict: Listas ``negative`` (disponibles < 0), ``overbooked`` (más
+        reservaciones que habitaciones) y ``drift`` (ocupadas distintas
+        de las reservaciones), cada una con ``hotel_id``, habitaciones,
+        disponibles y reservaciones.
+    """
+    wanted = set(hotel_ids)
+    counts = count_reservations()
+    report = {'negative': [], 'overbooked': [], 'drift': []}
+    for hotel in load_table(Hotel):
+        if hotel['id'] not in wanted:
+            continue
+        total = hotel['habitaciones']
+        available = hotel['habitaciones_disponibles']
+        reserved = counts.get(hotel['id'], 0)
+        entry = {'hotel_id': hotel['id'], 'habitaciones': total,
+                 'disponibles': available, 'reservaciones': reserved}
+        if available < 0:
+            report['negative'].append(entry)
+        if reserved > total:
+            report['overbooked'].append(entry)
+        if total - available != reserved:
+            report['drift'].append(entry)
+    return report
+
+
+def main(argv=None) -> int:
+    """Punto de entrada de la línea de comandos."""
+    parser = argparse.ArgumentParser(
+        description="Prueba de carga de reservaciones con varios procesos.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--operations", type=int, default=500,
+                        help="Operaciones por proceso.")
+    parser.add_argument("--hotels", type=int, default=10)
+    parser.add_argument("--rooms", type=int, default=20)
+    parser.add_argument("--customers", type=int, default=100)
+    parser.add_argument("--cancel-ratio", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--shared-availability", action="store_true",
+                        help="Usa contadores en memoria compartida.")
+    parser.add_argument("--output-dir", type=Path,
+                        default=Path("LoadResults"))
+    args = parser.parse_args(argv)
+
+    _use_directory(args.output_dir)
+    hotel_ids, customer_ids = seed(args.hotels, args.rooms, args.customers)
+    counters = None
+    if args.shared_availability:
+        counters = AvailabilityCounters.create()
+        counters.start()
+    try:
+        summary = run_load(hotel_ids, customer_ids, args.workers,
+                           args.operations, args.cancel_ratio, args.seed,
+                           counters)
+    finally:
+        if counters is not None:
+            counters.close()
+            counters.unlink()
+    latency = summary['latency']
+    print(f"Operaciones: {summary['operations']} en "
+          f"{summary['seconds']:.2f} s "
+          f"({summary['ops_per_second']:.0f} operaciones/s)")
+    print(f"Latencia p50/p95/p99: {latency['p50'] * 1000:.2f} / "
+          f"{latency['p95'] * 1000:.2f} / {latency['p99'] * 1000:.2f} ms")
+    print(f"Reservaciones creadas: {summary['created']}, rechazadas: "
+          f"{summary['rejected']}, canceladas: {summary['cancelled']}, "
+          f"cancelaciones fallidas: {summary['cancel_failed']}")
+
+    report = verify(hotel_ids)
+    labels = {'negative': "disponibles negativas",
+              'overbooked': "sobreventa", 'drift': "inconsistente"}
+    for kind, entries in report.items():
+        for entry in entries:
+            print(f"Hotel {entry['hotel_id']} ({labels[kind]}): "
+                  f"{entry['habitaciones']} habitaciones, "
+                  f"{entry['disponibles']} disponibles, "
+                  f"{entry['reservaciones']} reservaciones")
+    if any(report.values()):
+        return 1
+    print("Sin sobreventa ni inconsistencias.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,455 @@
+"""
+Instrumentación del Sistema de Gestión de Hoteles.
+
+Este módulo registra, para cada método público instrumentado, el número de
+llamadas, el número de errores y un histograma de latencias. Cada llamada
+se divide además en las fases de persistencia:
+
+- load: lectura del archivo desde disco
+- parse: decodificación del JSON
+- mutate: modificación de los registros en memoria
+- serialize: codificación del JSON
+- write: escritura del archivo en disco
+
+Además lleva la contabilidad de E/S de cada operación lógica (la llamada
+más externa, por ejemplo ``Reservation.create``): bytes leídos y escritos,
+archivos abiertos, fsyncs y archivos distintos tocados. Esto permite medir
+la amplificación de escritura y detectar regresiones con
+``io_regressions(presupuestos)``.
+
+Los datos se consultan con ``stats()`` y se pueden exportar en el formato
+de texto de Prometheus con ``dump_prometheus(ruta)``.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from typing import Dict, List, Optional
+
+PHASES = ("load", "parse", "mutate", "serialize", "write")
+
+# Límites superiores (en segundos) de las cubetas del histograma.
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+           0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Histograma de latencias con cubetas fijas.
+
+    Attributes:
+        buckets: Límites superiores de las cubetas, en segundos.
+        counts: Observaciones por cubeta (la última es +Inf).
+        count: Número total de observaciones.
+        total: Suma de todas las observaciones.
+        maximum: Mayor observación registrada.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Registra una observación."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.maximum = max(self.maximum, value)
+
+    def merge(self, other: 'Histogram') -> None:
+        """Suma las observaciones de otro histograma con las mismas cubetas.
+
+        Raises:
+            ValueError: Si las cubetas no coinciden.
+        """
+        if other.buckets != self.buckets:
+            raise ValueError("Los histogramas tienen cubetas distintas.")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.maximum = max(self.maximum, other.maximum)
+
+    def percentile(self, quantile: float) -> float:
+        """Estima un percentil interpolando dentro de la cubeta.
+
+        Args:
+            quantile: Cuantil entre 0 y 1 (por ejemplo 0.95).
+
+        Returns:
+            float: Latencia estimada en segundos (0.0 si no hay datos).
+        """
+        if not self.count:
+            return 0.0
+        rank = quantile * self.count
+        cumulative = 0
+        lower = 0.0
+        for index, bucket_count in enumerate(self.counts):
+            upper = (self.buckets[index] if index < len(self.buckets)
+                     else self.maximum)
+            if bucket_count and cumulative + bucket_count >= rank:
+                fraction = (rank - cumulative) / bucket_count
+                return min(lower + (upper - lower) * fraction, self.maximum)
+            cumulative += bucket_count
+            lower = upper
+        return self.maximum
+
+    def summary(self) -> Dict:
+        """Devuelve un resumen con conteo, suma y percentiles."""
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'max': self.maximum,
+            'p50': self.percentile(0.50),
+            'p95': self.percentile(0.95),
+            'p99': self.percentile(0.99),
+        }
+
+
+IO_COUNTERS = ("bytes_read", "bytes_written", "opens", "fsyncs",
+               "files_touched")
+
+
+# Los contadores son atributos públicos que ``record_io`` incrementa.
+class IOTally:  # pylint: disable=too-few-public-methods
+    """Contabilidad de E/S de una llamada a una operación lógica.
+
+    Attributes:
+        bytes_read: Bytes leídos de disco.
+        bytes_written: Bytes escritos a disco.
+        opens: Archivos abiertos.
+        fsyncs: Llamadas a fsync.
+        paths: Archivos distintos tocados.
+    """
+
+    def __init__(self):
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.opens = 0
+        self.fsyncs = 0
+        self.paths = set()
+
+    def as_dict(self) -> Dict:
+        """Devuelve los contadores como diccionario."""
+        return {
+            'bytes_read': self.bytes_read,
+            'bytes_written': self.bytes_written,
+            'opens': self.opens,
+            'fsyncs': self.fsyncs,
+            'files_touched': len(self.paths),
+        }
+
+
+# Registro de contadores que actualiza ``MetricsRegistry``.
+class _OperationStats:  # pylint: disable=too-few-public-methods
+    """Contadores e histogramas de una operación."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latency = Histogram()
+        self.phases: Dict[str, Histogram] = {}
+        self.io_calls = 0
+        self.io: Dict[str, int] = dict.fromkeys(IO_COUNTERS, 0)
+
+    def io_summary(self) -> Dict:
+        """Devuelve los totales de E/S y sus promedios por llamada."""
+        per_call = {
+            name: (value / self.io_calls if self.io_calls else 0.0)
+            for name, value in self.io.items()
+        }
+        return {'calls': self.io_calls, 'total': dict(self.io),
+                'per_call': per_call}
+
+
+class MetricsRegistry:
+    """Registro de métricas por operación.
+
+    Las operaciones se anidan (``Reservation.create`` llama a
+    ``Hotel.reserve_room``); cada fase se atribuye a la operación más
+    interna que esté en curso en el hilo actual.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._operations: Dict[str, _OperationStats] = {}
+        self._local = threading.local()
+
+    def _tally(self) -> Optional[IOTally]:
+        return getattr(self._local, 'tally', None)
+
+    def _stack(self) -> List[str]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = []
+            self._local.stack = stack
+        return stack
+
+    def _get(self, operation: str) -> _OperationStats:
+        op_stats = self._operations.get(operation)
+        if op_stats is None:
+            op_stats = _OperationStats()
+            self._operations[operation] = op_stats
+        return op_stats
+
+    def current_operation(self) -> Optional[str]:
+        """Devuelve la operación más interna en curso, si existe."""
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    def record_call(self, operation: str, seconds: float,
+                    error: bool) -> None:
+        """Registra una llamada completa a una operación."""
+        with self._lock:
+            op_stats = self._get(operation)
+            op_stats.calls += 1
+            if error:
+                op_stats.errors += 1
+            op_stats.latency.observe(seconds)
+
+    def record_phase(self, phase_name: str, seconds: float) -> None:
+        """Registra la duración de una fase de la operación en curso."""
+        operation = self.current_operation()
+        if operation is None:
+            return
+        with self._lock:
+            phases = self._get(operation).phases
+            histogram = phases.get(phase_name)
+            if histogram is None:
+                histogram = Histogram()
+                phases[phase_name] = histogram
+            histogram.observe(seconds)
+
+    def record_io(self, path, bytes_read: int = 0, bytes_written: int = 0,
+                  opens: int = 0, fsyncs: int = 0) -> None:
+        """Suma E/S a la operación lógica en curso en el hilo actual."""
+        tally = self._tally()
+        if tally is None:
+            return
+        tally.bytes_read += bytes_read
+        tally.bytes_written += bytes_written
+        tally.opens += opens
+        tally.fsyncs += fsyncs
+        tally.paths.add(str(path))
+
+    def _record_tally(self, operation: str, tally: IOTally) -> None:
+        with self._lock:
+            op_stats = self._get(operation)
+            op_stats.io_calls += 1
+            for name, value in tally.as_dict().items():
+                op_stats.io[name] += value
+
+    @contextmanager
+    def operation(self, name: str):
+        """Mide una operación; el bloque puede marcar ``state['error']``.
+
+        La llamada más externa del hilo abre una contabilidad de E/S que
+        acumula también la de las operaciones anidadas.
+        """
+        stack = self._stack()
+        outermost = not stack
+        if outermost:
+            self._local.tally = IOTally()
+        stack.append(name)
+        state = {'error': False}
+        start = time.perf_counter()
+        try:
+            yield state
+        except Exception:
+            state['error'] = True
+            raise
+        finally:
+            stack.pop()
+            self.record_call(name, time.perf_counter() - start,
+                             state['error'])
+            if outermost:
+                self._record_tally(name, self._local.tally)
+                self._local.tally = None
+
+    @contextmanager
+    def phase(self, name: str):
+        """Mide una fase de la operación en curso."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_phase(name, time.perf_counter() - start)
+
+    def stats(self) -> Dict:
+        """Devuelve una copia de las métricas acumuladas.
+
+        Returns:
+            Dict: ``{operacion: {calls, errors, latency, phases, io}}``.
+        """
+        with self._lock:
+            return {
+                name: {
+                    'calls': op_stats.calls,
+                    'errors': op_stats.errors,
+                    'latency': op_stats.latency.summary(),
+                    'phases': {
+                        phase_name: histogram.summary()
+                        for phase_name, histogram in op_stats.phases.items()
+                    },
+                    'io': op_stats.io_summary(),
+                }
+                for name, op_stats in sorted(self._operations.items())
+            }
+
+    def reset(self) -> None:
+        """Elimina todas las métricas acumuladas."""
+        with self._lock:
+            self._operations.clear()
+
+    def to_prometheus(self) -> str:
+        """Exporta las métricas en el formato de texto de Prometheus."""
+        lines = [
+            "# HELP hotel_operation_calls_total Llamadas por operación.",
+            "# TYPE hotel_operation_calls_total counter",
+        ]
+        with self._lock:
+            operations = sorted(self._operations.items())
+            for name, op_stats in operations:
+                lines.append(f'hotel_operation_calls_total'
+                             f'{{operation="{name}"}} {op_stats.calls}')
+            lines += [
+                "# HELP hotel_operation_errors_total Errores por operación.",
+                "# TYPE hotel_operation_errors_total counter",
+            ]
+            for name, op_stats in operations:
+                lines.append(f'hotel_operation_errors_total'
+                             f'{{operation="{name}"}} {op_stats.errors}')
+            lines += [
+                "# HELP hotel_operation_latency_seconds Latencia por "
+                "operación.",
+                "# TYPE hotel_operation_latency_seconds histogram",
+            ]
+            for name, op_stats in operations:
+                lines += _histogram_lines(
+                    "hotel_operation_latency_seconds",
+                    f'operation="{name}"', op_stats.latency)
+            lines += [
+                "# HELP hotel_phase_latency_seconds Latencia por fase.",
+                "# TYPE hotel_phase_latency_seconds histogram",
+            ]
+            for name, op_stats in operations:
+                for phase_name, histogram in sorted(op_stats.phases.items()):
+                    lines += _histogram_lines(
+                        "hotel_phase_latency_seconds",
+                        f'operation="{name}",phase="{phase_name}"',
+                        histogram)
+            for counter in IO_COUNTERS:
+                metric = f"hotel_io_{counter}_total"
+                lines += [
+                    f"# HELP {metric} E/S ({counter}) por operación lógica.",
+                    f"# TYPE {metric} counter",
+                ]
+                for name, op_stats in operations:
+                    if op_stats.io_calls:
+                        lines.append(f'{metric}{{operation="{name}"}} '
+                                     f'{op_stats.io[counter]}')
+        return "\n".join(lines) + "\n"
+
+    def dump_prometheus(self, file_path) -> Path:
+        """Escribe las métricas en formato Prometheus en un archivo local.
+
+        Args:
+            file_path: Ruta del archivo de salida.
+
+        Returns:
+            Path: Ruta del archivo escrito.
+        """
+        file_path = Path(file_path)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_text(self.to_prometheus(), encoding='utf-8')
+        return file_path
+
+
+def _histogram_lines(metric: str, labels: str,
+                     histogram: Histogram) -> List[str]:
+    """Genera las líneas de Prometheus de un histograma."""
+    lines = []
+    cumulative = 0
+    for bound, bucket_count in zip(histogram.buckets, histogram.counts):
+        cumulative += bucket_count
+        lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+    lines.append(f'{metric}_sum{{{labels}}} {histogram.total}')
+    lines.append(f'{metric}_count{{{labels}}} {histogram.count}')
+    return lines
+
+
+REGISTRY = MetricsRegistry()
+
+
+def instrumented(func=None, *, empty_ok: bool = False):
+    """Decorador que registra llamadas, errores y latencia de un método.
+
+    Una llamada cuenta como error si lanza una excepción o si devuelve un
+    valor falso (``False`` o ``{}``), que es como los métodos del sistema
+    informan de un fallo. Con ``@instrumented(empty_ok=True)`` una lista
+    vacía es un resultado válido (p. ej. una búsqueda sin coincidencias).
+    """
+    if func is None:
+        return lambda func: instrumented(func, empty_ok=empty_ok)
+    name = func.__qualname__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with REGISTRY.operation(name) as state:
+            result = func(*args, **kwargs)
+            state['error'] = not result and not (empty_ok and result == [])
+            return result
+    return wrapper
+
+
+def phase(name: str):
+    """Context manager que mide una fase de la operación en curso."""
+    return REGISTRY.phase(name)
+
+
+def record_io(path, bytes_read: int = 0, bytes_written: int = 0,
+              opens: int = 0, fsyncs: int = 0) -> None:
+    """Suma E/S a la operación lógica en curso."""
+    REGISTRY.record_io(path, bytes_read, bytes_written, opens, fsyncs)
+
+
+def io_regressions(budgets: Dict[str, Dict[str, float]]) -> Dict:
+    """Compara la E/S promedio por llamada contra un presupuesto.
+
+    Args:
+        budgets: ``{operacion: {contador: maximo_por_llamada}}``, por
+            ejemplo ``{"Reservation.create": {"bytes_written": 4096}}``.
+
+    Returns:
+        Dict: ``{operacion: {contador: promedio_observado}}`` con los
+        contadores que exceden su presupuesto (vacío si no hay ninguno).
+    """
+    current = REGISTRY.stats()
+    violations: Dict[str, Dict[str, float]] = {}
+    for operation, limits in budgets.items():
+        per_call = current.get(operation, {}).get('io', {}).get(
+            'per_call', {})
+        for counter, limit in limits.items():
+            observed = per_call.get(counter, 0.0)
+            if observed > limit:
+                violations.setdefault(operation, {})[counter] = observed
+    return violations
+
+
+def stats() -> Dict:
+    """Devuelve las métricas acumuladas por operación."""
+    return REGISTRY.stats()
+
+
+def reset_stats() -> None:
+    """Elimina todas las métricas acumuladas."""
+    REGISTRY.reset()
+
+
+def dump_prometheus(file_path) -> Path:
+    """Escribe las métricas en formato Prometheus en ``file_path``."""
+    return REGISTRY.dump_prometheus(file_path)
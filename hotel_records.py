@@ -0,0 +1,405 @@
+"""
+Lectura de registros por id con memoria acotada.
+
+Para tablas que no caben en memoria, ``RecordCache`` mantiene residente
+sólo un índice id -> posición en el archivo (``OffsetIndex``, 24 bytes
+por registro en tres ``array`` de enteros) y un caché LRU de a lo más
+``capacity`` registros. Un registro que no está en el caché se lee del
+disco con un ``seek`` y se decodifica sólo él, así que la memoria no
+crece con la tabla.
+
+El índice se construye recorriendo el archivo por bloques. Con el
+formato que escribe ``hotel_storage`` (``indent=2`` e ``id`` como primera
+llave) basta una expresión regular sobre los bytes; con cualquier otro
+formato se decodifica el arreglo registro por registro. El índice y el
+caché se descartan cuando el archivo cambia (inodo, fecha de
+modificación o tamaño).
+"""
+import json
+import os
+import re
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from pathlib import Path
+from typing import Container, Dict, Iterator, Optional, Tuple
+
+import hotel_storage
+from hotel_metrics import record_io
+from hotel_storage import stat_signature
+from hotel_tombstones import tombstones
+
+_CHUNK_SIZE = 1 << 22
+# Inicio de un elemento del arreglo con el formato de ``hotel_storage``;
+# el grupo ``id`` falta si el registro no empieza con su id.
+_RECORD_START = re.compile(rb'\n  \{(?:\n    "id": (?P<id>-?\d+)[,\n])?')
+_OVERLAP = 64
+
+
+class OffsetIndex:
+    """Posición en bytes de cada registro de un archivo de tabla.
+
+    Attributes:
+        path: Archivo indexado.
+        size: Tamaño del archivo al indexarlo.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.size = 0
+        self._ids = array('q')
+        self._starts = array('q')
+        self._lengths = array('q')
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def build(self) -> None:
+        """Recorre el archivo y guarda la posición de cada registro.
+
+        Raises:
+            OSError: Si el archivo no se puede leer.
+            json.JSONDecodeError: Si el archivo no es un arreglo JSON.
+        """
+        self.size = os.stat(self.path).st_size
+        scanned = self._scan_formatted()
+        if scanned is None:
+            scanned = self._scan_generic()
+        ids, starts, lengths = scanned
+        if any(ids[i] >= ids[i + 1] for i in range(len(ids) - 1)):
+            order = sorted(range(len(ids)), key=ids.__getitem__)
+            ids = array('q', (ids[i] for i in order))
+            starts = array('q', (starts[i] for i in order))
+            lengths = array('q', (lengths[i] for i in order))
+        self._ids, self._starts, self._lengths = ids, starts, lengths
+
+    @property
+    def ids(self) -> array:
+        """Ids indexados en orden (el arreglo no se modifica después)."""
+        return self._ids
+
+    def bisect(self, record_id: int) -> int:
+        """Posición (en orden de id) del primer id mayor o igual."""
+        return bisect_left(self._ids, record_id)
+
+    def entry(self, rank: int) -> Tuple[int, int, int]:
+        """Devuelve ``(id, inicio, longitud)`` del registro en ``rank``."""
+        return self._ids[rank], self._starts[rank], self._lengths[rank]
+
+    def locate(self, record_id: int) -> Optional[Tuple[int, int]]:
+        """Devuelve ``(inicio, longitud)`` del registro, o None."""
+        position = bisect_left(self._ids, record_id)
+        if position == len(self._ids) or self._ids[position] != record_id:
+            return None
+        return self._starts[position], self._lengths[position]
+
+    def _scan_formatted(self) -> Optional[Tuple[array, array, array]]:
+        """Índice por expresión regular; None si el formato no coincide.
+
+        Cada registro termina donde empieza el siguiente (o al final del
+        archivo); la coma y el cierre del arreglo se quitan al leerlo.
+        """
+        ids, starts = array('q'), array('q')
+        bytes_read = 0
+        with open(self.path, 'rb') as file:
+            base, tail = 0, b""
+            while True:
+                chunk = file.read(_CHUNK_SIZE)
+                bytes_read += len(chunk)
+                data = tail + chunk
+                limit = len(data) if not chunk else len(data) - _OVERLAP
+                for match in _RECORD_START.finditer(data):
+                    if match.start() >= limit:
+                        break
+                    if match.group('id') is None:
+                        record_io(self.path, bytes_read=bytes_read, opens=1)
+                        return None
+                    ids.append(int(match.group('id')))
+                    starts.append(base + match.start() + 1)
+                if not chunk:
+                    break
+                keep = max(limit, 0)
+                base += keep
+                tail = data[keep:]
+        record_io(self.path, bytes_read=bytes_read, opens=1)
+        if not starts and self.size > 2:
+            return None
+        lengths = array('q', (starts[i + 1] - starts[i]
+                              for i in range(len(starts) - 1)))
+        if starts:
+            lengths.append(self.size - starts[-1])
+        return ids, starts, lengths
+
+    def _scan_generic(self) -> Tuple[array, array, array]:
+        """Índice decodificando cada elemento del arreglo.
+
+        El archivo se decodifica como latin-1 para que cada carácter
+        ocupe un byte y las posiciones del texto sean posiciones del
+        archivo; la estructura JSON es ASCII, así que no cambia.
+        """
+        ids, starts, lengths = array('q'), array('q'), array('q')
+        decoder = json.JSONDecoder()
+        bytes_read = 0
+        with open(self.path, 'rb') as file:
+            buffer, position, base, started = "", 0, 0, False
+            try:
+                while True:
+                    while position < len(buffer) and buffer[position] in (
+                            " \t\r\n,"):
+                        position += 1
+                    if position >= len(buffer):
+                        base += len(buffer)
+                        chunk = file.read(_CHUNK_SIZE)
+                        bytes_read += len(chunk)
+                        buffer, position = chunk.decode('latin-1'), 0
+                        if not buffer:
+                            break
+                        continue
+                    if not started:
+                        if buffer[position] != '[':
+                            raise json.JSONDecodeError(
+                                "Se esperaba un arreglo", buffer, position)
+                        started = True
+                        position += 1
+                        continue
+                    if buffer[position] == ']':
+                        break
+                    try:
+                        record, end = decoder.raw_decode(buffer, position)
+                    except json.JSONDecodeError:
+                        chunk = file.read(_CHUNK_SIZE)
+                        bytes_read += len(chunk)
+                        if not chunk:
+                            raise
+                        base += position
+                        buffer = buffer[position:] + chunk.decode('latin-1')
+                        position = 0
+                        continue
+                    if isinstance(record, dict) and isinstance(
+                            record.get('id'), int):
+                        ids.append(record['id'])
+                        starts.append(base + position)
+                        lengths.append(end - position)
+                    position = end
+            finally:
+                record_io(self.path, bytes_read=bytes_read, opens=1)
+        return ids, starts, lengths
+
+
+# El caché guarda el índice de offsets, el LRU y sus contadores.
+class RecordCache:  # pylint: disable=too-many-instance-attributes
+    """Registros de un archivo de tabla leídos bajo demanda, con LRU.
+
+    Attributes:
+        path: Archivo de la tabla.
+        capacity: Máximo de registros en memoria.
+        hits: Lecturas resueltas desde el caché.
+        misses: Lecturas que fueron al disco.
+    """
+
+    def __init__(self, path: Path, capacity: int):
+        if capacity < 1:
+            raise ValueError("capacity debe ser mayor que 0.")
+        self.path = Path(path)
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._index = OffsetIndex(self.path)
+        self._records: OrderedDict = OrderedDict()
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._lock = threading.Lock()
+
+    def get(self, record_id) -> Optional[Dict]:
+        """Devuelve una copia del registro, o None si no existe.
+
+        Raises:
+            OSError: Si el archivo no se puede leer.
+            json.JSONDecodeError: Si el archivo no es un arreglo JSON.
+        """
+        if record_id in tombstones(self.path):
+            return None
+        with self._lock:
+            self._refresh()
+            record = self._records.get(record_id)
+            if record is not None:
+                self.hits += 1
+                self._records.move_to_end(record_id)
+                return dict(record)
+            self.misses += 1
+            if not isinstance(record_id, int):
+                return None
+            location = self._index.locate(record_id)
+            if location is None:
+                return None
+            record = self._read(*location)
+            if not isinstance(record, dict) or record.get('id') != record_id:
+                raise json.JSONDecodeError(
+                    f"El índice no coincide con el registro {record_id}",
+                    "", location[0])
+            self._records[record_id] = record
+            if len(self._records) > self.capacity:
+                self._records.popitem(last=False)
+            return dict(record)
+
+    def scan(self, low: Optional[int] = None, high: Optional[int] = None,
+             skip: Container = ()) -> Iterator[Dict]:
+        """Recorre en orden de id los registros con ``low <= id <= high``.
+
+        Los registros se leen del disco uno por uno con el archivo
+        abierto una sola vez y no pasan por el caché LRU. Los ids de
+        ``skip`` (p. ej. con lápida) se omiten.
+
+        Raises:
+            OSError: Si el archivo no se puede leer.
+            json.JSONDecodeError: Si el archivo no es un arreglo JSON.
+        """
+        with open(self.path, 'rb') as file:
+            with self._lock:
+                self._refresh()
+                if (stat_signature(os.fstat(file.fileno()))
+                        != self._signature):
+                    raise OSError(f"{self.path} cambió durante el recorrido")
+                index = self._index
+            bytes_read = 0
+            rank = 0 if low is None else index.bisect(low)
+            try:
+                while rank < len(index):
+                    record_id, start, length = index.entry(rank)
+                    rank += 1
+                    if high is not None and record_id > high:
+                        return
+                    if record_id in skip:
+                        continue
+                    file.seek(start)
+                    raw = file.read(length)
+                    bytes_read += len(raw)
+                    yield json.loads(
+                        raw.rstrip(b" \t\r\n,]").decode('utf-8'))
+            finally:
+                record_io(self.path, bytes_read=bytes_read, opens=1)
+
+    def bounds(self, skip: Container = ()) -> Tuple[Optional[int],
+                                                    Optional[int]]:
+        """Devuelve el menor y el mayor id, omitiendo ``skip``."""
+        with self._lock:
+            self._refresh()
+            index = self._index
+        ids = (index.entry(rank)[0] for rank in range(len(index)))
+        first = next((record_id for record_id in ids
+                      if record_id not in skip), None)
+        ids = (index.entry(rank)[0]
+               for rank in range(len(index) - 1, -1, -1))
+        last = next((record_id for record_id in ids
+                     if record_id not in skip), None)
+        return first, last
+
+    def ids(self) -> array:
+        """Ids del archivo en orden, incluidos los que tienen lápida.
+
+        Raises:
+            OSError: Si el archivo no se puede leer.
+            json.JSONDecodeError: Si el archivo no es un arreglo JSON.
+        """
+        with self._lock:
+            self._refresh()
+            return self._index.ids
+
+    def resize(self, capacity: int) -> None:
+        """Cambia el máximo de registros en memoria."""
+        if capacity < 1:
+            raise ValueError("capacity debe ser mayor que 0.")
+        with self._lock:
+            self.capacity = capacity
+            while len(self._records) > capacity:
+                self._records.popitem(last=False)
+
+    def stats(self) -> Dict:
+        """Aciertos, fallos y tamaño del caché y del índice."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'capacity': self.capacity,
+                    'records': len(self._records),
+                    'indexed': len(self._index),
+                    'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hits / lookups if lookups else 0.0}
+
+    def _refresh(self) -> None:
+        signature = hotel_storage.file_signature(self.path)
+        if signature == self._signature:
+            return
+        self._records.clear()
+        self._signature = None
+        index = OffsetIndex(self.path)
+        index.build()
+        self._index = index
+        self._signature = signature
+
+    def _read(self, start: int, length: int):
+        with open(self.path, 'rb') as file:
+            file.seek(start)
+            raw = file.read(length)
+        record_io(self.path, bytes_read=len(raw), opens=1)
+        return json.loads(raw.rstrip(b" \t\r\n,]").decode('utf-8'))
+
+
+_CACHES: Dict[Path, RecordCache] = {}
+_SCANNERS: Dict[Path, RecordCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def record_cache(file_path: Path, capacity: int) -> RecordCache:
+    """Devuelve el caché de registros de un archivo de tabla.
+
+    El archivo deja de guardarse completo en el caché de documentos de
+    ``hotel_storage``: las escrituras todavía lo cargan, pero no se queda
+    en memoria.
+    """
+    file_path = Path(file_path)
+    with _CACHES_LOCK:
+        cache = _CACHES.get(file_path)
+        if cache is None:
+            cache = _CACHES[file_path] = RecordCache(file_path, capacity)
+            hotel_storage.exclude(file_path)
+        elif cache.capacity != capacity:
+            cache.resize(capacity)
+        return cache
+
+
+def scan_file(file_path: Path, low: Optional[int] = None,
+              high: Optional[int] = None,
+              skip: Container = ()) -> Iterator[Dict]:
+    """Recorre un archivo de tabla en orden de id con su ``OffsetIndex``.
+
+    Usa el caché de registros del archivo si existe; si no, uno propio
+    que sólo conserva el índice, sin sacar el archivo del caché de
+    documentos. El índice se construye una vez mientras el archivo no
+    cambie, así que cada recorrido cuesta una búsqueda binaria más los
+    registros que se leen. Los registros sin id entero no se recorren.
+
+    Raises:
+        OSError: Si el archivo no se puede leer.
+        json.JSONDecodeError: Si el archivo no es un arreglo JSON.
+    """
+    file_path = Path(file_path)
+    with _CACHES_LOCK:
+        cache = _CACHES.get(file_path) or _SCANNERS.get(file_path)
+        if cache is None:
+            cache = _SCANNERS[file_path] = RecordCache(file_path, 1)
+    return cache.scan(low, high, skip)
+
+
+def cache_stats() -> Dict[str, Dict]:
+    """Métricas de los cachés de registros por archivo."""
+    with _CACHES_LOCK:
+        caches = list(_CACHES.items())
+    return {str(path): cache.stats() for path, cache in caches}
+
+
+def reset() -> None:
+    """Descarta los cachés y vuelve a guardar los archivos completos."""
+    with _CACHES_LOCK:
+        for file_path in _CACHES:
+            hotel_storage.exclude(file_path, False)
+        _CACHES.clear()
+        _SCANNERS.clear()
@@ -0,0 +1,187 @@
+"""
+Ejecución por lotes de operaciones sobre hoteles, clientes y reservaciones.
+
+Lee un flujo JSONL (un objeto por línea) y ejecuta cada operación sobre un
+único estado cargado en memoria (una ``Session``), escribiendo los archivos
+una vez al final o cada ``flush_every`` operaciones.
+
+Operaciones soportadas::
+
+    {"op": "create_hotel", "nombre": "...", "estado": "...",
+     "habitaciones": 100}
+    {"op": "create_customer", "nombre": "...", "email": "...",
+     "telefono": "..."}
+    {"op": "reserve", "customer_id": 1, "hotel_id": 1,
+     "idempotency_key": "..."}
+    {"op": "cancel", "reservation_id": 1}
+    {"op": "modify_hotel", "id": 1, "nombre": "...", "habitaciones": 150}
+    {"op": "modify_customer", "id": 1, "email": "..."}
+    {"op": "delete_hotel", "id": 1}
+    {"op": "delete_customer", "id": 1}
+
+Uso:
+    python hotel_cli.py replay operaciones.jsonl --flush-every 10000
+    cat operaciones.jsonl | python hotel_cli.py replay -
+"""
+import contextlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional
+
+from hotel_reservation import Customer, Hotel, Reservation, Session
+
+
+def _fields(operation: Dict, *names: str) -> Dict:
+    return {name: operation[name] for name in names if name in operation}
+
+
+OPERATIONS: Dict[str, Callable[[Dict], bool]] = {
+    'create_hotel': lambda op: Hotel(
+        op['nombre'], op['estado'], int(op['habitaciones'])).create(),
+    'create_customer': lambda op: Customer(
+        op['nombre'], op['email'], op['telefono']).create(),
+    'reserve': lambda op: Reservation(
+        int(op['customer_id']), int(op['hotel_id'])).create(
+            op.get('idempotency_key')),
+    'cancel': lambda op: Reservation(
+        0, 0, reservation_id=int(op['reservation_id'])).cancel(),
+    'modify_hotel': lambda op: Hotel(
+        "", "", 0, hotel_id=int(op['id'])).modify_info(
+            **_fields(op, 'nombre', 'estado', 'habitaciones')),
+    'modify_customer': lambda op: Customer(
+        "", "", "", customer_id=int(op['id'])).modify_info(
+            **_fields(op, 'nombre', 'email', 'telefono')),
+    'delete_hotel': lambda op: Hotel(
+        "", "", 0, hotel_id=int(op['id'])).delete(),
+    'delete_customer': lambda op: Customer(
+        "", "", "", customer_id=int(op['id'])).delete(),
+}
+
+
+def run_operation(operation: Dict) -> bool:
+    """Ejecuta una operación ya decodificada.
+
+    Raises:
+        ValueError: Si la operación no existe o le faltan campos.
+    """
+    handler = OPERATIONS.get(operation.get('op'))
+    if handler is None:
+        raise ValueError(f"operación desconocida: {operation.get('op')}")
+    try:
+        return handler(operation)
+    except KeyError as error:
+        raise ValueError(f"falta el campo {error}") from error
+
+
+def _run_batch(numbered_lines, limit: int, summary: Dict) -> bool:
+    """Ejecuta hasta ``limit`` operaciones (0 = todas).
+
+    Returns:
+        bool: True si el flujo se agotó.
+    """
+    executed = 0
+    for number, line in numbered_lines:
+        if not line.strip():
+            continue
+        summary['operations'] += 1
+        summary['line'] = number
+        try:
+            operation = json.loads(line)
+            if not isinstance(operation, dict):
+                raise ValueError("la línea no es un objeto")
+            succeeded = run_operation(operation)
+        except (ValueError, TypeError) as error:
+            summary['errors'].append((number, str(error)))
+            succeeded = False
+        summary['succeeded' if succeeded else 'failed'] += 1
+        executed += 1
+        if limit and executed >= limit:
+            return False
+    return True
+
+
+def replay(lines: Iterable[str], flush_every: int = 0,
+           verbose: bool = False) -> Dict:
+    """Ejecuta un flujo de operaciones JSONL sobre un solo estado.
+
+    Args:
+        lines: Líneas JSONL (un archivo abierto o ``sys.stdin``).
+        flush_every: Operaciones entre escrituras a disco (0 = sólo al
+            final).
+        verbose: Si se muestran los mensajes de cada operación.
+
+    Returns:
+        Dict: Operaciones ejecutadas, exitosas, fallidas, errores
+        (``(linea, mensaje)``), escrituras, última línea leída, segundos y
+        operaciones por segundo. Si una escritura falla, las operaciones
+        de ese lote se cuentan como fallidas y el flujo se detiene.
+    """
+    session = Session()
+    numbered_lines = enumerate(lines, start=1)
+    summary = {'operations': 0, 'succeeded': 0, 'failed': 0,
+               'errors': [], 'flushes': 0, 'line': 0}
+    start = time.perf_counter()
+    with open(os.devnull, 'w', encoding='utf-8') as devnull:
+        output = (contextlib.nullcontext() if verbose
+                  else contextlib.redirect_stdout(devnull))
+        with output:
+            exhausted = False
+            while not exhausted:
+                succeeded = summary['succeeded']
+                try:
+                    with session:
+                        exhausted = _run_batch(numbered_lines, flush_every,
+                                               summary)
+                except OSError as error:
+                    # El lote no se guardó: sus operaciones no cuentan
+                    # como exitosas y no se sigue con el resto.
+                    lost = summary['succeeded'] - succeeded
+                    summary['succeeded'] -= lost
+                    summary['failed'] += lost
+                    summary['errors'].append((summary['line'], str(error)))
+                    break
+                summary['flushes'] += 1
+    elapsed = time.perf_counter() - start
+    summary['seconds'] = elapsed
+    summary['ops_per_second'] = (summary['operations'] / elapsed
+                                 if elapsed else 0.0)
+    return summary
+
+
+def run_replay(file_name: str, flush_every: int = 0,
+               output_dir: Optional[Path] = None,
+               verbose: bool = False) -> int:
+    """Ejecuta un archivo de operaciones e imprime el resumen.
+
+    Es el comando ``replay`` de ``hotel_cli``.
+
+    Args:
+        file_name: Archivo JSONL de operaciones, o ``-`` para stdin.
+        flush_every: Operaciones entre escrituras a disco (0 = sólo al
+            final).
+        output_dir: Directorio de las tablas; por defecto el de las
+            clases.
+        verbose: Si se muestran los mensajes de cada operación.
+
+    Returns:
+        int: Código de salida (0).
+    """
+    if output_dir is not None:
+        Hotel.output_dir = Customer.output_dir = output_dir
+        Reservation.output_dir = output_dir
+    if file_name == "-":
+        summary = replay(sys.stdin, flush_every, verbose)
+    else:
+        with open(file_name, 'r', encoding='utf-8') as file:
+            summary = replay(file, flush_every, verbose)
+    for line, message in summary['errors'][:20]:
+        print(f"Línea {line}: {message}")
+    print(f"Operaciones: {summary['operations']}, exitosas: "
+          f"{summary['succeeded']}, fallidas: {summary['failed']}, "
+          f"escrituras: {summary['flushes']}")
+    print(f"Tiempo: {summary['seconds']:.2f} s "
+          f"({summary['ops_per_second']:.0f} operaciones/s)")
+    return 0
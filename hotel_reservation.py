@@ -14,10 +14,52 @@ Clases:
     Hotel: Gestiona la información y operaciones de hoteles
     Customer: Gestiona la información y operaciones de clientes
     Reservation: Gestiona las reservaciones entre clientes y hoteles
+    Session: Unidad de trabajo que agrupa las escrituras en un solo guardado
+        (definida en ``hotel_session``)
+
+Las operaciones sobre tablas completas (``bulk_insert``, ``load_table``,
+``scan_range``, ...) están en ``hotel_tables`` y se exportan aquí. La
+línea de comandos está en ``hotel_cli``; ``python hotel_reservation.py``
+la ejecuta.
 """
-import json
+# Las tres entidades son la API pública del sistema y comparten sus reglas
+# de sesión, lápidas y shards, así que se mantienen en un solo módulo.
+# pylint: disable=too-many-lines
+import copy
+import runpy
 from pathlib import Path
-from typing import Optional, Dict
+from typing import Dict, List, Optional
+
+from hotel_aggregates import EstadoAggregates
+from hotel_bloom import filter_stats, note_ids
+from hotel_changes import read_changes, subscribe
+from hotel_durability import get_durability, set_durability
+from hotel_holds import HoldRegistry
+from hotel_idempotency import IdempotencyCache
+from hotel_metrics import (dump_prometheus, instrumented, io_regressions,
+                           phase, reset_stats, stats)
+from hotel_records import cache_stats
+from hotel_rooms import allocate_room, release_room, resize_rooms
+from hotel_schema import CUSTOMER, HOTEL
+from hotel_search import TrigramIndex
+from hotel_session import (Session, delete_at, emit_change, find_index,
+                           load_or_empty, load_records, next_table_id,
+                           write_json)
+from hotel_shards import ShardLayout
+from hotel_storage import copy_record, invalidate
+from hotel_tables import (allocate_id, bulk_insert, bulk_update, bury,
+                          compact_tombstones, export_ordered, fetch_record,
+                          id_range, list_page, load_table, record_estados,
+                          record_file, resubscribe, scan_range,
+                          search_index, shard_table, table_files)
+
+__all__ = ['Hotel', 'Customer', 'Reservation', 'Session', 'stats',
+           'reset_stats', 'dump_prometheus', 'io_regressions',
+           'set_durability', 'get_durability', 'ShardLayout', 'shard_table',
+           'bulk_insert', 'bulk_update', 'table_files', 'load_table',
+           'list_page', 'subscribe', 'read_changes', 'search_index',
+           'compact_tombstones', 'cache_stats', 'scan_range', 'id_range',
+           'export_ordered', 'filter_stats']
 
 
 class Hotel:
@@ -25,6 +67,23 @@ class Hotel:
 
     Attributes:
         output_dir: Directorio donde se guardan los archivos JSON.
+        table_name: Nombre base de los archivos de la tabla.
+        shards: Esquema de particionado (None para un solo archivo).
+        soft_delete: Si es True, borrar agrega una lápida en lugar de
+            reescribir la tabla (ver ``hotel_tombstones``).
+        compact_ratio: Fracción de registros muertos de un archivo a
+            partir de la cual se compacta al borrar.
+        record_cache_size: Registros en memoria al leer por id; None
+            carga la tabla completa (ver ``hotel_records``).
+        bloom_error_rate: Tasa de falsos positivos del filtro de Bloom
+            de ids que descarta ids inexistentes sin leer la tabla (ver
+            ``hotel_bloom``); None para no usarlo.
+        availability: Contadores compartidos de disponibilidad
+            (``hotel_availability.AvailabilityCounters``); None para usar
+            sólo el archivo.
+        search_index: Índice de trigramas de ``nombre`` (se construye en
+            la primera búsqueda).
+        holds: Apartados temporales vigentes del proceso.
         id: Identificador único del hotel.
         nombre: Nombre del hotel.
         estado: Estado/ubicación del hotel.
@@ -36,36 +95,30 @@ class Hotel:
     persistencia de datos en archivos JSON.
     """
     output_dir = Path("Results")
-
-    @staticmethod
-    def _load_json_file(file_path: Path, file_type: str):
-        """Carga y valida un archivo JSON.
-
-        Args:
-            file_path: Ruta al archivo JSON.
-            file_type: Tipo de archivo para mensajes de error.
-
-        Returns:
-            tuple: (success: bool, data: list)
-        """
-        if not file_path.exists():
-            print(f"Error: El archivo {file_type}.json no existe.")
-            return False, []
-
-        try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                content = file.read().strip()
-                if not content:
-                    print("Error: El archivo está vacío.")
-                    return False, []
-                data = json.loads(content)
-                if not isinstance(data, list):
-                    print(f"Error: Invalid data format in {file_type}.json.")
-                    return False, []
-                return True, data
-        except json.JSONDecodeError as e:
-            print(f"Error: Invalid JSON in {file_type}.json: {e}")
-            return False, []
+    table_name = "Hotels"
+    shards: Optional[ShardLayout] = None
+    soft_delete = False
+    compact_ratio = 0.25
+    record_cache_size: Optional[int] = None
+    bloom_error_rate: Optional[float] = 0.01
+    availability = None
+    aggregates: Optional[EstadoAggregates] = None
+    search_index: Optional[TrigramIndex] = None
+    holds = HoldRegistry()
+
+    def _table_file(self) -> Path:
+        """Devuelve el archivo (o shard) que contiene este registro."""
+        return record_file(self.output_dir, self.table_name, self.shards,
+                           self.id)
+
+    def _apply_availability(self, hotels: List[Dict]) -> None:
+        """Copia a los registros la disponibilidad de los contadores."""
+        if self.availability is None:
+            return
+        for hotel in hotels:
+            current = self.availability.get(hotel['id'])
+            if current is not None:
+                hotel['habitaciones_disponibles'] = current[0]
 
     def __init__(self, nombre: str, estado: str, habitaciones: int,
                  hotel_id: Optional[int] = None):
@@ -75,6 +128,7 @@ class Hotel:
         self.habitaciones = habitaciones
         self.habitaciones_disponibles = habitaciones
 
+    @instrumented
     def create(self) -> bool:
         """Crea un nuevo hotel y lo guarda en Hotels.json.
 
@@ -83,50 +137,37 @@ class Hotel:
         """
         try:
             self.output_dir.mkdir(parents=True, exist_ok=True)
-            output_file = self.output_dir / "Hotels.json"
-
-            hotels = []
-            if output_file.exists():
-                try:
-                    with open(output_file, 'r', encoding='utf-8') as file:
-                        content = file.read().strip()
-                        if content:
-                            hotels = json.loads(content)
-                            if not isinstance(hotels, list):
-                                print(
-                                    "Error: Invalid data format in "
-                                    "Hotels.json. Expected a list. "
-                                    "Continuing with empty list.")
-                                hotels = []
-                except json.JSONDecodeError as e:
-                    print(f"Error: Invalid JSON in Hotels.json: {e}. "
-                          "Continuing with empty list.")
-                    hotels = []
-
-            new_id = 1
-            if hotels:
-                try:
-                    max_id = max(
-                        h.get('id', 0) for h in hotels
-                        if isinstance(h, dict)
-                    )
-                    new_id = max_id + 1
-                except (ValueError, TypeError) as e:
-                    print(f"Error calculating next ID: {e}. Using ID 1.")
-
-            self.id = new_id
-
-            hotel_data = {
-                'id': self.id,
-                'nombre': self.nombre,
-                'estado': self.estado,
-                'habitaciones': self.habitaciones,
-                'habitaciones_disponibles': self.habitaciones_disponibles
-            }
-            hotels.append(hotel_data)
-
-            with open(output_file, 'w', encoding='utf-8') as file:
-                json.dump(hotels, file, indent=2, ensure_ascii=False)
+            if self.shards is not None:
+                self.id = allocate_id(self.output_dir, self.table_name,
+                                      self.shards, self.estado)
+            output_file = self._table_file()
+
+            hotels = load_or_empty(output_file, self.table_name)
+
+            with phase("mutate"):
+                if self.shards is None:
+                    self.id = next_table_id(output_file, hotels)
+
+                hotel_data = {
+                    'id': self.id,
+                    'nombre': self.nombre,
+                    'estado': self.estado,
+                    'habitaciones': self.habitaciones,
+                    'habitaciones_disponibles': self.habitaciones_disponibles
+                }
+                problem = HOTEL.check(hotel_data)
+                if problem is not None:
+                    print(f"Error: Hotel inválido: {problem}")
+                    return False
+                hotels.append(hotel_data)
+                self._apply_availability(hotels)
+
+            note_ids(output_file, [self.id])
+            write_json(output_file, hotels)
+            if self.availability is not None:
+                self.availability.set(self.id, self.habitaciones_disponibles,
+                                      self.habitaciones)
+            emit_change(self, 'create', self.id, None, hotel_data)
 
             print(f"Hotel creado: ID {self.id}, {self.nombre} "
                   f"en {self.estado}")
@@ -136,65 +177,87 @@ class Hotel:
             print(f"Error al escribir en archivo: {error}")
             return False
 
+    @instrumented
     def delete(self) -> bool:
         """Elimina el hotel del archivo Hotels.json.
 
         Returns:
             bool: True si se eliminó exitosamente, False en caso contrario.
         """
-        output_file = self.output_dir / "Hotels.json"
-        success, hotels = self._load_json_file(output_file, "Hotels")
+        output_file = self._table_file()
+        success, hotels = load_records(output_file, "Hotels")
 
         if not success:
             return False
 
-        initial_count = len(hotels)
-        hotels = [
-            h for h in hotels
-            if isinstance(h, dict) and h.get('id') != self.id
-        ]
+        removed = None
+        with phase("mutate"):
+            index = find_index(hotels, self.id, output_file)
+            if index is not None:
+                removed = hotels[index]
+                if not self.soft_delete:
+                    delete_at(output_file, hotels, index)
+                    self._apply_availability(hotels)
 
-        if len(hotels) == initial_count:
+        if index is None:
             print(f"Error: No se encontró hotel con ID {self.id}")
             return False
 
         try:
-            with open(output_file, 'w', encoding='utf-8') as file:
-                json.dump(hotels, file, indent=2, ensure_ascii=False)
+            if self.soft_delete:
+                bury(self, output_file, self.id, len(hotels))
+            else:
+                write_json(output_file, hotels)
+            if self.availability is not None:
+                self.availability.forget(self.id)
+            emit_change(self, 'delete', self.id, removed, None)
             print(f"Hotel con ID {self.id} eliminado correctamente.")
             return True
         except (IOError, OSError) as error:
             print(f"Error al escribir en archivo: {error}")
             return False
 
+    @instrumented
     def display_info(self) -> Dict:
         """Muestra la información del hotel.
 
         Returns:
             Dict: Diccionario con la información del hotel o {} si no existe.
         """
-        output_file = self.output_dir / "Hotels.json"
-        success, hotels = self._load_json_file(output_file, "Hotels")
+        output_file = self._table_file()
+        success, hotel = fetch_record(self, output_file, "Hotels")
 
         if not success:
             return {}
 
-        for hotel in hotels:
-            if isinstance(hotel, dict) and hotel.get('id') == self.id:
-                print(f"Hotel ID: {hotel.get('id')}")
-                print(f"Nombre: {hotel.get('nombre')}")
-                print(f"Estado: {hotel.get('estado')}")
-                print(
-                    f"Habitaciones totales: "
-                    f"{hotel.get('habitaciones')}"
-                )
-                print(f"Habitaciones disponibles: "
-                      f"{hotel.get('habitaciones_disponibles')}")
-                return hotel
+        if hotel is not None:
+            # El registro es el del caché: se copia antes de tocarlo.
+            hotel = copy_record(hotel)
+            self._apply_availability([hotel])
+            print(f"Hotel ID: {hotel.get('id')}")
+            print(f"Nombre: {hotel.get('nombre')}")
+            print(f"Estado: {hotel.get('estado')}")
+            print(
+                f"Habitaciones totales: "
+                f"{hotel.get('habitaciones')}"
+            )
+            print(f"Habitaciones disponibles: "
+                  f"{hotel.get('habitaciones_disponibles')}")
+            return hotel
 
         print(f"Error: No se encontró hotel con ID {self.id}")
         return {}
 
+    def _emit_counter(self, op: str, before: int, after: int) -> None:
+        """Publica un cambio hecho sólo en los contadores compartidos.
+
+        El registro completo no se lee, así que el evento lleva sólo el id
+        y ``habitaciones_disponibles``.
+        """
+        emit_change(self, op, self.id,
+                    {'id': self.id, 'habitaciones_disponibles': before},
+                    {'id': self.id, 'habitaciones_disponibles': after})
+
     def _update_hotel_data(self, hotel: dict, nombre, estado, habitaciones):
         """Actualiza los datos de un hotel."""
         if nombre is not None:
@@ -204,14 +267,44 @@ class Hotel:
             hotel['estado'] = estado
             self.estado = estado
         if habitaciones is not None:
-            ocupadas = hotel.get('habitaciones', 0) - hotel.get(
-                'habitaciones_disponibles', 0)
+            if 'inventario' in hotel:
+                resize_rooms(hotel, habitaciones)
+            ocupadas = (hotel['habitaciones']
+                        - hotel['habitaciones_disponibles'])
             new_disponibles = habitaciones - ocupadas
             hotel['habitaciones'] = habitaciones
             hotel['habitaciones_disponibles'] = new_disponibles
             self.habitaciones = habitaciones
             self.habitaciones_disponibles = new_disponibles
 
+    def _move_to_estado_shard(self, hotels: List[Dict], hotel: Dict,
+                              output_file: Path) -> None:
+        """Mueve el hotel al shard de su nuevo estado.
+
+        El shard de destino se escribe antes de quitar el hotel del de
+        origen. Si esa escritura falla, el origen (cuyo registro ya se
+        modificó en el caché) se descarta del caché.
+
+        Raises:
+            OSError: Si el shard de destino no se pudo escribir.
+        """
+        target_file = self.output_dir / self.shards.shard_name(
+            self.table_name, self.id, self.estado)
+        if target_file == output_file:
+            return
+        moved = load_or_empty(target_file, self.table_name)
+        moved.append(hotel)
+        note_ids(target_file, [self.id])
+        try:
+            write_json(target_file, moved)
+        except OSError:
+            invalidate(output_file)
+            raise
+        hotels.remove(hotel)
+        record_estados(self.output_dir, self.table_name, self.shards,
+                       {self.id: self.estado})
+
+    @instrumented
     def modify_info(self, nombre: Optional[str] = None,
                     estado: Optional[str] = None,
                     habitaciones: Optional[int] = None) -> bool:
@@ -225,110 +318,204 @@ class Hotel:
         Returns:
             bool: True si se modificó exitosamente, False en caso contrario.
         """
-        output_file = self.output_dir / "Hotels.json"
-        success, hotels = self._load_json_file(output_file, "Hotels")
+        values = {'nombre': nombre, 'estado': estado,
+                  'habitaciones': habitaciones}
+        problem = HOTEL.check({field: value for field, value in values.items()
+                               if value is not None}, partial=True)
+        if problem is not None:
+            print(f"Error: Hotel inválido: {problem}")
+            return False
+        output_file = self._table_file()
+        success, hotels = load_records(output_file, "Hotels")
 
         if not success:
             return False
 
-        hotel_found = False
-        for hotel in hotels:
-            if isinstance(hotel, dict) and hotel.get('id') == self.id:
-                self._update_hotel_data(hotel, nombre, estado, habitaciones)
-                hotel_found = True
-                break
+        before = None
+        with phase("mutate"):
+            index = find_index(hotels, self.id, output_file)
+            hotel_found = index is not None
+            if hotel_found:
+                hotel = hotels[index]
+                self._apply_availability(hotels)
+                before = copy.deepcopy(hotel)
+                self._update_hotel_data(hotel, nombre, estado,
+                                        habitaciones)
+                if (habitaciones is not None
+                        and self.availability is not None):
+                    available = self.availability.resize(self.id,
+                                                         habitaciones)
+                    if available is not None:
+                        hotel['habitaciones_disponibles'] = available
+                        self.habitaciones_disponibles = available
 
         if not hotel_found:
             print(f"Error: No se encontró hotel con ID {self.id}")
             return False
 
         try:
-            with open(output_file, 'w', encoding='utf-8') as file:
-                json.dump(hotels, file, indent=2, ensure_ascii=False)
+            if (self.shards is not None and self.shards.by_estado
+                    and estado is not None):
+                self._move_to_estado_shard(hotels, hotel, output_file)
+            write_json(output_file, hotels)
+            emit_change(self, 'modify', self.id, before, hotel)
             print(f"Hotel con ID {self.id} modificado correctamente.")
             return True
         except (IOError, OSError) as error:
             print(f"Error al escribir en archivo: {error}")
             return False
 
-    def reserve_room(self, customer_id: int) -> bool:
+    def _reserve_shared(self, customer_id: int) -> Optional[bool]:
+        """Reserva con los contadores compartidos (``availability``).
+
+        Returns:
+            Optional[bool]: Resultado de la reservación, o None si el
+            hotel no tiene contador y se reserva en la tabla.
+        """
+        if self.availability is None:
+            return None
+        reserved = self.availability.reserve(self.id)
+        if reserved is None:
+            return None
+        if not reserved:
+            print(f"Error: No hay habitaciones disponibles "
+                  f"en el hotel {self.id}")
+            return False
+        current = self.availability.get(self.id)
+        if current is not None:
+            self.habitaciones_disponibles = current[0]
+            self._emit_counter('reserve', current[0] + 1, current[0])
+        print(f"Habitación reservada en hotel {self.id} "
+              f"para cliente {customer_id}")
+        return True
+
+    def _release_shared(self, customer_id: int) -> Optional[bool]:
+        """Libera con los contadores compartidos (``availability``).
+
+        Returns:
+            Optional[bool]: Resultado de la cancelación, o None si el
+            hotel no tiene contador y se libera en la tabla.
+        """
+        if self.availability is None:
+            return None
+        released = self.availability.release(self.id)
+        if released is None:
+            return None
+        if not released:
+            print(f"Error: No hay reservaciones que cancelar "
+                  f"en el hotel {self.id}")
+            return False
+        current = self.availability.get(self.id)
+        if current is not None:
+            self.habitaciones_disponibles = current[0]
+            self._emit_counter('release', current[0] - 1, current[0])
+        print(f"Reservación cancelada en hotel {self.id} "
+              f"para cliente {customer_id}")
+        return True
+
+    @instrumented
+    def reserve_room(self, customer_id: int) -> int:
         """Reserva una habitación en el hotel.
 
         Args:
             customer_id: ID del cliente que hace la reservación.
 
         Returns:
-            bool: True si se reservó exitosamente, False en caso contrario.
+            int: Número de la habitación asignada, o False si no se pudo
+            reservar. Con contadores compartidos (``availability``) no se
+            asigna número y se devuelve True.
         """
-        output_file = self.output_dir / "Hotels.json"
-        success, hotels = self._load_json_file(output_file, "Hotels")
+        shared = self._reserve_shared(customer_id)
+        if shared is not None:
+            return shared
+
+        output_file = self._table_file()
+        success, hotels = load_records(output_file, "Hotels")
 
         if not success:
             return False
 
-        hotel_found = False
-        for hotel in hotels:
-            if isinstance(hotel, dict) and hotel.get('id') == self.id:
-                disponibles = hotel.get('habitaciones_disponibles', 0)
-                if disponibles <= 0:
-                    print(f"Error: No hay habitaciones disponibles "
-                          f"en el hotel {self.id}")
+        before = None
+        with phase("mutate"):
+            index = find_index(hotels, self.id, output_file)
+            hotel_found = index is not None
+            if hotel_found:
+                hotel = hotels[index]
+                disponibles = hotel['habitaciones_disponibles']
+                before = copy.deepcopy(hotel)
+                room = allocate_room(hotel) if disponibles > 0 else None
+                if room is None:
+                    if disponibles <= 0:
+                        print(f"Error: No hay habitaciones disponibles "
+                              f"en el hotel {self.id}")
+                    else:
+                        print(f"Error: No hay habitaciones libres en el "
+                              f"inventario del hotel {self.id}")
                     return False
                 hotel['habitaciones_disponibles'] = disponibles - 1
                 self.habitaciones_disponibles = disponibles - 1
-                hotel_found = True
-                break
 
         if not hotel_found:
             print(f"Error: No se encontró hotel con ID {self.id}")
             return False
 
         try:
-            with open(output_file, 'w', encoding='utf-8') as file:
-                json.dump(hotels, file, indent=2, ensure_ascii=False)
-            print(f"Habitación reservada en hotel {self.id} "
+            write_json(output_file, hotels)
+            emit_change(self, 'reserve', self.id, before, hotel)
+            print(f"Habitación {room} reservada en hotel {self.id} "
                   f"para cliente {customer_id}")
-            return True
+            return room
         except (IOError, OSError) as error:
             print(f"Error al escribir en archivo: {error}")
             return False
 
-    def cancel_reservation(self, customer_id: int) -> bool:
+    @instrumented
+    def cancel_reservation(self, customer_id: int,
+                           habitacion: Optional[int] = None) -> bool:
         """Cancela una reservación y libera una habitación.
 
         Args:
             customer_id: ID del cliente que cancela la reservación.
+            habitacion: Habitación que se libera (None si la reservación
+                no tiene número asignado).
 
         Returns:
             bool: True si se canceló exitosamente, False en caso contrario.
         """
-        output_file = self.output_dir / "Hotels.json"
-        success, hotels = self._load_json_file(output_file, "Hotels")
+        shared = self._release_shared(customer_id)
+        if shared is not None:
+            return shared
+
+        output_file = self._table_file()
+        success, hotels = load_records(output_file, "Hotels")
 
         if not success:
             return False
 
-        hotel_found = False
-        for hotel in hotels:
-            if isinstance(hotel, dict) and hotel.get('id') == self.id:
-                disponibles = hotel.get('habitaciones_disponibles', 0)
-                total = hotel.get('habitaciones', 0)
+        before = None
+        with phase("mutate"):
+            index = find_index(hotels, self.id, output_file)
+            hotel_found = index is not None
+            if hotel_found:
+                hotel = hotels[index]
+                disponibles = hotel['habitaciones_disponibles']
+                total = hotel['habitaciones']
                 if disponibles >= total:
                     print(f"Error: No hay reservaciones que cancelar "
                           f"en el hotel {self.id}")
                     return False
+                before = copy.deepcopy(hotel)
+                release_room(hotel, habitacion)
                 hotel['habitaciones_disponibles'] = disponibles + 1
                 self.habitaciones_disponibles = disponibles + 1
-                hotel_found = True
-                break
 
         if not hotel_found:
             print(f"Error: No se encontró hotel con ID {self.id}")
             return False
 
         try:
-            with open(output_file, 'w', encoding='utf-8') as file:
-                json.dump(hotels, file, indent=2, ensure_ascii=False)
+            write_json(output_file, hotels)
+            emit_change(self, 'release', self.id, before, hotel)
             print(f"Reservación cancelada en hotel {self.id} "
                   f"para cliente {customer_id}")
             return True
@@ -336,39 +523,213 @@ class Hotel:
             print(f"Error al escribir en archivo: {error}")
             return False
 
+    @instrumented
+    def hold_room(self, customer_id: int, ttl: float = 300.0) -> str:
+        """Aparta una habitación durante ``ttl`` segundos.
+
+        La habitación se descuenta como en ``reserve_room``. Un apartado
+        que no se confirma con ``confirm_hold`` antes de vencer no se
+        libera en ese momento: los vencidos se liberan en la siguiente
+        llamada a ``hold_room``, ``confirm_hold`` o ``expire_holds``,
+        así que quien necesite la disponibilidad al día sin esperar otro
+        apartado debe llamar ``expire_holds`` periódicamente. Dentro de
+        una ``Session`` que se revierte, el apartado se descarta.
+
+        Args:
+            customer_id: ID del cliente que aparta.
+            ttl: Segundos que dura el apartado.
+
+        Returns:
+            str: Id del apartado, o False si el cliente no existe o no se
+            pudo apartar.
+        """
+        self.expire_holds()
+        customer = Customer(nombre="", email="", telefono="",
+                            customer_id=customer_id)
+        if not customer.display_info():
+            print(f"Error: Cliente con ID {customer_id} no existe.")
+            return False
+        room = self.reserve_room(customer_id)
+        if not room:
+            return False
+        habitacion = None if isinstance(room, bool) else room
+        hold_id = self.holds.add(self.id, customer_id, habitacion, ttl)
+        session = Session.current()
+        if session is not None:
+            # Si la sesión se revierte, la habitación no se descontó.
+            holds = self.holds
+            session.defer(lambda: None, lambda: holds.discard(hold_id))
+        print(f"Apartado {hold_id} en hotel {self.id} para cliente "
+              f"{customer_id}, vence en {ttl:g} s")
+        return hold_id
+
+    @instrumented
+    def confirm_hold(self, hold_id: str) -> int:
+        """Convierte un apartado vigente en una reservación.
+
+        Args:
+            hold_id: Id devuelto por ``hold_room``.
+
+        Returns:
+            int: Id de la reservación creada, o False si el apartado no
+            existe o ya venció.
+        """
+        self.expire_holds()
+        hold = self.holds.take(hold_id, self.id)
+        if hold is None:
+            print(f"Error: El apartado {hold_id} no existe o ya venció.")
+            return False
+        reservation = Reservation(hold['customer_id'], self.id)
+        reservation.habitacion = hold['habitacion']
+        if not reservation.insert():
+            self.cancel_reservation(hold['customer_id'], hold['habitacion'])
+            return False
+        return reservation.id
+
+    @instrumented
+    def release_hold(self, hold_id: str) -> bool:
+        """Libera un apartado antes de que venza.
+
+        Returns:
+            bool: True si se liberó, False si no existe o ya venció.
+        """
+        hold = self.holds.take(hold_id, self.id)
+        if hold is None:
+            print(f"Error: El apartado {hold_id} no existe o ya venció.")
+            return False
+        return self.cancel_reservation(hold['customer_id'],
+                                       hold['habitacion'])
+
+    @classmethod
+    def expire_holds(cls, now: Optional[float] = None) -> int:
+        """Libera la habitación de los apartados vencidos.
+
+        Args:
+            now: Hora de referencia (por defecto la del reloj de
+                ``holds``).
+
+        Returns:
+            int: Apartados liberados.
+        """
+        released = 0
+        for hold in cls.holds.expired(now):
+            hotel = cls(nombre="", estado="", habitaciones=0,
+                        hotel_id=hold['hotel_id'])
+            if hotel.cancel_reservation(hold['customer_id'],
+                                        hold['habitacion']):
+                released += 1
+        return released
+
+    @classmethod
+    @instrumented
+    def list(cls, cursor: Optional[int] = None, limit: int = 50) -> Dict:
+        """Devuelve una página de hoteles ordenados por id.
+
+        Args:
+            cursor: ``next_cursor`` de la página anterior (None para la
+                primera).
+            limit: Registros por página.
+
+        Returns:
+            Dict: ``items`` y ``next_cursor`` (None en la última página).
+        """
+        return list_page(cls, cursor, limit)
+
+    @classmethod
+    @instrumented
+    def estado_totals(cls, estado: Optional[str] = None) -> Dict:
+        """Devuelve hoteles, habitaciones y disponibles por estado.
+
+        La primera llamada calcula los totales desde la tabla; después se
+        mantienen con el flujo de cambios de ``output_dir`` y consultarlos
+        no lee archivos. Si ``output_dir`` cambia, se vuelven a calcular.
+
+        Args:
+            estado: Estado a consultar (None para todos).
+
+        Returns:
+            Dict: ``{hoteles, habitaciones, disponibles}`` del estado, o
+            ``{estado: {...}}`` para todos.
+        """
+        if (cls.aggregates is None
+                or cls.aggregates.directory != Path(cls.output_dir)):
+            cls.rebuild_aggregates()
+        return cls.aggregates.totals(estado)
+
+    @classmethod
+    @instrumented
+    def rebuild_aggregates(cls) -> bool:
+        """Recalcula desde cero los totales por estado.
+
+        ``load_table`` devuelve copias, así que aplicarles la
+        disponibilidad de los contadores no modifica el caché de
+        documentos.
+
+        Returns:
+            bool: True al terminar.
+        """
+        directory = Path(cls.output_dir)
+        hotels = load_table(cls)
+        cls(nombre="", estado="", habitaciones=0)._apply_availability(hotels)
+        if cls.aggregates is None or cls.aggregates.directory != directory:
+            cls.aggregates = EstadoAggregates(directory)
+            resubscribe((cls, 'aggregates'), cls.aggregates.apply,
+                        directory)
+        cls.aggregates.rebuild(hotels)
+        return True
+
+    @classmethod
+    @instrumented(empty_ok=True)
+    def search(cls, text: str, limit: int = 10) -> List[Dict]:
+        """Busca hoteles por nombre parcial o con errores.
+
+        Args:
+            text: Texto a buscar.
+            limit: Máximo de resultados.
+
+        Returns:
+            List[Dict]: ``{id, nombre, score}`` del más al menos
+            parecido.
+        """
+        return search_index(cls).search(text, limit)
+
 
 class Customer:
     """Clase para gestionar clientes.
 
     Attributes:
         output_dir: Directorio donde se guardan los archivos JSON.
+        table_name: Nombre base de los archivos de la tabla.
+        shards: Esquema de particionado (None para un solo archivo).
+        soft_delete: Si es True, borrar agrega una lápida en lugar de
+            reescribir la tabla (ver ``hotel_tombstones``).
+        compact_ratio: Fracción de registros muertos de un archivo a
+            partir de la cual se compacta al borrar.
+        record_cache_size: Registros en memoria al leer por id; None
+            carga la tabla completa (ver ``hotel_records``).
+        bloom_error_rate: Tasa de falsos positivos del filtro de Bloom
+            de ids que descarta ids inexistentes sin leer la tabla (ver
+            ``hotel_bloom``); None para no usarlo.
+        search_index: Índice de trigramas de ``nombre`` (se construye en
+            la primera búsqueda).
         id: Identificador único del cliente.
         nombre: Nombre del cliente.
         email: Email del cliente.
         telefono: Teléfono del cliente.
     """
     output_dir = Path("Results")
-
-    @staticmethod
-    def _load_json_file(file_path: Path, file_type: str):
-        """Carga y valida un archivo JSON."""
-        if not file_path.exists():
-            print(f"Error: El archivo {file_type}.json no existe.")
-            return False, []
-        try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                content = file.read().strip()
-                if not content:
-                    print("Error: El archivo está vacío.")
-                    return False, []
-                data = json.loads(content)
-                if not isinstance(data, list):
-                    print(f"Error: Invalid data format in {file_type}.json.")
-                    return False, []
-                return True, data
-        except json.JSONDecodeError as e:
-            print(f"Error: Invalid JSON in {file_type}.json: {e}")
-            return False, []
+    table_name = "Customers"
+    shards: Optional[ShardLayout] = None
+    soft_delete = False
+    compact_ratio = 0.25
+    record_cache_size: Optional[int] = None
+    bloom_error_rate: Optional[float] = 0.01
+    search_index: Optional[TrigramIndex] = None
+
+    def _table_file(self) -> Path:
+        """Devuelve el archivo (o shard) que contiene este registro."""
+        return record_file(self.output_dir, self.table_name, self.shards,
+                           self.id)
 
     def __init__(self, nombre: str, email: str, telefono: str,
                  customer_id: Optional[int] = None):
@@ -377,6 +738,7 @@ class Customer:
         self.email = email
         self.telefono = telefono
 
+    @instrumented
     def create(self) -> bool:
         """Crea un nuevo cliente y lo guarda en Customers.json.
 
@@ -385,48 +747,32 @@ class Customer:
         """
         try:
             self.output_dir.mkdir(parents=True, exist_ok=True)
-            output_file = self.output_dir / "Customers.json"
-
-            customers = []
-            if output_file.exists():
-                try:
-                    with open(output_file, 'r', encoding='utf-8') as file:
-                        content = file.read().strip()
-                        if content:
-                            customers = json.loads(content)
-                            if not isinstance(customers, list):
-                                print("Error: Invalid data format in "
-                                      "Customers.json. Expected a list. "
-                                      "Continuing with empty list.")
-                                customers = []
-                except json.JSONDecodeError as e:
-                    print(f"Error: Invalid JSON in Customers.json: "
-                          f"{e}. Continuing with empty list.")
-                    customers = []
-
-            new_id = 1
-            if customers:
-                try:
-                    max_id = max(
-                        c.get('id', 0) for c in customers
-                        if isinstance(c, dict)
-                    )
-                    new_id = max_id + 1
-                except (ValueError, TypeError) as e:
-                    print(f"Error calculating next ID: {e}. Using ID 1.")
-
-            self.id = new_id
-
-            customer_data = {
-                'id': self.id,
-                'nombre': self.nombre,
-                'email': self.email,
-                'telefono': self.telefono
-            }
-            customers.append(customer_data)
-
-            with open(output_file, 'w', encoding='utf-8') as file:
-                json.dump(customers, file, indent=2, ensure_ascii=False)
+            if self.shards is not None:
+                self.id = allocate_id(self.output_dir, self.table_name,
+                                      self.shards)
+            output_file = self._table_file()
+
+            customers = load_or_empty(output_file, self.table_name)
+
+            with phase("mutate"):
+                if self.shards is None:
+                    self.id = next_table_id(output_file, customers)
+
+                customer_data = {
+                    'id': self.id,
+                    'nombre': self.nombre,
+                    'email': self.email,
+                    'telefono': self.telefono
+                }
+                problem = CUSTOMER.check(customer_data)
+                if problem is not None:
+                    print(f"Error: Cliente inválido: {problem}")
+                    return False
+                customers.append(customer_data)
+
+            note_ids(output_file, [self.id])
+            write_json(output_file, customers)
+            emit_change(self, 'create', self.id, None, customer_data)
 
             print(f"Cliente creado: ID {self.id}, {self.nombre}")
             return True
@@ -435,60 +781,67 @@ class Customer:
             print(f"Error al escribir en archivo: {error}")
             return False
 
+    @instrumented
     def delete(self) -> bool:
         """Elimina un cliente.
 
         Returns:
             bool: True si se eliminó exitosamente, False en caso contrario.
         """
-        output_file = self.output_dir / "Customers.json"
-        success, customers = self._load_json_file(output_file, "Customers")
+        output_file = self._table_file()
+        success, customers = load_records(output_file, "Customers")
 
         if not success:
             return False
 
-        initial_count = len(customers)
-        customers = [c for c in customers
-                     if isinstance(c, dict) and
-                     c.get('id') != self.id]
+        removed = None
+        with phase("mutate"):
+            index = find_index(customers, self.id, output_file)
+            if index is not None:
+                removed = customers[index]
+                if not self.soft_delete:
+                    delete_at(output_file, customers, index)
 
-        if len(customers) == initial_count:
+        if index is None:
             print(f"Error: No se encontró cliente con ID {self.id}")
             return False
 
         try:
-            with open(output_file, 'w', encoding='utf-8') as file:
-                json.dump(customers, file, indent=2, ensure_ascii=False)
+            if self.soft_delete:
+                bury(self, output_file, self.id, len(customers))
+            else:
+                write_json(output_file, customers)
+            emit_change(self, 'delete', self.id, removed, None)
             print(f"Cliente con ID {self.id} eliminado correctamente.")
             return True
         except (IOError, OSError) as error:
             print(f"Error al escribir en archivo: {error}")
             return False
 
+    @instrumented
     def display_info(self) -> Dict:
         """Muestra la información del cliente.
 
         Returns:
             Dict: Diccionario con la información del cliente o {} si no existe.
         """
-        output_file = self.output_dir / "Customers.json"
-        success, customers = self._load_json_file(output_file, "Customers")
+        output_file = self._table_file()
+        success, customer = fetch_record(self, output_file, "Customers")
 
         if not success:
             return {}
 
-        for customer in customers:
-            if (isinstance(customer, dict) and
-                    customer.get('id') == self.id):
-                print(f"Cliente ID: {customer.get('id')}")
-                print(f"Nombre: {customer.get('nombre')}")
-                print(f"Email: {customer.get('email')}")
-                print(f"Teléfono: {customer.get('telefono')}")
-                return customer
+        if customer is not None:
+            print(f"Cliente ID: {customer.get('id')}")
+            print(f"Nombre: {customer.get('nombre')}")
+            print(f"Email: {customer.get('email')}")
+            print(f"Teléfono: {customer.get('telefono')}")
+            return copy_record(customer)
 
         print(f"Error: No se encontró cliente con ID {self.id}")
         return {}
 
+    @instrumented
     def modify_info(self, nombre: Optional[str] = None,
                     email: Optional[str] = None,
                     telefono: Optional[str] = None) -> bool:
@@ -502,16 +855,26 @@ class Customer:
         Returns:
             bool: True si se modificó exitosamente, False en caso contrario.
         """
-        output_file = self.output_dir / "Customers.json"
-        success, customers = self._load_json_file(output_file, "Customers")
+        values = {'nombre': nombre, 'email': email, 'telefono': telefono}
+        problem = CUSTOMER.check({field: value
+                                  for field, value in values.items()
+                                  if value is not None}, partial=True)
+        if problem is not None:
+            print(f"Error: Cliente inválido: {problem}")
+            return False
+        output_file = self._table_file()
+        success, customers = load_records(output_file, "Customers")
 
         if not success:
             return False
 
-        customer_found = False
-        for customer in customers:
-            if (isinstance(customer, dict) and
-                    customer.get('id') == self.id):
+        before = None
+        with phase("mutate"):
+            index = find_index(customers, self.id, output_file)
+            customer_found = index is not None
+            if customer_found:
+                customer = customers[index]
+                before = dict(customer)
                 if nombre is not None:
                     customer['nombre'] = nombre
                     self.nombre = nombre
@@ -521,67 +884,169 @@ class Customer:
                 if telefono is not None:
                     customer['telefono'] = telefono
                     self.telefono = telefono
-                customer_found = True
-                break
 
         if not customer_found:
             print(f"Error: No se encontró cliente con ID {self.id}")
             return False
 
         try:
-            with open(output_file, 'w', encoding='utf-8') as file:
-                json.dump(customers, file, indent=2, ensure_ascii=False)
+            write_json(output_file, customers)
+            emit_change(self, 'modify', self.id, before, customer)
             print(f"Cliente con ID {self.id} modificado correctamente.")
             return True
         except (IOError, OSError) as error:
             print(f"Error al escribir en archivo: {error}")
             return False
 
+    @classmethod
+    @instrumented
+    def list(cls, cursor: Optional[int] = None, limit: int = 50) -> Dict:
+        """Devuelve una página de clientes ordenados por id.
+
+        Args:
+            cursor: ``next_cursor`` de la página anterior (None para la
+                primera).
+            limit: Registros por página.
+
+        Returns:
+            Dict: ``items`` y ``next_cursor`` (None en la última página).
+        """
+        return list_page(cls, cursor, limit)
+
+    @classmethod
+    @instrumented(empty_ok=True)
+    def search(cls, text: str, limit: int = 10) -> List[Dict]:
+        """Busca clientes por nombre parcial o con errores.
+
+        Args:
+            text: Texto a buscar.
+            limit: Máximo de resultados.
+
+        Returns:
+            List[Dict]: ``{id, nombre, score}`` del más al menos
+            parecido.
+        """
+        return search_index(cls).search(text, limit)
+
 
 class Reservation:
     """Clase para gestionar reservaciones.
 
     Attributes:
         output_dir: Directorio donde se guardan los archivos JSON.
+        table_name: Nombre base de los archivos de la tabla.
+        shards: Esquema de particionado (None para un solo archivo).
+        soft_delete: Si es True, borrar agrega una lápida en lugar de
+            reescribir la tabla (ver ``hotel_tombstones``).
+        compact_ratio: Fracción de registros muertos de un archivo a
+            partir de la cual se compacta al borrar.
+        idempotency_capacity: Claves de idempotencia que se recuerdan.
         id: Identificador único de la reservación.
         customer_id: ID del cliente que hace la reservación.
         hotel_id: ID del hotel donde se hace la reservación.
+        habitacion: Número de habitación asignada (None si no tiene).
     """
     output_dir = Path("Results")
-
-    @staticmethod
-    def _load_json_file(file_path: Path, file_type: str):
-        """Carga y valida un archivo JSON."""
-        if not file_path.exists():
-            print(f"Error: El archivo {file_type}.json no existe.")
-            return False, []
-        try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                content = file.read().strip()
-                if not content:
-                    print("Error: El archivo está vacío.")
-                    return False, []
-                data = json.loads(content)
-                if not isinstance(data, list):
-                    print(f"Error: Invalid data format in {file_type}.json.")
-                    return False, []
-                return True, data
-        except json.JSONDecodeError as e:
-            print(f"Error: Invalid JSON in {file_type}.json: {e}")
-            return False, []
+    table_name = "Reservations"
+    shards: Optional[ShardLayout] = None
+    soft_delete = False
+    compact_ratio = 0.25
+    idempotency_capacity = 10000
+    _idempotency: Optional[IdempotencyCache] = None
+
+    def _table_file(self) -> Path:
+        """Devuelve el archivo (o shard) que contiene este registro."""
+        return record_file(self.output_dir, self.table_name, self.shards,
+                           self.id)
 
     def __init__(self, customer_id: int, hotel_id: int,
                  reservation_id: Optional[int] = None):
         self.id = reservation_id
         self.customer_id = customer_id
         self.hotel_id = hotel_id
-
-    def create(self) -> bool:
+        self.habitacion = None
+
+    @classmethod
+    def _idempotency_cache(cls) -> IdempotencyCache:
+        """Devuelve el caché de idempotencia del directorio actual."""
+        path = cls.output_dir / "Idempotency.jsonl"
+        if (cls._idempotency is None or cls._idempotency.path != path
+                or cls._idempotency.capacity != cls.idempotency_capacity):
+            cls._idempotency = IdempotencyCache(path,
+                                                cls.idempotency_capacity)
+        return cls._idempotency
+
+    def _replay_idempotent(self, key: str, previous: Dict) -> bool:
+        """Responde un reintento con el resultado guardado."""
+        if (previous.get('customer_id'), previous.get('hotel_id')) != (
+                self.customer_id, self.hotel_id):
+            print(f"Error: La clave de idempotencia {key} ya se usó para "
+                  f"otra reservación.")
+            return False
+        self.id = previous.get('id')
+        self.habitacion = previous.get('habitacion')
+        print(f"Reservación ya creada: ID {self.id}, "
+              f"Cliente {self.customer_id}, Hotel {self.hotel_id}")
+        return True
+
+    def _remember_idempotent(self, cache: IdempotencyCache,
+                             key: str) -> None:
+        """Guarda el resultado; dentro de una sesión, al escribirla.
+
+        La reservación ya está guardada, así que la clave se recuerda de
+        inmediato para responder los reintentos. Fuera de una sesión, si
+        el archivo de claves no se puede escribir, se reporta sin hacer
+        fallar la operación; dentro de una sesión la clave se olvida si
+        la sesión no se escribe.
+        """
+        result = {'id': self.id, 'customer_id': self.customer_id,
+                  'hotel_id': self.hotel_id, 'habitacion': self.habitacion}
+        session = Session.current()
+        if session is None:
+            cache.remember(key, result)
+            try:
+                cache.persist(key, result)
+            except OSError as error:
+                print(f"Advertencia: La clave {key} sólo se recordará "
+                      f"en este proceso: {error}")
+        else:
+            cache.remember(key, result)
+            session.defer(lambda: cache.persist(key, result),
+                          lambda: cache.forget(key))
+
+    @instrumented
+    def create(self, idempotency_key: Optional[str] = None) -> bool:
         """Crea una nueva reservación.
 
+        Args:
+            idempotency_key: Clave opcional del cliente; si ya se creó
+                una reservación con ella, se devuelve ese resultado sin
+                volver a reservar, y si otra petición con la misma clave
+                está en curso, se rechaza.
+
         Returns:
             bool: True si se creó exitosamente, False en caso contrario.
         """
+        if idempotency_key is None:
+            return self._create(None, None)
+        cache = self._idempotency_cache()
+        previous = cache.get(idempotency_key)
+        if previous is None and not cache.claim(idempotency_key):
+            previous = cache.get(idempotency_key)
+            if previous is None:
+                print(f"Error: Ya hay una reservación en curso con la "
+                      f"clave {idempotency_key}.")
+                return False
+        if previous is not None:
+            return self._replay_idempotent(idempotency_key, previous)
+        try:
+            return self._create(cache, idempotency_key)
+        finally:
+            cache.release(idempotency_key)
+
+    def _create(self, cache: Optional[IdempotencyCache],
+                idempotency_key: Optional[str]) -> bool:
+        """Crea la reservación y recuerda su clave, si la tiene."""
         try:
             customer = Customer(nombre="", email="", telefono="",
                                 customer_id=self.customer_id)
@@ -597,79 +1062,81 @@ class Reservation:
                 print(f"Error: Hotel con ID {self.hotel_id} no existe.")
                 return False
 
-            if not hotel.reserve_room(self.customer_id):
+            room = hotel.reserve_room(self.customer_id)
+            if not room:
+                return False
+            self.habitacion = None if isinstance(room, bool) else room
+            if not self.insert():
                 return False
+            if cache is not None:
+                self._remember_idempotent(cache, idempotency_key)
+            return True
+
+        except (IOError, OSError) as error:
+            print(f"Error al escribir en archivo: {error}")
+            return False
+
+    def insert(self) -> bool:
+        """Guarda la reservación con la habitación ya descontada.
+
+        A diferencia de ``create`` no revisa el cliente ni el hotel ni
+        descuenta la habitación; lo usa ``Hotel.confirm_hold`` para
+        convertir un apartado en reservación.
 
+        Returns:
+            bool: True si se guardó, False en caso contrario.
+        """
+        try:
             self.output_dir.mkdir(parents=True, exist_ok=True)
-            output_file = self.output_dir / "Reservations.json"
-
-            reservations = []
-            if output_file.exists():
-                try:
-                    with open(output_file, 'r', encoding='utf-8') as file:
-                        content = file.read().strip()
-                        if content:
-                            reservations = json.loads(content)
-                            if not isinstance(reservations, list):
-                                print("Error: Invalid data format in "
-                                      "Reservations.json. Expected a list. "
-                                      "Continuing with empty list.")
-                                reservations = []
-                except json.JSONDecodeError as e:
-                    print(f"Error: Invalid JSON in Reservations.json: {e}. "
-                          "Continuing with empty list.")
-                    reservations = []
-
-            new_id = 1
-            if reservations:
-                try:
-                    max_id = max(
-                        r.get('id', 0) for r in reservations
-                        if isinstance(r, dict)
-                    )
-                    new_id = max_id + 1
-                except (ValueError, TypeError) as e:
-                    print(f"Error calculating next ID: {e}. Using ID 1.")
-
-            self.id = new_id
-
-            reservation_data = {
-                'id': self.id,
-                'customer_id': self.customer_id,
-                'hotel_id': self.hotel_id
-            }
-            reservations.append(reservation_data)
-
-            with open(output_file, 'w', encoding='utf-8') as file:
-                json.dump(reservations, file, indent=2, ensure_ascii=False)
+            if self.shards is not None:
+                self.id = allocate_id(self.output_dir, self.table_name,
+                                      self.shards)
+            output_file = self._table_file()
+
+            reservations = load_or_empty(output_file, self.table_name)
+
+            with phase("mutate"):
+                if self.shards is None:
+                    self.id = next_table_id(output_file, reservations)
+
+                reservation_data = {
+                    'id': self.id,
+                    'customer_id': self.customer_id,
+                    'hotel_id': self.hotel_id,
+                    'habitacion': self.habitacion
+                }
+                reservations.append(reservation_data)
+
+            note_ids(output_file, [self.id])
+            write_json(output_file, reservations)
+            emit_change(self, 'create', self.id, None, reservation_data)
 
             print(f"Reservación creada: ID {self.id}, "
-                  f"Cliente {self.customer_id}, Hotel {self.hotel_id}")
+                  f"Cliente {self.customer_id}, Hotel {self.hotel_id}, "
+                  f"Habitación {self.habitacion}")
             return True
 
         except (IOError, OSError) as error:
             print(f"Error al escribir en archivo: {error}")
             return False
 
+    @instrumented
     def cancel(self) -> bool:
         """Cancela una reservación.
 
         Returns:
             bool: True si se canceló exitosamente, False en caso contrario.
         """
-        output_file = self.output_dir / "Reservations.json"
-        success, reservations = self._load_json_file(output_file,
-                                                      "Reservations")
+        output_file = self._table_file()
+        success, reservations = load_records(output_file, "Reservations")
 
         if not success:
             return False
 
-        reservation_found = None
-        for reservation in reservations:
-            if (isinstance(reservation, dict) and
-                    reservation.get('id') == self.id):
-                reservation_found = reservation
-                break
+        with phase("mutate"):
+            index = find_index(reservations, self.id, output_file)
+            reservation_found = (reservations[index] if index is not None
+                                 else None)
 
         if not reservation_found:
             print(f"Error: No se encontró reservación con ID {self.id}")
@@ -677,84 +1144,41 @@ class Reservation:
 
         hotel = Hotel(nombre="", estado="", habitaciones=0,
                       hotel_id=reservation_found['hotel_id'])
-        if not hotel.cancel_reservation(reservation_found['customer_id']):
+        if not hotel.cancel_reservation(reservation_found['customer_id'],
+                                        reservation_found.get('habitacion')):
             return False
 
-        reservations = [r for r in reservations
-                        if isinstance(r, dict) and
-                        r.get('id') != self.id]
-
         try:
-            with open(output_file, 'w', encoding='utf-8') as file:
-                json.dump(reservations, file, indent=2, ensure_ascii=False)
+            if self.soft_delete:
+                bury(self, output_file, self.id, len(reservations))
+            else:
+                with phase("mutate"):
+                    delete_at(output_file, reservations, index)
+                write_json(output_file, reservations)
+            emit_change(self, 'cancel', self.id, reservation_found, None)
             print(f"Reservación con ID {self.id} cancelada correctamente.")
             return True
         except (IOError, OSError) as error:
             print(f"Error al escribir en archivo: {error}")
             return False
 
+    @classmethod
+    @instrumented
+    def list(cls, cursor: Optional[int] = None, limit: int = 50) -> Dict:
+        """Devuelve una página de reservaciones ordenados por id.
+
+        Args:
+            cursor: ``next_cursor`` de la página anterior (None para la
+                primera).
+            limit: Registros por página.
+
+        Returns:
+            Dict: ``items`` y ``next_cursor`` (None en la última página).
+        """
+        return list_page(cls, cursor, limit)
+
 
 if __name__ == "__main__":
-    print("\n Sistema de reservación de hoteles")
-
-    # Crear hoteles
-    print("\n Crear Hotel ")
-    hotel1 = Hotel("Grand Palace", "Veracruz", 100)
-    hotel1.create()
-    print("\n Crear Hotel ")
-    hotel2 = Hotel("Fiesta Americana", "Puebla", 200)
-    hotel2.create()
-
-    # Mostrar información del hotel
-    print("\n Mostrar Información del Hotel")
-    hotel1.display_info()
-
-    # Modificar información del hotel
-    print("\n Modificar nombre y No. de habitaciones del hotel")
-    hotel1.modify_info(nombre="Grand Palace Hotel", habitaciones=200)
-    print("\n Verificar cambios ")
-    hotel1.display_info()
-
-    # Crear clientes
-    print("\n Crear Cliente ")
-    customer1 = Customer("Anuar", "anuar@email.com", "2227709000")
-    customer1.create()
-    print("\n Crear Cliente ")
-    customer2 = Customer("Alejandro", "Alejandro@email.com", "2227701234")
-    customer2.create()
-
-    # Mostrar información del cliente
-    print("\n Mostrar Información del Cliente ")
-    customer1.display_info()
-
-    # Modificar información del cliente
-    print("\n Modificar Cliente ")
-    customer1.modify_info(nombre="Anuar Olmos Lopez",
-                          email="anuar.olmos@email.com")
-    print("\n Verificar cambios ")
-    customer1.display_info()
-
-    # Crear reservación, utiliza internamente Hotel.reserve_room()
-    print("\n Crear Reservación")
-    reservation1 = Reservation(customer1.id, hotel1.id)
-    reservation1.create()
-
-    # Verificar habitaciones disponibles
-    print("\n Verificar habitaciones disponibles del hotel")
-    hotel1.display_info()
-
-    # Cancelar reservación
-    print("\n Cancelar reservación 1")
-    reservation1.cancel()
-
-    # Verificar que se liberó la habitación
-    print("\n Verificar habitaciones disponibles del hotel")
-    hotel1.display_info()
-
-    # Eliminar cliente
-    print("\n Eliminar cliente")
-    customer2.delete()
-
-    # Eliminar hotel
-    print("\n Eliminar Hotel")
-    hotel2.delete()
+    # ``hotel_cli`` importa este módulo; se ejecuta con ``runpy`` para no
+    # importarlo desde aquí.
+    runpy.run_module("hotel_cli", run_name="__main__", alter_sys=True)
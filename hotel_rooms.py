@@ -0,0 +1,161 @@
+"""
+Inventario de habitaciones por hotel con asignación O(1).
+
+Cada hotel guarda en su registro un campo ``inventario``::
+
+    {"siguiente": 7, "libres": [3], "fuera": [], "sin_numero": 0}
+
+- ``siguiente``: primera habitación nunca asignada; de ``siguiente`` a
+  ``habitaciones`` todas están libres.
+- ``libres``: pila de habitaciones devueltas por cancelaciones.
+- ``fuera``: habitaciones ocupadas que quedaron por encima de
+  ``habitaciones`` al reducir el hotel; no se vuelven a asignar.
+- ``sin_numero``: reservaciones anteriores al inventario (sin número de
+  habitación); ocupan las habitaciones ``1..sin_numero``.
+
+Asignar toma de la pila o de ``siguiente`` y liberar empuja a la pila, ambos
+en O(1). Cambiar el número de habitaciones sólo revisa la pila y el rango
+que cambia, nunca las reservaciones. El inventario se crea la primera vez
+que se usa, a partir de ``habitaciones`` y ``habitaciones_disponibles``.
+
+Quien cambia ``habitaciones_disponibles`` sin asignar ni liberar (p. ej.
+``bulk_update`` o ``hotel_check --repair``) debe reconstruir el
+inventario con ``rebuild_inventory`` a partir de las reservaciones, o
+llamar a ``sync_inventory`` para descartarlo si ya no coincide.
+"""
+from typing import Dict, Iterable, List, Optional
+
+
+def inventory(hotel: Dict) -> Dict:
+    """Devuelve el inventario del hotel, creándolo si no existe.
+
+    Las habitaciones ocupadas antes de existir el inventario se toman
+    como ``1..ocupadas``.
+    """
+    rooms = hotel.get('inventario')
+    if rooms is None:
+        occupied = max(hotel.get('habitaciones', 0)
+                       - hotel.get('habitaciones_disponibles', 0), 0)
+        rooms = {'siguiente': occupied + 1, 'libres': [], 'fuera': [],
+                 'sin_numero': occupied}
+        hotel['inventario'] = rooms
+    return rooms
+
+
+def allocate_room(hotel: Dict) -> Optional[int]:
+    """Asigna una habitación libre.
+
+    Returns:
+        Optional[int]: Número de habitación, o None si no hay libres.
+    """
+    rooms = inventory(hotel)
+    if rooms['libres']:
+        return rooms['libres'].pop()
+    if rooms['siguiente'] <= hotel.get('habitaciones', 0):
+        rooms['siguiente'] += 1
+        return rooms['siguiente'] - 1
+    return None
+
+
+def release_room(hotel: Dict, room: Optional[int] = None) -> None:
+    """Devuelve una habitación al inventario.
+
+    Args:
+        hotel: Registro del hotel.
+        room: Habitación liberada; None para una reservación sin número,
+            que libera la última de las habitaciones ``sin_numero``.
+    """
+    rooms = inventory(hotel)
+    if room is None:
+        if not rooms['sin_numero']:
+            return
+        room = rooms['sin_numero']
+        rooms['sin_numero'] -= 1
+    if room in rooms['fuera']:
+        rooms['fuera'].remove(room)
+    elif room <= hotel.get('habitaciones', 0):
+        rooms['libres'].append(room)
+
+
+def resize_rooms(hotel: Dict, habitaciones: int) -> None:
+    """Ajusta el inventario al nuevo número de habitaciones.
+
+    Debe llamarse antes de actualizar ``hotel['habitaciones']``.
+    """
+    rooms = inventory(hotel)
+    old = hotel.get('habitaciones', 0)
+    if habitaciones < old:
+        free = set(rooms['libres'])
+        rooms['libres'] = [room for room in rooms['libres']
+                           if room <= habitaciones]
+        rooms['fuera'].extend(
+            room for room in range(habitaciones + 1,
+                                   min(rooms['siguiente'], old + 1))
+            if room not in free)
+        rooms['siguiente'] = min(rooms['siguiente'], habitaciones + 1)
+    elif habitaciones > old:
+        # Sólo puede haber habitaciones "fuera" si siguiente == old + 1;
+        # las nuevas habitaciones sin ocupar quedan cubiertas por
+        # ``siguiente`` salvo las que estén por debajo de una ocupada.
+        held = {room for room in rooms['fuera'] if room <= habitaciones}
+        if held:
+            top = max(held)
+            rooms['libres'].extend(room for room in range(top, old, -1)
+                                   if room not in held)
+            rooms['fuera'] = [room for room in rooms['fuera']
+                              if room > habitaciones]
+            rooms['siguiente'] = top + 1
+
+
+def free_rooms(hotel: Dict) -> List[int]:
+    """Lista las habitaciones libres del hotel, en orden."""
+    rooms = inventory(hotel)
+    unused = range(rooms['siguiente'], hotel.get('habitaciones', 0) + 1)
+    return sorted(set(rooms['libres']).union(unused))
+
+
+def free_count(hotel: Dict) -> int:
+    """Habitaciones libres según el inventario del hotel."""
+    rooms = inventory(hotel)
+    return len(rooms['libres']) + max(
+        hotel.get('habitaciones', 0) - rooms['siguiente'] + 1, 0)
+
+
+def rebuild_inventory(hotel: Dict, taken: Iterable[Optional[int]]) -> Dict:
+    """Reconstruye el inventario a partir de las reservaciones.
+
+    Args:
+        hotel: Registro del hotel.
+        taken: Habitación de cada reservación vigente del hotel (None
+            para las que no tienen número).
+
+    Returns:
+        Dict: El inventario nuevo, ya guardado en el registro.
+    """
+    total = hotel.get('habitaciones', 0)
+    taken = list(taken)
+    unnumbered = sum(1 for room in taken if room is None)
+    numbered = {room for room in taken if room is not None}
+    occupied = numbered.union(range(1, unnumbered + 1))
+    inside = {room for room in occupied if room <= total}
+    following = max(inside, default=0) + 1
+    rooms = {'siguiente': following,
+             # Se asignan primero las más bajas (``pop`` toma la última).
+             'libres': [room for room in range(following - 1, 0, -1)
+                        if room not in inside],
+             'fuera': sorted(room for room in numbered if room > total),
+             'sin_numero': unnumbered}
+    hotel['inventario'] = rooms
+    return rooms
+
+
+def sync_inventory(hotel: Dict) -> None:
+    """Descarta el inventario si no coincide con la disponibilidad.
+
+    Sin las reservaciones no se sabe qué habitaciones quedaron libres;
+    el inventario se vuelve a crear (``inventory``) la próxima vez que
+    se usa.
+    """
+    if ('inventario' in hotel
+            and free_count(hotel) != hotel.get('habitaciones_disponibles')):
+        del hotel['inventario']
@@ -0,0 +1,149 @@
+"""
+Esquemas de los registros de hoteles, clientes y reservaciones.
+
+Cada tabla declara los campos de sus registros y su tipo. A partir de la
+declaración se arma (una vez) una función que recorre la lista de
+registros comparando tuplas ``(campo, tipo)``, así que validar un millón
+de registros cuesta una fracción de decodificar el JSON.
+
+La tabla se valida una vez al leerla del disco (``read_document`` con
+``schema``) y el resultado se recuerda en el caché de documentos mientras
+el archivo no cambie. Los registros inválidos no hacen fallar la tabla:
+se ponen en cuarentena (ver ``hotel_storage.quarantine``) y las
+operaciones siguen con el resto. Los valores nuevos se revisan con
+``check`` antes de agregarlos o modificarlos, de modo que las operaciones
+pueden usar ``registro['campo']`` sin comprobar tipos ni valores por
+defecto.
+
+Los campos requeridos deben estar y tener el tipo declarado; los
+opcionales pueden faltar o ser None. Los enteros no aceptan ``bool``. Se
+permiten campos extra.
+"""
+from typing import Dict, List, Optional, Tuple
+
+
+class SchemaError(ValueError):
+    """Registro que no cumple el esquema de su tabla."""
+
+
+class Schema:
+    """Campos y tipos de los registros de una tabla.
+
+    Attributes:
+        table: Nombre de la tabla (para mensajes de error).
+        required: ``{campo: tipo}`` que todo registro debe tener.
+        optional: ``{campo: tipo}`` que pueden faltar o ser None.
+    """
+
+    def __init__(self, table: str, required: Dict[str, type],
+                 optional: Optional[Dict[str, type]] = None):
+        self.table = table
+        self.required = dict(required)
+        self.optional = dict(optional or {})
+        self._invalid = self._compile()
+
+    def _compile(self):
+        """Arma la función que devuelve las posiciones inválidas.
+
+        Los tipos se comparan con ``__class__`` (tipo exacto) para que
+        ``bool`` no pase por ``int``.
+        """
+        required = tuple(self.required.items())
+        optional = tuple(self.optional.items())
+
+        def is_valid(record) -> bool:
+            if record.__class__ is not dict:
+                return False
+            for field, field_type in required:
+                if record.get(field).__class__ is not field_type:
+                    return False
+            for field, field_type in optional:
+                value = record.get(field)
+                if value is not None and value.__class__ is not field_type:
+                    return False
+            return True
+
+        def invalid(records) -> List[int]:
+            return [index for index, record in enumerate(records)
+                    if not is_valid(record)]
+
+        return invalid
+
+    def validate(self, records) -> None:
+        """Valida registros nuevos antes de agregarlos a una tabla.
+
+        Raises:
+            SchemaError: Con el primer registro inválido.
+        """
+        invalid = self._invalid(records)
+        if invalid:
+            index = invalid[0]
+            raise SchemaError(
+                f"registro {index + 1}: {self.check(records[index])}")
+
+    def quarantine(self, records) -> List[Tuple[int, object, str]]:
+        """Quita de una tabla leída los registros que no cumplen el esquema.
+
+        La lista se modifica en su lugar. Un documento que no es una
+        lista no se revisa aquí; quien lo lee ya lo reporta como formato
+        inválido.
+
+        Returns:
+            List[Tuple[int, object, str]]: ``(posición, registro,
+            problema)`` de cada registro quitado; la posición empieza en 1.
+        """
+        if not isinstance(records, list):
+            return []
+        invalid = self._invalid(records)
+        if not invalid:
+            return []
+        rejected = [(index + 1, records[index], self.check(records[index]))
+                    for index in invalid]
+        skipped = set(invalid)
+        records[:] = [record for index, record in enumerate(records)
+                      if index not in skipped]
+        return rejected
+
+    def check(self, record, partial: bool = False) -> Optional[str]:
+        """Revisa un registro y explica el primer problema.
+
+        Args:
+            record: Registro a revisar.
+            partial: Si es True sólo se revisan los campos presentes
+                (p. ej. los valores de una modificación).
+
+        Returns:
+            Optional[str]: El problema encontrado, o None si es válido.
+        """
+        if record.__class__ is not dict:
+            return "no es un objeto"
+        for field, field_type in self.required.items():
+            if field not in record:
+                if partial:
+                    continue
+                return f"falta el campo '{field}'"
+            value = record[field]
+            if value.__class__ is not field_type:
+                return (f"'{field}' debe ser {field_type.__name__}, "
+                        f"no {type(value).__name__}")
+        for field, field_type in self.optional.items():
+            value = record.get(field)
+            if value is not None and value.__class__ is not field_type:
+                return (f"'{field}' debe ser {field_type.__name__}, "
+                        f"no {type(value).__name__}")
+        return None
+
+
+HOTEL = Schema("Hotels",
+               {'id': int, 'nombre': str, 'estado': str,
+                'habitaciones': int, 'habitaciones_disponibles': int},
+               {'inventario': dict})
+CUSTOMER = Schema("Customers",
+                  {'id': int, 'nombre': str, 'email': str,
+                   'telefono': str})
+RESERVATION = Schema("Reservations",
+                     {'id': int, 'customer_id': int, 'hotel_id': int},
+                     {'habitacion': int})
+
+SCHEMAS = {schema.table: schema
+           for schema in (HOTEL, CUSTOMER, RESERVATION)}
@@ -0,0 +1,231 @@
+"""
+Búsqueda aproximada por nombre con un índice de trigramas.
+
+Cada nombre se normaliza (minúsculas, sin acentos ni signos) y se parte en
+palabras; cada palabra se parte en trigramas con relleno al inicio y al
+final como ``pg_trgm``: ``"ana"`` produce ``"  a"``, ``" an"``, ``"ana"`` y
+``"na "``.
+
+El índice tiene dos niveles: trigrama -> palabras del vocabulario y
+palabra -> ids de registros. Los nombres repiten mucho las mismas
+palabras (un millón de clientes comparten unos cuantos miles de nombres y
+apellidos), así que la comparación por trigramas se hace sobre el
+vocabulario, que es pequeño, y no sobre cada registro. Para cada palabra
+buscada se toman las palabras del vocabulario con similitud de Jaccard de
+trigramas de al menos ``min_similarity``; un registro se califica con el
+promedio, por palabra buscada, de la mejor similitud que contiene (0 si
+no contiene ninguna parecida).
+
+Las combinaciones de palabras parecidas se recorren de mayor a menor
+calificación y cada una sólo cuesta la intersección de los conjuntos de
+ids de sus palabras; la búsqueda termina al juntar ``limit`` registros,
+sin calificar uno por uno los miles que comparten un nombre común.
+
+El índice se mantiene con el flujo de cambios (``apply``) y vive en la
+memoria del proceso; ``rebuild`` lo reconstruye desde la tabla. Cada
+índice corresponde a las tablas de un directorio (``directory``).
+"""
+import heapq
+import threading
+import unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from hotel_changes import ChangeEvent
+
+
+def normalize(text: str) -> str:
+    """Pasa a minúsculas y quita acentos y signos de puntuación."""
+    decomposed = unicodedata.normalize('NFKD', str(text).lower())
+    return "".join(
+        char if char.isalnum() else " "
+        for char in decomposed if not unicodedata.combining(char))
+
+
+def words(text: str) -> List[str]:
+    """Devuelve las palabras normalizadas del texto, sin repetir."""
+    return list(dict.fromkeys(normalize(text).split()))
+
+
+def trigrams(word: str) -> Set[str]:
+    """Devuelve los trigramas de una palabra normalizada."""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _best_combinations(options: List[List[Tuple[Optional[str], float]]]
+                       ) -> Iterator[Tuple[list, float]]:
+    """Genera combinaciones (una opción por lista) de mayor a menor suma.
+
+    Cada lista debe venir ordenada de mayor a menor similitud. Las
+    combinaciones se generan bajo demanda con un heap, así que quien sólo
+    necesita las primeras no paga el producto completo.
+    """
+    def total(indexes):
+        return sum(options[i][j][1] for i, j in enumerate(indexes))
+
+    start = (0,) * len(options)
+    heap = [(-total(start), start)]
+    queued = {start}
+    while heap:
+        negative, indexes = heapq.heappop(heap)
+        yield [options[i][j] for i, j in enumerate(indexes)], -negative
+        for i, j in enumerate(indexes):
+            if j + 1 < len(options[i]):
+                following = indexes[:i] + (j + 1,) + indexes[i + 1:]
+                if following not in queued:
+                    queued.add(following)
+                    heapq.heappush(heap, (-total(following), following))
+
+
+# El índice guarda los trigramas, los textos y su estado de carga.
+class TrigramIndex:  # pylint: disable=too-many-instance-attributes
+    """Índice de trigramas sobre un campo de texto de una tabla.
+
+    Attributes:
+        table: Tabla cuyos cambios se aplican (``Hotels``, ``Customers``).
+        field: Campo indexado.
+        min_similarity: Similitud mínima entre una palabra buscada y una
+            del vocabulario para considerarlas iguales.
+        directory: Directorio de la tabla indexada (None si no se
+            indicó).
+    """
+
+    def __init__(self, table: str, field: str = 'nombre',
+                 min_similarity: float = 0.3,
+                 directory: Optional[Path] = None):
+        if not 0 < min_similarity <= 1:
+            raise ValueError("min_similarity debe estar en (0, 1].")
+        self.table = table
+        self.directory = None if directory is None else Path(directory)
+        self.field = field
+        self.min_similarity = min_similarity
+        self._grams: Dict[str, Set[str]] = {}
+        self._words: Dict[str, Set[int]] = {}
+        self._sizes: Dict[str, int] = {}
+        self._texts: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    @property
+    def vocabulary(self) -> int:
+        """Número de palabras distintas indexadas."""
+        return len(self._words)
+
+    def add(self, record_id: int, text: Optional[str]) -> None:
+        """Indexa (o reemplaza) el texto de un registro."""
+        with self._lock:
+            self._remove(record_id)
+            if text is None:
+                return
+            self._texts[record_id] = text
+            for word in words(text):
+                ids = self._words.get(word)
+                if ids is None:
+                    ids = self._words[word] = set()
+                    grams = trigrams(word)
+                    self._sizes[word] = len(grams)
+                    for gram in grams:
+                        self._grams.setdefault(gram, set()).add(word)
+                ids.add(record_id)
+
+    def remove(self, record_id: int) -> None:
+        """Quita un registro del índice."""
+        with self._lock:
+            self._remove(record_id)
+
+    def rebuild(self, records: Iterable[Dict]) -> None:
+        """Reconstruye el índice desde los registros de la tabla."""
+        with self._lock:
+            self._grams = {}
+            self._words = {}
+            self._sizes = {}
+            self._texts = {}
+        for record in records:
+            if isinstance(record, dict) and 'id' in record:
+                self.add(record['id'], record.get(self.field))
+
+    def apply(self, event: ChangeEvent) -> None:
+        """Actualiza el índice con un cambio de su tabla."""
+        if event.table != self.table:
+            return
+        if event.after is None:
+            self.remove(event.id)
+        elif (self.field in event.after and (
+                event.before is None
+                or event.before.get(self.field) != event.after[self.field])):
+            self.add(event.id, event.after[self.field])
+
+    def search(self, text: str, limit: int = 10) -> List[Dict]:
+        """Busca los registros con el texto más parecido.
+
+        Args:
+            text: Texto parcial o con errores.
+            limit: Máximo de resultados.
+
+        Returns:
+            List[Dict]: ``{id, <campo>, score}`` del más al menos
+            parecido; ``score`` va de 0 a 1 (1 si coinciden todas las
+            palabras).
+        """
+        if limit < 1:
+            raise ValueError("limit debe ser mayor que 0.")
+        wanted = words(text)
+        results: List[Dict] = []
+        seen: Set[int] = set()
+        with self._lock:
+            options = [self._similar(word) + [(None, 0.0)]
+                       for word in wanted]
+            for combination, total in _best_combinations(options):
+                groups = sorted((self._words[word]
+                                 for word, _ in combination
+                                 if word is not None), key=len)
+                if not groups:
+                    break
+                found = groups[0].intersection(*groups[1:]) - seen
+                for record_id in heapq.nsmallest(limit - len(results),
+                                                 found):
+                    results.append({'id': record_id,
+                                    self.field: self._texts[record_id],
+                                    'score': round(total / len(wanted), 4)})
+                if len(results) >= limit:
+                    break
+                seen |= found
+        return results
+
+    def _similar(self, word: str) -> List[Tuple[str, float]]:
+        """Palabras del vocabulario parecidas a ``word``, de más a menos."""
+        grams = trigrams(word)
+        common = Counter()
+        for gram in grams:
+            common.update(self._grams.get(gram, ()))
+        similar = []
+        for candidate, shared in common.items():
+            similarity = shared / (len(grams) + self._sizes[candidate]
+                                   - shared)
+            if similarity >= self.min_similarity:
+                similar.append((candidate, similarity))
+        similar.sort(key=lambda item: (-item[1], item[0]))
+        return similar
+
+    def _remove(self, record_id: int) -> None:
+        text = self._texts.pop(record_id, None)
+        if text is None:
+            return
+        for word in words(text):
+            ids = self._words.get(word)
+            if ids is None:
+                continue
+            ids.discard(record_id)
+            if not ids:
+                del self._words[word]
+                del self._sizes[word]
+                for gram in trigrams(word):
+                    vocabulary = self._grams.get(gram)
+                    if vocabulary is not None:
+                        vocabulary.discard(word)
+                        if not vocabulary:
+                            del self._grams[gram]
@@ -0,0 +1,317 @@
+"""
+Servicio HTTP local de reservaciones.
+
+Mantiene las tablas de hoteles, clientes y reservaciones cargadas en
+memoria (una ``Session`` de larga vida) y expone las operaciones de
+``Hotel``, ``Customer`` y ``Reservation`` por HTTP/1.1 con conexiones
+keep-alive. Cada petición que modifica datos se persiste al terminar en
+los mismos archivos JSON que usa la biblioteca; el servicio asume que es
+el único proceso que escribe en ``output_dir`` mientras está activo.
+
+Al arrancar, las tablas se recuperan de ``Checkpoint.marshal`` y de los
+cambios posteriores (``hotel_checkpoint``) en lugar de decodificar el
+JSON, y mientras corre se escribe un checkpoint cada
+``--checkpoint-interval`` segundos y otro al detenerse.
+
+Rutas (cuerpos y respuestas en JSON):
+
+    GET    /hotels?cursor=&limit=  (igual para customers y reservations)
+    GET    /hotels?q=texto&limit=  (búsqueda por nombre; igual customers)
+    POST   /hotels                 {nombre, estado, habitaciones}
+    GET    /hotels/<id>
+    PATCH  /hotels/<id>            {nombre?, estado?, habitaciones?}
+    DELETE /hotels/<id>
+    POST   /customers              {nombre, email, telefono}
+    GET    /customers/<id>
+    PATCH  /customers/<id>         {nombre?, email?, telefono?}
+    DELETE /customers/<id>
+    POST   /reservations           {customer_id, hotel_id,
+                                    idempotency_key?}
+    DELETE /reservations/<id>
+    GET    /estados                (totales de habitaciones por estado)
+    GET    /stats
+
+Uso:
+    python hotel_server.py [--host 127.0.0.1] [--port 8080]
+                           [--checkpoint-interval 60]
+"""
+import argparse
+import contextlib
+import io
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from pathlib import Path
+from typing import Callable, Dict, Tuple
+
+import hotel_metrics
+from hotel_checkpoint import Checkpointer, recover, write_checkpoint
+from hotel_reservation import Customer, Hotel, Reservation, Session
+
+
+class BookingEngine:
+    """Motor en memoria que ejecuta las operaciones una a la vez.
+
+    Attributes:
+        session: Sesión de larga vida con las tablas cargadas.
+    """
+
+    def __init__(self):
+        self.session = Session()
+        self._lock = threading.Lock()
+
+    def run(self, operation: Callable):
+        """Ejecuta una operación sobre las tablas en memoria.
+
+        Los cambios se escriben a disco al terminar la operación y los
+        mensajes que imprime se devuelven junto con el resultado.
+
+        Returns:
+            tuple: (resultado, mensajes impresos).
+
+        Raises:
+            OSError: Si los cambios no se pudieron escribir (la sesión se
+                revierte y las tablas se vuelven a leer de disco).
+        """
+        output = io.StringIO()
+        with self._lock, contextlib.redirect_stdout(output):
+            with self.session:
+                result = operation()
+        return result, output.getvalue().splitlines()
+
+    def create_hotel(self, body: Dict):
+        """Crea un hotel y devuelve su id (None si falla)."""
+        hotel = Hotel(body['nombre'], body['estado'],
+                      int(body['habitaciones']))
+        return hotel.id if hotel.create() else None
+
+    def create_customer(self, body: Dict):
+        """Crea un cliente y devuelve su id (None si falla)."""
+        customer = Customer(body['nombre'], body['email'], body['telefono'])
+        return customer.id if customer.create() else None
+
+    def create_reservation(self, body: Dict, idempotency_key=None):
+        """Crea una reservación y devuelve su id (None si falla).
+
+        La clave de idempotencia puede venir en el cuerpo
+        (``idempotency_key``) o en el encabezado ``Idempotency-Key``.
+        """
+        reservation = Reservation(int(body['customer_id']),
+                                  int(body['hotel_id']))
+        key = body.get('idempotency_key', idempotency_key)
+        return reservation.id if reservation.create(key) else None
+
+    def checkpoint(self) -> Dict[str, int]:
+        """Escribe un checkpoint de las tablas entre dos operaciones."""
+        return self.run(lambda: write_checkpoint(Hotel.output_dir))[0]
+
+
+def _failed(result) -> bool:
+    """Indica si una operación falló.
+
+    Las operaciones fallidas devuelven None, False o, las de consulta de
+    un registro (``display_info``), un diccionario vacío. Otros valores
+    falsos, como una lista vacía o 0, son resultados exitosos.
+    """
+    return (result is None or result is False
+            or (isinstance(result, dict) and not result))
+
+
+def _hotel(record_id: int) -> Hotel:
+    return Hotel(nombre="", estado="", habitaciones=0, hotel_id=record_id)
+
+
+def _customer(record_id: int) -> Customer:
+    return Customer(nombre="", email="", telefono="",
+                    customer_id=record_id)
+
+
+class BookingHandler(BaseHTTPRequestHandler):
+    """Traduce peticiones HTTP a operaciones del motor."""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    engine: BookingEngine = None
+    quiet = True
+
+    # pylint: disable-next=redefined-builtin
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+    def _send(self, status: int, payload: Dict) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self) -> Dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        body = json.loads(self.rfile.read(length).decode('utf-8'))
+        if not isinstance(body, dict):
+            raise ValueError("El cuerpo debe ser un objeto JSON.")
+        return body
+
+    def _route(self) -> Tuple[str, int]:
+        parts = [part for part in self.path.split('?')[0].split('/') if part]
+        if len(parts) == 1:
+            return parts[0], None
+        if len(parts) == 2 and parts[1].isdigit():
+            return parts[0], int(parts[1])
+        return "", None
+
+    def _page_options(self) -> Dict:
+        query = parse_qs(urlsplit(self.path).query)
+        return {name: int(query[name][-1])
+                for name in ('cursor', 'limit') if name in query}
+
+    def _list(self, entity) -> Dict:
+        """Lista por páginas o, con ``?q=``, busca por nombre."""
+        query = parse_qs(urlsplit(self.path).query)
+        if 'q' not in query:
+            return entity.list(**self._page_options())
+        limit = int(query['limit'][-1]) if 'limit' in query else 10
+        return {'items': entity.search(query['q'][-1], limit)}
+
+    def _operation(self, method: str, body: Dict):
+        """Devuelve la operación a ejecutar y el código de éxito."""
+        resource, record_id = self._route()
+        engine = self.engine
+        routes = {
+            ('GET', 'hotels', False):
+                (lambda: self._list(Hotel), 200),
+            ('GET', 'customers', False):
+                (lambda: self._list(Customer), 200),
+            ('GET', 'reservations', False):
+                (lambda: Reservation.list(**self._page_options()), 200),
+            ('GET', 'estados', False):
+                (lambda: {'estados': Hotel.estado_totals()}, 200),
+            ('POST', 'hotels', False):
+                (lambda: engine.create_hotel(body), 201),
+            ('GET', 'hotels', True):
+                (lambda: _hotel(record_id).display_info(), 200),
+            ('PATCH', 'hotels', True):
+                (lambda: _hotel(record_id).modify_info(**body), 200),
+            ('DELETE', 'hotels', True):
+                (lambda: _hotel(record_id).delete(), 200),
+            ('POST', 'customers', False):
+                (lambda: engine.create_customer(body), 201),
+            ('GET', 'customers', True):
+                (lambda: _customer(record_id).display_info(), 200),
+            ('PATCH', 'customers', True):
+                (lambda: _customer(record_id).modify_info(**body), 200),
+            ('DELETE', 'customers', True):
+                (lambda: _customer(record_id).delete(), 200),
+            ('POST', 'reservations', False):
+                (lambda: engine.create_reservation(
+                    body, self.headers.get('Idempotency-Key')), 201),
+            ('DELETE', 'reservations', True):
+                (lambda: Reservation(0, 0, reservation_id=record_id)
+                 .cancel(), 200),
+        }
+        return routes.get((method, resource, record_id is not None))
+
+    def _handle(self, method: str) -> None:
+        if method == 'GET' and self.path == '/stats':
+            self._send(200, {'ok': True, 'data': hotel_metrics.stats()})
+            return
+        try:
+            body = self._body()
+            route = self._operation(method, body)
+            if route is None:
+                self._send(404, {'ok': False,
+                                 'mensajes': ["Ruta no encontrada."]})
+                return
+            operation, success_status = route
+            result, messages = self.engine.run(operation)
+        except (ValueError, KeyError, TypeError) as error:
+            self._send(400, {'ok': False, 'mensajes': [str(error)]})
+            return
+        except OSError as error:
+            # La sesión no se pudo escribir y se revirtió.
+            self._send(500, {'ok': False, 'mensajes': [str(error)]})
+            return
+        if _failed(result):
+            status = 404 if method == 'GET' else 422
+            self._send(status, {'ok': False, 'mensajes': messages})
+            return
+        data = {'id': result} if success_status == 201 else result
+        self._send(success_status, {'ok': True, 'data': data,
+                                    'mensajes': messages})
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Atiende GET."""
+        self._handle('GET')
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Atiende POST."""
+        self._handle('POST')
+
+    def do_PATCH(self):  # pylint: disable=invalid-name
+        """Atiende PATCH."""
+        self._handle('PATCH')
+
+    def do_DELETE(self):  # pylint: disable=invalid-name
+        """Atiende DELETE."""
+        self._handle('DELETE')
+
+
+def make_server(host: str = "127.0.0.1", port: int = 8080,
+                engine: BookingEngine = None) -> ThreadingHTTPServer:
+    """Crea el servidor HTTP (sin iniciarlo).
+
+    Args:
+        host: Dirección donde escuchar.
+        port: Puerto (0 elige uno libre).
+        engine: Motor a usar; por defecto uno nuevo.
+
+    Returns:
+        ThreadingHTTPServer: Servidor listo para ``serve_forever()``.
+    """
+    handler = type("Handler", (BookingHandler,),
+                   {'engine': engine or BookingEngine()})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv=None) -> int:
+    """Punto de entrada de la línea de comandos."""
+    parser = argparse.ArgumentParser(
+        description="Servicio HTTP local de reservaciones.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--output-dir", type=Path)
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--checkpoint-interval", type=float, default=60.0,
+                        help="Segundos entre checkpoints (0 para no "
+                             "escribirlos).")
+    args = parser.parse_args(argv)
+
+    if args.output_dir is not None:
+        Hotel.output_dir = Customer.output_dir = args.output_dir
+        Reservation.output_dir = args.output_dir
+    BookingHandler.quiet = not args.verbose
+    for table, count in recover(Hotel.output_dir).items():
+        print(f"{table}: {count} registros recuperados del checkpoint.")
+    engine = BookingEngine()
+    checkpointer = Checkpointer(engine.checkpoint)
+    if args.checkpoint_interval > 0:
+        checkpointer.start(args.checkpoint_interval)
+    server = make_server(args.host, args.port, engine)
+    print(f"Servicio en http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.checkpoint_interval > 0:
+            checkpointer.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,418 @@
+"""
+Unidad de trabajo (``Session``) y acceso a los registros de las tablas.
+
+Las funciones de este módulo leen y escriben los archivos JSON de las
+tablas a través de la sesión activa del hilo, si la hay: dentro de una
+sesión cada archivo se lee una sola vez, se modifica en memoria y se
+escribe al cerrarla. Fuera de una sesión leen del caché de
+``hotel_storage`` y escriben de inmediato.
+"""
+import copy
+import json
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+from hotel_bloom import writing
+from hotel_changes import publish
+from hotel_metrics import instrumented
+from hotel_schema import SCHEMAS
+from hotel_storage import (invalidate, quarantine_max_id, read_shared,
+                           write_document)
+from hotel_tombstones import tombstones
+
+
+def file_exists(file_path: Path) -> bool:
+    """Indica si un archivo existe en disco o en la sesión activa."""
+    session = Session.current()
+    if session is not None and session.contains(file_path):
+        return True
+    return file_path.exists()
+
+
+def read_json(file_path: Path, schema=None):
+    """Lee y decodifica un archivo JSON con ``read_shared``.
+
+    El documento es el del caché de ``hotel_storage``: quien lo modifica
+    lo escribe con ``write_json``. Dentro de una sesión el archivo se
+    lee una sola vez y las siguientes lecturas devuelven el conjunto de
+    trabajo en memoria.
+
+    Args:
+        file_path: Ruta al archivo JSON.
+        schema: Esquema de los registros (ver ``hotel_schema``).
+
+    Returns:
+        El contenido decodificado, o None si el archivo está vacío.
+
+    Raises:
+        json.JSONDecodeError: Si el contenido no es JSON válido.
+    """
+    session = Session.current()
+    if session is not None:
+        if not session.contains(file_path):
+            session.load(file_path, read_shared(file_path, schema))
+        return session.get(file_path)
+    return read_shared(file_path, schema)
+
+
+def write_json(file_path: Path, data) -> None:
+    """Codifica y escribe un archivo JSON con ``write_document``.
+
+    Dentro de una sesión los datos sólo se marcan como pendientes y se
+    escriben una vez al cerrar la sesión.
+
+    Args:
+        file_path: Ruta al archivo JSON.
+        data: Datos a guardar.
+    """
+    session = Session.current()
+    if session is not None:
+        session.put(file_path, data)
+        return
+    with writing(file_path):
+        write_document(file_path, data)
+
+
+def load_records(file_path: Path, file_type: str):
+    """Carga y valida un archivo de tabla que debe existir.
+
+    Los registros de las tablas con esquema (``hotel_schema.SCHEMAS``) se
+    validan al leer el archivo, así que quien los usa puede confiar en
+    sus campos y tipos; los inválidos se reportan y se ponen en
+    cuarentena (``hotel_storage.quarantine``) sin hacer fallar la tabla.
+
+    Args:
+        file_path: Ruta al archivo JSON.
+        file_type: Tipo de archivo para mensajes de error.
+
+    Returns:
+        tuple: (success: bool, data: list)
+    """
+    if not file_exists(file_path):
+        print(f"Error: El archivo {file_type}.json no existe.")
+        return False, []
+
+    try:
+        data = read_json(file_path, SCHEMAS.get(file_type))
+        if data is None:
+            print("Error: El archivo está vacío.")
+            return False, []
+        if not isinstance(data, list):
+            print(f"Error: Invalid data format in {file_type}.json.")
+            return False, []
+        return True, data
+    except json.JSONDecodeError as e:
+        print(f"Error: Invalid JSON in {file_type}.json: {e}")
+        return False, []
+
+
+def load_or_empty(file_path: Path, file_type: str) -> list:
+    """Carga un archivo de tabla para agregarle registros.
+
+    Un archivo ausente, vacío o inválido se toma como una lista vacía.
+    Los registros que no cumplen el esquema se ponen en cuarentena y no
+    se pierden al reescribir la tabla.
+
+    Args:
+        file_path: Ruta al archivo JSON.
+        file_type: Tipo de archivo para mensajes de error.
+
+    Returns:
+        list: Registros del archivo.
+    """
+    if not file_exists(file_path):
+        return []
+    try:
+        records = read_json(file_path, SCHEMAS.get(file_type))
+    except json.JSONDecodeError as e:
+        print(f"Error: Invalid JSON in {file_type}.json: {e}. "
+              "Continuing with empty list.")
+        return []
+    if records is None:
+        return []
+    if not isinstance(records, list):
+        print(f"Error: Invalid data format in {file_type}.json. "
+              "Expected a list. Continuing with empty list.")
+        return []
+    return records
+
+
+class Session:
+    """Unidad de trabajo que agrupa las escrituras a los archivos JSON.
+
+    Dentro de ``with Session():`` los métodos de ``Hotel``, ``Customer`` y
+    ``Reservation`` leen cada archivo una sola vez y modifican un conjunto
+    de trabajo en memoria. Al salir del bloque cada tabla modificada se
+    escribe exactamente una vez; si el bloque lanza una excepción los
+    cambios se descartan y los archivos quedan intactos. Los atributos de
+    los objetos ya modificados no se revierten.
+
+    Si al salir no se puede escribir alguna tabla, la sesión se revierte
+    y ``with`` lanza ``OSError``. Las tablas se escriben una por una, así
+    que las que ya se habían escrito se quedan así: una reservación que
+    no llegó a Reservations.json puede dejar su habitación descontada en
+    Hotels.json. Los cambios de la sesión no se publican en el registro
+    de cambios; ``python hotel_check.py --repair`` corrige la
+    disponibilidad.
+
+    Las sesiones son por hilo y no se pueden anidar.
+    """
+    _local = threading.local()
+
+    def __init__(self):
+        self._tables: Dict[Path, object] = {}
+        self._dirty: Dict[Path, None] = {}
+        self._max_ids: Dict[Path, int] = {}
+        self._ordered: Dict[Path, bool] = {}
+        self._deferred: list = []
+        self._changes: Dict[Path, list] = {}
+
+    @classmethod
+    def current(cls) -> Optional['Session']:
+        """Devuelve la sesión activa en el hilo actual, si existe."""
+        return getattr(cls._local, 'session', None)
+
+    def __enter__(self) -> 'Session':
+        if Session.current() is not None:
+            raise RuntimeError("Ya hay una sesión activa en este hilo.")
+        Session._local.session = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        Session._local.session = None
+        if exc_type is not None:
+            self.rollback()
+        elif not self.flush():
+            self.rollback()
+            raise OSError("No se pudo escribir la sesión; los cambios "
+                          "pendientes se descartaron.")
+        return False
+
+    def contains(self, file_path: Path) -> bool:
+        """Indica si el archivo forma parte del conjunto de trabajo."""
+        return Path(file_path) in self._tables
+
+    def load(self, file_path: Path, data) -> None:
+        """Agrega al conjunto de trabajo el contenido leído de disco."""
+        file_path = Path(file_path)
+        self._tables[file_path] = data
+        self._max_ids.pop(file_path, None)
+        self._ordered.pop(file_path, None)
+
+    def get(self, file_path: Path):
+        """Devuelve el contenido en memoria de un archivo."""
+        return self._tables[Path(file_path)]
+
+    def put(self, file_path: Path, data) -> None:
+        """Reemplaza el contenido de un archivo y lo marca pendiente."""
+        file_path = Path(file_path)
+        if self._tables.get(file_path) is not data:
+            self._max_ids.pop(file_path, None)
+            self._ordered.pop(file_path, None)
+        elif self._ordered.get(file_path) and len(data) > 1:
+            # Los registros nuevos se agregan al final: basta revisar la
+            # cola para saber si la tabla sigue ordenada por id.
+            try:
+                self._ordered[file_path] = data[-2]['id'] < data[-1]['id']
+            except (KeyError, TypeError):
+                self._ordered[file_path] = False
+        self._tables[file_path] = data
+        self._dirty[file_path] = None
+
+    def max_id(self, file_path: Path) -> Optional[int]:
+        """Devuelve el mayor id conocido de una tabla, si está en caché."""
+        return self._max_ids.get(Path(file_path))
+
+    def set_max_id(self, file_path: Path, max_id: Optional[int]) -> None:
+        """Actualiza (o descarta con None) el mayor id de una tabla."""
+        if max_id is None:
+            self._max_ids.pop(Path(file_path), None)
+        else:
+            self._max_ids[Path(file_path)] = max_id
+
+    def is_ordered(self, file_path: Path) -> bool:
+        """Indica si una tabla en memoria está ordenada por id.
+
+        Se calcula una vez por tabla y se mantiene en ``put``.
+        """
+        file_path = Path(file_path)
+        ordered = self._ordered.get(file_path)
+        if ordered is None:
+            records = self._tables.get(file_path)
+            try:
+                ordered = isinstance(records, list) and all(
+                    records[i]['id'] < records[i + 1]['id']
+                    for i in range(len(records) - 1))
+            except (KeyError, TypeError):
+                ordered = False
+            self._ordered[file_path] = ordered
+        return ordered
+
+    def defer(self, on_commit: Callable[[], None],
+              on_rollback: Optional[Callable[[], None]] = None) -> None:
+        """Programa acciones para cuando la sesión se escriba o revierta.
+
+        Args:
+            on_commit: Se ejecuta después de escribir todas las tablas.
+            on_rollback: Se ejecuta si los cambios se descartan.
+        """
+        self._deferred.append((on_commit, on_rollback))
+
+    def add_change(self, directory: Path, change: Tuple) -> None:
+        """Junta un cambio para publicarlo cuando la sesión se escriba.
+
+        Args:
+            directory: Directorio de la tabla modificada.
+            change: ``(tabla, op, id, antes, después)`` como en
+                ``hotel_changes.publish``.
+        """
+        pending = self._changes.get(directory)
+        if pending is None:
+            pending = self._changes[directory] = []
+            self.defer(lambda: publish(directory, pending))
+        pending.append(change)
+
+    @property
+    def dirty(self) -> list:
+        """Archivos con cambios pendientes de escribir."""
+        return list(self._dirty)
+
+    @instrumented
+    def flush(self) -> bool:
+        """Escribe una vez cada archivo con cambios pendientes.
+
+        Returns:
+            bool: True si se escribió todo, False en caso contrario; las
+            tablas que no se escribieron siguen pendientes.
+        """
+        try:
+            for file_path in list(self._dirty):
+                with writing(file_path):
+                    write_document(file_path, self._tables[file_path])
+                del self._dirty[file_path]
+        except (IOError, OSError) as error:
+            print(f"Error al escribir en archivo: {error}")
+            for file_path in self._dirty:
+                invalidate(file_path)
+            return False
+        deferred, self._deferred = self._deferred, []
+        self._changes = {}
+        for on_commit, _ in deferred:
+            on_commit()
+        return True
+
+    def rollback(self) -> None:
+        """Descarta el conjunto de trabajo y los cambios pendientes.
+
+        Las tablas del conjunto de trabajo comparten sus documentos con el
+        caché de ``hotel_storage``, así que también se descartan de él.
+        """
+        for file_path in self._tables:
+            invalidate(file_path)
+        self._tables.clear()
+        self._dirty.clear()
+        self._max_ids.clear()
+        self._ordered.clear()
+        self._changes = {}
+        deferred, self._deferred = self._deferred, []
+        for _, on_rollback in deferred:
+            if on_rollback is not None:
+                on_rollback()
+
+
+def emit_change(entity, op: str, record_id, before: Optional[Dict],
+                after: Optional[Dict]) -> None:
+    """Publica el cambio de un registro ya guardado.
+
+    Dentro de una sesión los cambios se juntan y se publican cuando la
+    sesión se escribe, o se descartan si se revierte.
+
+    Args:
+        entity: Instancia o clase de la tabla modificada.
+        op: Operación (``create``, ``modify``, ``delete``, ...).
+        record_id: Id del registro.
+        before: Copia del registro tomada antes del cambio.
+        after: Registro después del cambio (se copia aquí).
+    """
+    directory = Path(entity.output_dir)
+    change = (entity.table_name, op, record_id, before,
+              copy.deepcopy(after))
+    session = Session.current()
+    if session is None:
+        publish(directory, [change])
+        return
+    session.add_change(directory, change)
+
+
+def find_index(records: list, record_id,
+               file_path: Optional[Path] = None) -> Optional[int]:
+    """Busca la posición de un registro por id.
+
+    Los ids nuevos siempre son mayores que los existentes, así que las
+    tablas quedan ordenadas por id y basta una búsqueda binaria. Si el
+    registro no aparece así (tabla desordenada) se recorre la lista
+    completa, salvo que la sesión activa sepa que la tabla ``file_path``
+    está ordenada. Los registros con lápida en ``file_path`` se
+    consideran inexistentes. Los registros ya vienen validados con su
+    esquema (``load_records``).
+
+    Returns:
+        Optional[int]: Posición del registro, o None si no existe.
+    """
+    if file_path is not None and record_id in tombstones(file_path):
+        return None
+    low, high = 0, len(records)
+    try:
+        while low < high:
+            middle = (low + high) // 2
+            if records[middle]['id'] < record_id:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(records) and records[low]['id'] == record_id:
+            return low
+    except TypeError:
+        # ``record_id`` no es comparable con los ids (no es entero).
+        pass
+    session = Session.current()
+    if (file_path is not None and session is not None
+            and session.contains(file_path)
+            and session.get(file_path) is records
+            and session.is_ordered(file_path)):
+        return None
+    for index, record in enumerate(records):
+        if record['id'] == record_id:
+            return index
+    return None
+
+
+def next_table_id(file_path: Path, records: list) -> int:
+    """Calcula el siguiente id de una tabla sin particionar.
+
+    Dentro de una sesión el mayor id se calcula una sola vez por tabla y
+    después sólo se incrementa. Los ids con lápida o en cuarentena no se
+    reutilizan.
+    """
+    session = Session.current()
+    if session is not None and session.max_id(file_path) is not None:
+        new_id = session.max_id(file_path) + 1
+        session.set_max_id(file_path, new_id)
+        return new_id
+
+    new_id = max(tombstones(file_path).max_id,
+                 quarantine_max_id(file_path)) + 1
+    if records:
+        new_id = max(new_id, max(r['id'] for r in records) + 1)
+    if session is not None:
+        session.set_max_id(file_path, new_id)
+    return new_id
+
+
+def delete_at(file_path: Path, records: list, index: int) -> None:
+    """Elimina un registro de la lista sin reconstruirla."""
+    deleted = records.pop(index)
+    session = Session.current()
+    if (session is not None
+            and session.max_id(file_path) == deleted['id']):
+        session.set_max_id(file_path, None)
@@ -0,0 +1,215 @@
+"""
+Particionado (sharding) de las tablas del Sistema de Gestión de Hoteles.
+
+Con una ``ShardLayout`` asignada (por ejemplo ``Hotel.shards =
+ShardLayout(8)``), cada tabla se divide en varios archivos y cada
+operación lee y reescribe sólo el archivo que contiene su registro:
+
+- ``hash``: el registro con id ``n`` va al shard ``n % count``.
+- ``range``: el registro va al shard ``(n - 1) // range_size``.
+- ``by_estado`` (sólo hoteles): además se separa un grupo de shards por
+  estado, p. ej. ``Hotels.puebla.001.json``.
+
+Junto a los shards se guarda ``<Tabla>.meta.json`` con el siguiente id a
+asignar. Si se particiona por estado, el estado de cada id se agrega a
+``<Tabla>.estados.jsonl`` (una línea ``[id, estado]`` por alta o cambio
+de estado) y se mantiene en memoria (``EstadoIndex``): ubicar el shard de
+un id no lee el archivo y dar de alta un hotel sólo agrega una línea.
+"""
+import json
+import re
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from hotel_storage import (append_bytes, file_signature, read_bytes,
+                           replace_bytes)
+
+SHARD_HASH = "hash"
+SHARD_RANGE = "range"
+
+
+def _slug(text: str) -> str:
+    """Convierte un estado en un fragmento seguro para nombre de archivo."""
+    normalized = unicodedata.normalize('NFKD', str(text))
+    ascii_text = normalized.encode('ascii', 'ignore').decode('ascii')
+    slug = re.sub(r'[^a-z0-9]+', '-', ascii_text.lower()).strip('-')
+    return slug or "sin-estado"
+
+
+class ShardLayout:
+    """Esquema de particionado de una tabla.
+
+    Attributes:
+        count: Número de shards del modo ``hash``.
+        strategy: ``hash`` o ``range``.
+        range_size: Ids por shard del modo ``range``.
+        by_estado: Si los hoteles se separan además por estado.
+    """
+
+    def __init__(self, count: int = 4, strategy: str = SHARD_HASH,
+                 range_size: int = 1000, by_estado: bool = False):
+        if strategy not in (SHARD_HASH, SHARD_RANGE):
+            raise ValueError(f"Estrategia de shard inválida: {strategy}")
+        if count < 1 or range_size < 1:
+            raise ValueError("count y range_size deben ser mayores que 0.")
+        self.count = count
+        self.strategy = strategy
+        self.range_size = range_size
+        self.by_estado = by_estado
+
+    def shard_index(self, record_id: int) -> int:
+        """Devuelve el número de shard de un id."""
+        if self.strategy == SHARD_RANGE:
+            return max(record_id - 1, 0) // self.range_size
+        return record_id % self.count
+
+    def shard_name(self, table: str, record_id: int,
+                   estado: Optional[str] = None) -> str:
+        """Devuelve el nombre del archivo que contiene un registro.
+
+        Args:
+            table: Nombre de la tabla, p. ej. ``Hotels``.
+            record_id: Id del registro.
+            estado: Estado del hotel (sólo con ``by_estado``).
+
+        Returns:
+            str: Nombre del archivo del shard.
+        """
+        prefix = table
+        if self.by_estado and estado is not None:
+            prefix = f"{table}.{_slug(estado)}"
+        return f"{prefix}.{self.shard_index(record_id):03d}.json"
+
+    @staticmethod
+    def meta_name(table: str) -> str:
+        """Devuelve el nombre del archivo de metadatos de la tabla."""
+        return f"{table}.meta.json"
+
+    @staticmethod
+    def estados_name(table: str) -> str:
+        """Devuelve el nombre del archivo con el estado de cada id."""
+        return f"{table}.estados.jsonl"
+
+    def files(self, directory: Path, table: str) -> List[Path]:
+        """Lista los archivos de shard existentes de una tabla."""
+        meta = self.meta_name(table)
+        return sorted(path for path in Path(directory).glob(f"{table}.*.json")
+                      if path.name != meta)
+
+
+class EstadoIndex:
+    """Estado de cada id de una tabla particionada por estado.
+
+    El archivo se lee una vez; si después sólo creció (otro proceso
+    agregó líneas), se leen sólo las líneas nuevas, y si se reemplazó se
+    vuelve a leer completo.
+
+    Attributes:
+        path: Archivo ``<Tabla>.estados.jsonl``.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._estados: Dict[int, str] = {}
+        self._pending: Dict[int, str] = {}
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    def exists(self) -> bool:
+        """Indica si hay estados escritos o pendientes."""
+        with self._lock:
+            self._refresh()
+            return self._signature is not None or bool(self._pending)
+
+    def get(self, record_id) -> Optional[str]:
+        """Devuelve el estado de un id, o None si no se conoce."""
+        with self._lock:
+            self._refresh()
+            if record_id in self._pending:
+                return self._pending[record_id]
+            return self._estados.get(record_id)
+
+    def mark(self, estados: Dict[int, str]) -> None:
+        """Anota estados sólo en memoria (p. ej. dentro de una sesión)."""
+        with self._lock:
+            self._pending.update(estados)
+
+    def unmark(self, estados: Dict[int, str]) -> None:
+        """Descarta estados anotados que no se escribieron."""
+        with self._lock:
+            for record_id in estados:
+                self._pending.pop(record_id, None)
+
+    def persist(self, estados: Dict[int, str]) -> None:
+        """Agrega estados al final del archivo con una escritura."""
+        if not estados:
+            return
+        raw = "".join(json.dumps([record_id, estado], ensure_ascii=False)
+                      + "\n" for record_id, estado in estados.items()
+                      ).encode('utf-8')
+        with self._lock:
+            self._refresh()
+            append_bytes(self.path, raw)
+            for record_id in estados:
+                self._pending.pop(record_id, None)
+            self._estados.update(estados)
+            self._offset += len(raw)
+            self._signature = file_signature(self.path, missing_ok=True)
+
+    def replace(self, estados: Dict[int, str]) -> None:
+        """Reescribe el archivo completo con los estados indicados."""
+        raw = "".join(json.dumps([record_id, estado], ensure_ascii=False)
+                      + "\n" for record_id, estado in sorted(estados.items())
+                      ).encode('utf-8')
+        with self._lock:
+            replace_bytes(self.path, raw)
+            self._pending.clear()
+            self._estados = dict(estados)
+            self._offset = len(raw)
+            self._signature = file_signature(self.path, missing_ok=True)
+
+    def _refresh(self) -> None:
+        signature = file_signature(self.path, missing_ok=True)
+        if signature == self._signature:
+            return
+        if (signature is None or self._signature is None
+                or signature[0] != self._signature[0]
+                or signature[2] < self._offset):
+            self._estados = {}
+            self._offset = 0
+        self._signature = signature
+        if signature is None:
+            return
+        raw = read_bytes(self.path, self._offset)
+        # Una línea sin terminar (escritura en curso) se lee la próxima
+        # vez.
+        complete = raw[:raw.rfind(b"\n") + 1]
+        self._offset += len(complete)
+        for line in complete.decode('utf-8').splitlines():
+            try:
+                record_id, estado = json.loads(line)
+            except (ValueError, TypeError):
+                continue
+            self._estados[record_id] = estado
+
+
+_INDEXES: Dict[Path, EstadoIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def estado_index(file_path: Path) -> EstadoIndex:
+    """Devuelve el índice de estados de un archivo ``.estados.jsonl``."""
+    file_path = Path(file_path)
+    with _INDEXES_LOCK:
+        if file_path not in _INDEXES:
+            _INDEXES[file_path] = EstadoIndex(file_path)
+        return _INDEXES[file_path]
+
+
+def reset() -> None:
+    """Olvida los índices de estados (se vuelven a leer de disco)."""
+    with _INDEXES_LOCK:
+        _INDEXES.clear()
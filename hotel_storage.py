@@ -0,0 +1,377 @@
+"""
+Capa de almacenamiento de los archivos de tablas.
+
+Todas las lecturas y escrituras de tablas JSON pasan por ``read_document``
+y ``write_document``. Los documentos decodificados se guardan en un caché
+del proceso validado con el inodo, la fecha de modificación y el tamaño
+del archivo: mientras el archivo no cambie, volver a leerlo sólo cuesta
+un ``stat``. Las escrituras son atómicas (``atomic_write``) y dejan en el
+caché el documento recién escrito.
+
+``read_document`` devuelve una copia del documento del caché (ver
+``copy_document``), así que quien la modifica no afecta a nadie más.
+La capa de tablas lee con ``read_shared``, que devuelve el documento
+del caché sin copiarlo: quien modifica uno debe escribirlo con
+``write_document`` o descartarlo con ``invalidate``; la ``Session`` lo
+hace al escribirse o revertirse. Los archivos marcados con ``exclude``
+(tablas leídas con memoria acotada, ver ``hotel_records``) se leen y
+escriben igual, pero no se guardan.
+
+Con ``schema`` (ver ``hotel_schema``) el documento se valida al leerlo y
+el caché recuerda con qué esquema se validó: las lecturas siguientes no
+lo vuelven a recorrer. Los registros que no cumplen el esquema se quitan
+del documento, se reportan y se agregan a ``<Tabla>.quarantine.jsonl``
+(``quarantine``), así que la siguiente escritura de la tabla no los
+pierde y el resto de la tabla se sigue usando. Escribir el mismo objeto
+que está en el caché conserva la marca, porque quien lo modifica revisa
+los valores nuevos.
+"""
+import copy
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple
+
+from hotel_durability import append_durable, atomic_write
+from hotel_metrics import phase, record_io
+
+_MISSING = object()
+QUARANTINE_SUFFIX = ".quarantine.jsonl"
+_QUARANTINE_LOCK = threading.Lock()
+_QUARANTINE_MAX_IDS: Dict[Path, Tuple[Tuple[int, int, int], int]] = {}
+
+
+class DocumentCache:
+    """Documentos decodificados por archivo.
+
+    Attributes:
+        hits: Lecturas resueltas desde el caché.
+        misses: Lecturas que decodificaron el archivo.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Path, Tuple[Tuple[int, int, int], object,
+                                        object]] = {}
+        self._excluded: Set[Path] = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, file_path: Path, signature: Tuple[int, int, int],
+            schema=None):
+        """Devuelve el documento si el archivo no cambió, o ``_MISSING``.
+
+        Si el documento no se ha validado con ``schema``, se valida aquí
+        una sola vez y sus registros inválidos se ponen en cuarentena.
+        """
+        with self._lock:
+            entry = self._entries.get(file_path)
+            if entry is None or entry[0] != signature:
+                self.misses += 1
+                return _MISSING
+            self.hits += 1
+        if schema is not None and entry[2] is not schema:
+            quarantine(file_path, entry[1], schema)
+            with self._lock:
+                if self._entries.get(file_path) is entry:
+                    self._entries[file_path] = (signature, entry[1], schema)
+        return entry[1]
+
+    def put(self, file_path: Path, signature: Tuple[int, int, int],
+            data, schema=None) -> None:
+        """Guarda el documento leído o escrito de un archivo.
+
+        Args:
+            file_path: Archivo del documento.
+            signature: Firma del archivo con este contenido.
+            data: Documento decodificado.
+            schema: Esquema con el que ya se validó (None si no se
+                validó). Si ``data`` es el mismo objeto que ya estaba en
+                el caché, conserva su esquema.
+        """
+        with self._lock:
+            if file_path in self._excluded:
+                return
+            entry = self._entries.get(file_path)
+            if schema is None and entry is not None and entry[1] is data:
+                schema = entry[2]
+            self._entries[file_path] = (signature, data, schema)
+
+    def exclude(self, file_path: Path, excluded: bool = True) -> None:
+        """Deja de guardar (o vuelve a guardar) un archivo."""
+        file_path = Path(file_path)
+        with self._lock:
+            if excluded:
+                self._excluded.add(file_path)
+                self._entries.pop(file_path, None)
+            else:
+                self._excluded.discard(file_path)
+
+    def invalidate(self, file_path: Optional[Path] = None) -> None:
+        """Descarta un archivo del caché (o todos con None)."""
+        with self._lock:
+            if file_path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(Path(file_path), None)
+
+
+CACHE = DocumentCache()
+
+
+def stat_signature(stat: os.stat_result) -> Tuple[int, int, int]:
+    """Firma de un archivo a partir de su ``stat`` (o ``os.fstat``)."""
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def file_signature(file_path: Path, missing_ok: bool = False
+                   ) -> Optional[Tuple[int, int, int]]:
+    """Firma de un archivo: inodo, fecha de modificación (ns) y tamaño.
+
+    Los cachés de tablas, índices, filtros y lápidas la usan para saber
+    si un archivo cambió desde que lo leyeron.
+
+    Args:
+        file_path: Archivo a consultar.
+        missing_ok: Si es True, un archivo inexistente devuelve None.
+
+    Raises:
+        OSError: Si el archivo no se puede consultar (o no existe y
+            ``missing_ok`` es False).
+    """
+    try:
+        return stat_signature(os.stat(file_path))
+    except FileNotFoundError:
+        if missing_ok:
+            return None
+        raise
+
+
+def copy_record(record: Dict) -> Dict:
+    """Copia un registro; sólo los valores anidados se copian a fondo."""
+    return {key: copy.deepcopy(value) if isinstance(value, (dict, list))
+            else value for key, value in record.items()}
+
+
+def copy_document(data):
+    """Copia un documento decodificado para entregarlo a quien lo pidió.
+
+    Los registros de una tabla se copian con ``copy_record``, así que
+    copiar una tabla de registros planos cuesta poco más que recorrerla.
+    """
+    if isinstance(data, list):
+        return [copy_record(record) if isinstance(record, dict)
+                else copy.deepcopy(record) for record in data]
+    return copy.deepcopy(data)
+
+
+def read_document(file_path: Path, schema=None):
+    """Lee un archivo JSON y devuelve una copia del documento.
+
+    Es ``read_shared`` más ``copy_document``: modificar el resultado no
+    cambia el caché.
+
+    Args:
+        file_path: Ruta al archivo JSON.
+        schema: Esquema de los registros (opcional).
+
+    Returns:
+        El contenido decodificado, o None si el archivo está vacío.
+
+    Raises:
+        OSError: Si el archivo no se puede leer.
+        json.JSONDecodeError: Si el contenido no es JSON válido.
+    """
+    return copy_document(read_shared(file_path, schema))
+
+
+def read_shared(file_path: Path, schema=None):
+    """Lee y decodifica un archivo JSON midiendo las fases load y parse.
+
+    Devuelve el documento del caché sin copiarlo: quien lo modifique
+    debe escribirlo con ``write_document`` o descartarlo con
+    ``invalidate``.
+
+    Args:
+        file_path: Ruta al archivo JSON.
+        schema: Esquema de los registros (opcional); la validación se
+            mide dentro de parse y los registros inválidos se ponen en
+            cuarentena.
+
+    Returns:
+        El contenido decodificado, o None si el archivo está vacío.
+
+    Raises:
+        OSError: Si el archivo (o su cuarentena) no se puede leer o
+            escribir.
+        json.JSONDecodeError: Si el contenido no es JSON válido.
+    """
+    file_path = Path(file_path)
+    signature = file_signature(file_path)
+    data = CACHE.get(file_path, signature, schema)
+    if data is not _MISSING:
+        return data
+    with phase("load"):
+        with open(file_path, 'rb') as file:
+            raw = file.read()
+    record_io(file_path, bytes_read=len(raw), opens=1)
+    content = raw.decode('utf-8').strip()
+    data = None
+    if content:
+        with phase("parse"):
+            data = json.loads(content)
+            if schema is not None:
+                quarantine(file_path, data, schema)
+    CACHE.put(file_path, signature, data, schema)
+    return data
+
+
+def quarantine_path(file_path: Path) -> Path:
+    """Archivo de cuarentena de una tabla (``<Tabla>.quarantine.jsonl``)."""
+    return Path(file_path).with_suffix(QUARANTINE_SUFFIX)
+
+
+def quarantine(file_path: Path, data, schema) -> int:
+    """Aparta los registros de un documento que no cumplen el esquema.
+
+    Los registros se quitan de ``data`` y se reportan; cada uno se agrega
+    (una sola vez aunque la tabla se lea de nuevo) como
+    ``{"registro": ..., "problema": ...}`` al archivo de cuarentena.
+
+    Args:
+        file_path: Archivo de la tabla.
+        data: Documento recién decodificado.
+        schema: Esquema de los registros.
+
+    Returns:
+        int: Registros apartados.
+
+    Raises:
+        OSError: Si el archivo de cuarentena no se puede escribir.
+    """
+    rejected = schema.quarantine(data)
+    if not rejected:
+        return 0
+    file_path = Path(file_path)
+    path = quarantine_path(file_path)
+    lines = []
+    with _QUARANTINE_LOCK:
+        known = set(_quarantine_lines(path))
+        for position, record, problem in rejected:
+            print(f"Error: Invalid data format in {file_path.name}: "
+                  f"registro {position}: {problem}. Se movió a "
+                  f"{path.name}.")
+            line = json.dumps({'registro': record, 'problema': problem},
+                              ensure_ascii=False)
+            if line not in known:
+                known.add(line)
+                lines.append(line)
+        if lines:
+            append_bytes(path, "".join(f"{line}\n"
+                                       for line in lines).encode('utf-8'))
+    return len(rejected)
+
+
+def quarantine_max_id(file_path: Path) -> int:
+    """Mayor id entero de los registros en cuarentena de una tabla.
+
+    Quien asigna ids nuevos lo toma en cuenta para no reutilizar el id
+    de un registro apartado. Se recuerda mientras el archivo no cambie.
+    """
+    path = quarantine_path(file_path)
+    signature = file_signature(path, missing_ok=True)
+    if signature is None:
+        return 0
+    with _QUARANTINE_LOCK:
+        cached = _QUARANTINE_MAX_IDS.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        max_id = 0
+        for line in _quarantine_lines(path):
+            try:
+                record = json.loads(line).get('registro')
+            except (json.JSONDecodeError, AttributeError):
+                continue
+            record_id = record.get('id') if isinstance(record, dict) else None
+            if isinstance(record_id, int) and not isinstance(record_id,
+                                                             bool):
+                max_id = max(max_id, record_id)
+        _QUARANTINE_MAX_IDS[path] = (signature, max_id)
+    return max_id
+
+
+def _quarantine_lines(path: Path):
+    """Líneas del archivo de cuarentena (ninguna si no existe)."""
+    try:
+        raw = read_bytes(path)
+    except FileNotFoundError:
+        return []
+    return [line for line in raw.decode('utf-8').splitlines() if line]
+
+
+def read_bytes(file_path: Path, offset: int = 0) -> bytes:
+    """Lee un archivo auxiliar (registro, índice) desde ``offset``.
+
+    Raises:
+        OSError: Si el archivo no se puede leer.
+    """
+    with open(file_path, 'rb') as file:
+        file.seek(offset)
+        raw = file.read()
+    record_io(file_path, bytes_read=len(raw), opens=1)
+    return raw
+
+
+def append_bytes(file_path: Path, raw: bytes) -> None:
+    """Agrega bytes al final de un archivo auxiliar con ``append_durable``.
+
+    Raises:
+        OSError: Si el archivo no se puede escribir.
+    """
+    file_path = Path(file_path)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    fsyncs = append_durable(file_path, raw)
+    record_io(file_path, bytes_written=len(raw), opens=1, fsyncs=fsyncs)
+
+
+def replace_bytes(file_path: Path, raw: bytes) -> None:
+    """Reescribe un archivo auxiliar completo con ``atomic_write``.
+
+    Raises:
+        OSError: Si el archivo no se puede escribir.
+    """
+    file_path = Path(file_path)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    fsyncs = atomic_write(file_path, raw)
+    record_io(file_path, bytes_written=len(raw), opens=1, fsyncs=fsyncs)
+
+
+def write_document(file_path: Path, data) -> None:
+    """Codifica y escribe un archivo JSON midiendo serialize y write.
+
+    La escritura es atómica (archivo temporal y renombrado) con el nivel
+    de durabilidad configurado en ``set_durability``. Si falla, el
+    archivo se descarta del caché.
+    """
+    file_path = Path(file_path)
+    with phase("serialize"):
+        raw = json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+    try:
+        with phase("write"):
+            fsyncs = atomic_write(file_path, raw)
+        CACHE.put(file_path, file_signature(file_path), data)
+    except OSError:
+        CACHE.invalidate(file_path)
+        raise
+    record_io(file_path, bytes_written=len(raw), opens=1, fsyncs=fsyncs)
+
+
+def invalidate(file_path: Optional[Path] = None) -> None:
+    """Descarta del caché un archivo (o todos con None)."""
+    CACHE.invalidate(file_path)
+
+
+def exclude(file_path: Path, excluded: bool = True) -> None:
+    """Deja de guardar en el caché (o vuelve a guardar) un archivo."""
+    CACHE.exclude(file_path, excluded)
@@ -0,0 +1,758 @@
+"""
+Operaciones sobre tablas completas.
+
+Inserción y actualización masiva (``bulk_insert``, ``bulk_update``),
+particionado (``shard_table``), lectura y recorridos por id
+(``load_table``, ``list_page``, ``scan_range``, ``id_range``,
+``export_ordered``), lápidas (``compact_tombstones``) e índices de
+búsqueda (``search_index``). Reciben la clase de la tabla (``Hotel``,
+``Customer`` o ``Reservation``) y usan la sesión activa igual que sus
+métodos (``hotel_session``).
+"""
+import json
+import os
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from hotel_bloom import id_filter, note_ids
+from hotel_changes import subscribe
+from hotel_idindex import IdIndex, index_for, merge
+from hotel_metrics import phase, record_io
+from hotel_records import record_cache, scan_file
+from hotel_rooms import sync_inventory
+from hotel_schema import SCHEMAS, SchemaError
+from hotel_search import TrigramIndex
+from hotel_session import (Session, emit_change, file_exists, find_index,
+                           load_records, read_json, write_json)
+from hotel_shards import EstadoIndex, ShardLayout, estado_index
+from hotel_storage import copy_record, quarantine_max_id, read_shared
+from hotel_tombstones import tombstones
+
+
+def _table_ids(entity, file_path: Path):
+    """Ids de un archivo de tabla para construir su filtro de Bloom.
+
+    Raises:
+        OSError: Si el archivo no se puede leer.
+        json.JSONDecodeError: Si el contenido no es JSON válido.
+    """
+    size = getattr(entity, 'record_cache_size', None)
+    if size is not None:
+        return record_cache(file_path, size).ids()
+    records = read_shared(file_path, SCHEMAS.get(entity.table_name))
+    if not isinstance(records, list):
+        return []
+    return [record['id'] for record in records]
+
+
+def _might_exist(entity, file_path: Path) -> bool:
+    """Consulta el filtro de Bloom de la tabla antes de buscar el id.
+
+    Returns:
+        bool: False sólo si el id seguro no está en el archivo.
+    """
+    error_rate = getattr(entity, 'bloom_error_rate', None)
+    if error_rate is None:
+        return True
+    return id_filter(file_path).might_contain(
+        entity.id, lambda: _table_ids(entity, file_path), error_rate)
+
+
+def fetch_record(entity, file_path: Path, file_type: str):
+    """Busca el registro de una instancia para leerlo.
+
+    Un id que el filtro de Bloom de la tabla descarta se reporta como
+    inexistente sin leer el archivo. Con ``record_cache_size`` el
+    registro se lee del caché LRU de ``hotel_records`` sin cargar la
+    tabla, salvo que la sesión activa ya la tenga en memoria, y se valida
+    sólo ese registro: uno inválido se reporta y se toma como inexistente,
+    igual que los que se ponen en cuarentena al leer la tabla completa.
+
+    Args:
+        entity: Instancia con ``id``.
+        file_path: Archivo de la tabla.
+        file_type: Tipo de archivo para mensajes de error.
+
+    Returns:
+        tuple: (success: bool, registro o None si no existe)
+    """
+    session = Session.current()
+    held = session is not None and session.contains(file_path)
+    if not held and not _might_exist(entity, file_path):
+        return True, None
+    size = getattr(entity, 'record_cache_size', None)
+    if size is None or held:
+        success, records = load_records(file_path, file_type)
+        if not success:
+            return False, None
+        index = find_index(records, entity.id, file_path)
+        return True, records[index] if index is not None else None
+    return _cached_record(entity, file_path, file_type, size)
+
+
+def _cached_record(entity, file_path: Path, file_type: str, size: int):
+    """Lee y valida un registro con el caché LRU de ``hotel_records``.
+
+    Returns:
+        tuple: (success: bool, registro o None si no existe o es
+        inválido)
+    """
+    if not file_path.exists():
+        print(f"Error: El archivo {file_type}.json no existe.")
+        return False, None
+    try:
+        record = record_cache(file_path, size).get(entity.id)
+    except json.JSONDecodeError as e:
+        print(f"Error: Invalid JSON in {file_type}.json: {e}")
+        return False, None
+    schema = SCHEMAS.get(file_type)
+    problem = None if record is None or schema is None else schema.check(
+        record)
+    if problem is not None:
+        print(f"Error: Invalid data format in {file_type}.json: "
+              f"registro {entity.id}: {problem}")
+        return True, None
+    return True, record
+
+
+def bury(entity, file_path: Path, record_id, total: int) -> None:
+    """Borra un registro con una lápida en lugar de reescribir la tabla.
+
+    Fuera de una sesión la lápida se escribe de inmediato; dentro, al
+    escribirse la sesión. Si los registros muertos superan
+    ``compact_ratio`` de los ``total`` registros del archivo, se compacta.
+
+    Raises:
+        OSError: Si no se pudo escribir la lápida o la tabla compactada.
+    """
+    dead = tombstones(file_path)
+    dead.mark(record_id)
+    session = Session.current()
+    if session is None:
+        dead.persist(record_id)
+    else:
+        session.defer(lambda: dead.persist(record_id),
+                      lambda: dead.unmark(record_id))
+    if len(dead) > entity.compact_ratio * total:
+        _compact_file(entity, file_path)
+
+
+def _compact_file(entity, file_path: Path) -> int:
+    """Reescribe un archivo de tabla sin sus registros con lápida.
+
+    Returns:
+        int: Registros eliminados físicamente.
+    """
+    dead = tombstones(file_path)
+    ids = dead.ids
+    if not ids or not file_exists(file_path):
+        return 0
+    success, records = load_records(file_path, entity.table_name)
+    if not success:
+        return 0
+    with phase("mutate"):
+        kept = [r for r in records if r['id'] not in ids]
+    write_json(file_path, kept)
+    session = Session.current()
+    if session is None:
+        dead.clear(ids)
+    else:
+        session.defer(lambda: dead.clear(ids))
+    return len(records) - len(kept)
+
+
+def compact_tombstones(entity) -> int:
+    """Elimina físicamente los registros con lápida de una tabla.
+
+    Si no hay una sesión activa, la compactación se hace dentro de una
+    propia: se escriben todos los archivos de la tabla o ninguno.
+
+    Args:
+        entity: ``Hotel``, ``Customer`` o ``Reservation``.
+
+    Returns:
+        int: Registros eliminados, o 0 si no se pudo guardar.
+    """
+    if Session.current() is None:
+        try:
+            with Session():
+                return compact_tombstones(entity)
+        except OSError:
+            return 0
+    return sum(_compact_file(entity, table_file)
+               for table_file in table_files(entity))
+
+
+def _shard_records(shard_file: Path, table: str) -> list:
+    """Registros válidos de un shard (los inválidos van a cuarentena)."""
+    records = read_json(shard_file, SCHEMAS.get(table))
+    return records if isinstance(records, list) else []
+
+
+def _shard_meta(output_dir: Path, table: str, layout: ShardLayout) -> Dict:
+    """Carga los metadatos (``next_id``) de una tabla particionada.
+
+    Si el archivo de metadatos no existe se reconstruye a partir de los
+    shards presentes en disco.
+
+    Returns:
+        Dict: Copia de los metadatos; quien la modifica la escribe.
+    """
+    meta_file = output_dir / layout.meta_name(table)
+    if file_exists(meta_file):
+        meta = read_json(meta_file)
+        if isinstance(meta, dict) and isinstance(meta.get('next_id'), int):
+            return {'next_id': meta['next_id']}
+    max_id = 0
+    for shard_file in layout.files(output_dir, table):
+        for record in _shard_records(shard_file, table):
+            max_id = max(max_id, record['id'])
+    return {'next_id': max_id + 1}
+
+
+def _estado_index(output_dir: Path, table: str,
+                  layout: ShardLayout) -> EstadoIndex:
+    """Devuelve el estado de cada id de una tabla particionada por estado.
+
+    Si el archivo de estados no existe se reconstruye a partir de los
+    shards presentes en disco y de los ``estados`` que guardaban los
+    metadatos en versiones anteriores.
+    """
+    index = estado_index(output_dir / layout.estados_name(table))
+    if index.exists():
+        return index
+    estados = {}
+    meta_file = output_dir / layout.meta_name(table)
+    if file_exists(meta_file):
+        meta = read_json(meta_file)
+        if isinstance(meta, dict) and isinstance(meta.get('estados'), dict):
+            estados.update((int(record_id), estado)
+                           for record_id, estado in meta['estados'].items())
+    for shard_file in layout.files(output_dir, table):
+        for record in _shard_records(shard_file, table):
+            estados[record['id']] = record['estado']
+    if estados:
+        index.replace(estados)
+    return index
+
+
+def record_estados(output_dir: Path, table: str, layout: ShardLayout,
+                   estados: Dict[int, str]) -> None:
+    """Anota el estado de ids nuevos o que cambiaron de estado.
+
+    Fuera de una sesión se agrega de inmediato al archivo de estados;
+    dentro, al escribirse la sesión.
+
+    Raises:
+        OSError: Si no se pudo escribir el archivo de estados.
+    """
+    index = _estado_index(output_dir, table, layout)
+    index.mark(estados)
+    session = Session.current()
+    if session is None:
+        index.persist(estados)
+    else:
+        session.defer(lambda: index.persist(estados),
+                      lambda: index.unmark(estados))
+
+
+def allocate_id(output_dir: Path, table: str, layout: ShardLayout,
+                estado: Optional[str] = None) -> int:
+    """Asigna el siguiente id de una tabla particionada.
+
+    Los metadatos sólo guardan el siguiente id y el estado se agrega al
+    archivo de estados, así que asignar un id no depende del tamaño de
+    la tabla.
+    """
+    new_id = _shard_meta(output_dir, table, layout)['next_id']
+    if layout.by_estado and estado is not None:
+        record_estados(output_dir, table, layout, {new_id: estado})
+    write_json(output_dir / layout.meta_name(table), {'next_id': new_id + 1})
+    return new_id
+
+
+def record_file(output_dir: Path, table: str,
+                layout: Optional[ShardLayout],
+                record_id: Optional[int]) -> Path:
+    """Devuelve el archivo (o shard) donde vive un registro."""
+    if layout is None:
+        return output_dir / f"{table}.json"
+    estado = None
+    if layout.by_estado:
+        estado = _estado_index(output_dir, table, layout).get(record_id)
+    return output_dir / layout.shard_name(table, record_id or 0, estado)
+
+
+def _split_records(entity, layout: ShardLayout, records: list):
+    """Reparte registros en shards según el layout.
+
+    Returns:
+        tuple: ``({shard: registros}, metadatos, {id: estado})``.
+    """
+    shards: Dict[Path, list] = {}
+    meta = {'next_id': 1}
+    estados = {}
+    for record in records:
+        estado = record.get('estado') if layout.by_estado else None
+        name = layout.shard_name(entity.table_name, record['id'], estado)
+        shards.setdefault(entity.output_dir / name, []).append(record)
+        meta['next_id'] = max(meta['next_id'], record['id'] + 1)
+        if estado is not None:
+            estados[record['id']] = estado
+    return shards, meta, estados
+
+
+def shard_table(entity, layout: ShardLayout) -> bool:
+    """Reparte la tabla plana de una clase en shards y activa el layout.
+
+    Args:
+        entity: ``Hotel``, ``Customer`` o ``Reservation``.
+        layout: Esquema de particionado a aplicar.
+
+    Returns:
+        bool: True si se particionó exitosamente, False en caso contrario.
+    """
+    table = entity.table_name
+    source = entity.output_dir / f"{table}.json"
+    success, records = load_records(source, table)
+    if not success:
+        return False
+
+    dead = tombstones(source).ids
+    shards, meta, estados = _split_records(
+        entity, layout, [r for r in records if r['id'] not in dead])
+    try:
+        for shard_file, shard_records in shards.items():
+            note_ids(shard_file, (record['id'] for record in shard_records))
+            write_json(shard_file, shard_records)
+        write_json(entity.output_dir / layout.meta_name(table), meta)
+        if layout.by_estado:
+            estado_index(entity.output_dir
+                         / layout.estados_name(table)).replace(estados)
+        source.unlink()
+        tombstones(source).clear(dead)
+    except (IOError, OSError) as error:
+        print(f"Error al escribir en archivo: {error}")
+        return False
+    entity.shards = layout
+    print(f"{table} particionado en {len(shards)} archivos.")
+    return True
+
+
+def _table_records(loaded: Dict[Path, list], table_file: Path,
+                   table: str) -> Optional[list]:
+    """Registros de un archivo de la inserción, leídos una sola vez.
+
+    Un archivo ausente se toma como vacío.
+
+    Returns:
+        Optional[list]: Registros, o None si el archivo no se pudo leer.
+    """
+    if table_file not in loaded:
+        if not file_exists(table_file):
+            loaded[table_file] = []
+        else:
+            success, data = load_records(table_file, table)
+            if not success:
+                return None
+            loaded[table_file] = data
+    return loaded[table_file]
+
+
+def _first_bulk_id(entity, loaded: Dict[Path, list]) -> Optional[int]:
+    """Primer id del rango de una inserción masiva (None si falla)."""
+    table = entity.table_name
+    if entity.shards is not None:
+        return _shard_meta(entity.output_dir, table, entity.shards)['next_id']
+    flat_file = entity.output_dir / f"{table}.json"
+    existing = _table_records(loaded, flat_file, table)
+    if existing is None:
+        return None
+    return max(max((r['id'] for r in existing), default=0),
+               tombstones(flat_file).max_id,
+               quarantine_max_id(flat_file)) + 1
+
+
+def _new_records(entity, records: list,
+                 loaded: Dict[Path, list]) -> Optional[list]:
+    """Asigna los ids de una inserción masiva y valida los registros.
+
+    Returns:
+        Optional[list]: Registros con ``id``, o None si no se pudo leer
+        la tabla o alguno no cumple el esquema.
+    """
+    next_id = _first_bulk_id(entity, loaded)
+    if next_id is None:
+        return None
+    created = [{'id': next_id + offset, **record}
+               for offset, record in enumerate(records)]
+    table = entity.table_name
+    try:
+        if table in SCHEMAS:
+            SCHEMAS[table].validate(created)
+    except SchemaError as error:
+        print(f"Error: Registros inválidos para {table}.json: {error}")
+        return None
+    return created
+
+
+def _place_records(entity, created: list, loaded: Dict[Path, list]):
+    """Agrega en memoria cada registro nuevo a su archivo (o shard).
+
+    Returns:
+        tuple: ``({archivo: ids agregados}, {id: estado})``, o None si un
+        archivo no se pudo leer.
+    """
+    table, layout = entity.table_name, entity.shards
+    touched: Dict[Path, list] = {}
+    estados: Dict[int, str] = {}
+    with phase("mutate"):
+        for record in created:
+            if layout is None:
+                table_file = entity.output_dir / f"{table}.json"
+            else:
+                estado = None
+                if layout.by_estado:
+                    estado = estados[record['id']] = record.get('estado')
+                table_file = entity.output_dir / layout.shard_name(
+                    table, record['id'], estado)
+            target = _table_records(loaded, table_file, table)
+            if target is None:
+                return None
+            target.append(record)
+            touched.setdefault(table_file, []).append(record['id'])
+    return touched, estados
+
+
+def bulk_insert(entity, records: list) -> list:
+    """Inserta muchos registros nuevos con una sola escritura por archivo.
+
+    Los ids se asignan como un rango contiguo a continuación del mayor id
+    existente. Si no hay una sesión activa, la inserción se hace dentro de
+    una propia, de modo que se guarda completa o no se guarda.
+
+    Args:
+        entity: ``Hotel`` o ``Customer`` (o ``Reservation``).
+        records: Registros sin ``id``, ya validados.
+
+    Returns:
+        list: Ids asignados, o una lista vacía si no se pudo guardar.
+    """
+    if Session.current() is None:
+        try:
+            with Session():
+                return bulk_insert(entity, records)
+        except OSError:
+            return []
+
+    table = entity.table_name
+    layout = entity.shards
+    try:
+        entity.output_dir.mkdir(parents=True, exist_ok=True)
+    except (IOError, OSError) as error:
+        print(f"Error al escribir en archivo: {error}")
+        return []
+
+    loaded: Dict[Path, list] = {}
+    created = _new_records(entity, records, loaded)
+    placed = (None if created is None
+              else _place_records(entity, created, loaded))
+    if placed is None:
+        return []
+
+    touched, estados = placed
+    for table_file, added in touched.items():
+        note_ids(table_file, added)
+        write_json(table_file, loaded[table_file])
+        Session.current().set_max_id(table_file, None)
+    if layout is not None:
+        if layout.by_estado:
+            record_estados(entity.output_dir, table, layout, estados)
+        write_json(entity.output_dir / layout.meta_name(table),
+                   {'next_id': created[-1]['id'] + 1})
+    for record in created:
+        emit_change(entity, 'create', record['id'], None, record)
+    return [record['id'] for record in created]
+
+
+def table_files(entity) -> list:
+    """Lista los archivos de datos de la tabla de una clase.
+
+    Args:
+        entity: ``Hotel``, ``Customer`` o ``Reservation``.
+
+    Returns:
+        list: El archivo plano o los shards existentes.
+    """
+    if entity.shards is None:
+        return [entity.output_dir / f"{entity.table_name}.json"]
+    return entity.shards.files(entity.output_dir, entity.table_name)
+
+
+def load_table(entity) -> list:
+    """Carga todos los registros de la tabla de una clase.
+
+    Los archivos ausentes se consideran vacíos, los registros con lápida
+    se omiten y los archivos con registros que no cumplen el esquema se
+    reportan y se omiten.
+
+    Args:
+        entity: ``Hotel``, ``Customer`` o ``Reservation``.
+
+    Returns:
+        list: Copias de los registros de todos los archivos de la tabla.
+    """
+    records = []
+    for table_file in table_files(entity):
+        if file_exists(table_file):
+            success, data = load_records(table_file, entity.table_name)
+            if success:
+                dead = tombstones(table_file).ids
+                records.extend(copy_record(r) for r in data
+                               if r['id'] not in dead)
+    return records
+
+
+def list_page(entity, cursor: Optional[int] = None,
+              limit: int = 50) -> Dict:
+    """Devuelve una página de registros ordenados por id.
+
+    Con una tabla en un solo archivo la página se ubica con el índice de
+    posiciones del archivo (``hotel_records.scan_file``) y sólo se leen
+    sus registros; dentro de una sesión se usa el índice por id de la
+    tabla en memoria. El índice se construye una vez mientras el archivo
+    no cambie, así que cada página cuesta una búsqueda binaria más sus
+    registros, sin importar su posición. Las tablas particionadas se
+    recorren con ``scan_range``. Los registros con lápida y los que no
+    tienen id entero se omiten.
+
+    Args:
+        entity: ``Hotel``, ``Customer`` o ``Reservation``.
+        cursor: ``next_cursor`` de la página anterior (None para la
+            primera).
+        limit: Registros por página.
+
+    Returns:
+        Dict: ``items`` (registros de la página) y ``next_cursor`` (None
+        si es la última página).
+
+    Raises:
+        ValueError: Si ``limit`` es menor que 1.
+    """
+    if limit < 1:
+        raise ValueError("limit debe ser mayor que 0.")
+    after = 0 if cursor is None else int(cursor)
+    items = []
+    table_file = entity.output_dir / f"{entity.table_name}.json"
+    dead = tombstones(table_file).ids
+    session = Session.current()
+    if entity.shards is not None or (session is not None
+                                     and file_exists(table_file)):
+        items = list(islice(scan_range(entity, after + 1), limit + 1))
+    elif table_file.exists():
+        try:
+            items = list(islice(scan_file(table_file, after + 1, skip=dead),
+                                limit + 1))
+        except json.JSONDecodeError as e:
+            print(f"Error: Invalid JSON in {entity.table_name}.json: {e}")
+            items = []
+    next_cursor = items[limit - 1]['id'] if len(items) > limit else None
+    return {'items': items[:limit], 'next_cursor': next_cursor}
+
+
+def _file_index(entity, table_file: Path):
+    """Índice por id de un archivo de tabla, o None si no se puede leer.
+
+    Con ``record_cache_size`` es el ``RecordCache`` del archivo, que no
+    carga la tabla; si no, un ``IdIndex`` sobre la tabla en memoria.
+    """
+    session = Session.current()
+    held = session is not None and session.contains(table_file)
+    size = getattr(entity, 'record_cache_size', None)
+    if size is not None and not held:
+        return record_cache(table_file, size) if table_file.exists() else None
+    if not file_exists(table_file):
+        return None
+    success, records = load_records(table_file, entity.table_name)
+    if not success:
+        return None
+    if held:
+        return IdIndex(records, session.is_ordered(table_file))
+    return index_for(table_file, records)
+
+
+def scan_range(entity, low: Optional[int] = None,
+               high: Optional[int] = None) -> Iterator[Dict]:
+    """Recorre en orden los registros con ``low <= id <= high``.
+
+    Cada archivo se recorre con su índice por id desde ``low`` (búsqueda
+    binaria) hasta ``high``, sin ordenar la tabla; los shards se juntan
+    en orden con un heap. Los registros con lápida se omiten.
+
+    Args:
+        entity: ``Hotel``, ``Customer`` o ``Reservation``.
+        low: Menor id incluido (None para empezar por el primero).
+        high: Mayor id incluido (None para terminar en el último).
+
+    Yields:
+        Dict: Copia de cada registro, en orden de id.
+    """
+    scans = []
+    for table_file in table_files(entity):
+        index = _file_index(entity, table_file)
+        if index is not None:
+            scans.append(index.scan(low, high, tombstones(table_file).ids))
+    for record in scans[0] if len(scans) == 1 else merge(scans):
+        yield copy_record(record)
+
+
+def id_range(entity) -> Tuple[Optional[int], Optional[int]]:
+    """Devuelve el menor y el mayor id vivos de la tabla de una clase.
+
+    Args:
+        entity: ``Hotel``, ``Customer`` o ``Reservation``.
+
+    Returns:
+        tuple: ``(menor, mayor)``, o ``(None, None)`` si está vacía.
+    """
+    lows, highs = [], []
+    for table_file in table_files(entity):
+        index = _file_index(entity, table_file)
+        if index is None:
+            continue
+        low, high = index.bounds(tombstones(table_file).ids)
+        if low is not None:
+            lows.append(low)
+            highs.append(high)
+    return (min(lows), max(highs)) if lows else (None, None)
+
+
+def export_ordered(entity, file_path, low: Optional[int] = None,
+                   high: Optional[int] = None) -> int:
+    """Exporta en orden de id los registros de un rango a JSONL.
+
+    Los registros se escriben conforme se recorren, en un temporal que
+    se renombra al terminar.
+
+    Args:
+        entity: ``Hotel``, ``Customer`` o ``Reservation``.
+        file_path: Archivo de salida (una línea JSON por registro).
+        low: Menor id incluido (None para empezar por el primero).
+        high: Mayor id incluido (None para terminar en el último).
+
+    Returns:
+        int: Registros exportados, o -1 si no se pudo escribir.
+    """
+    file_path = Path(file_path)
+    temporary = file_path.with_name(file_path.name + ".tmp")
+    exported = 0
+    bytes_written = 0
+    try:
+        with open(temporary, 'w', encoding='utf-8') as file:
+            for record in scan_range(entity, low, high):
+                line = json.dumps(record, ensure_ascii=False) + "\n"
+                file.write(line)
+                bytes_written += len(line.encode('utf-8'))
+                exported += 1
+        os.replace(temporary, file_path)
+    except (IOError, OSError) as error:
+        print(f"Error al escribir en archivo: {error}")
+        return -1
+    record_io(file_path, bytes_written=bytes_written, opens=1)
+    return exported
+
+
+# Suscripción vigente de cada índice en memoria (``(clase, uso)``).
+_SUBSCRIPTIONS: Dict[Tuple[type, str], Callable[[], None]] = {}
+
+
+def resubscribe(key: Tuple[type, str], callback: Callable,
+                directory: Path) -> None:
+    """Cambia la suscripción de un índice a los cambios de un directorio."""
+    unsubscribe = _SUBSCRIPTIONS.pop(key, None)
+    if unsubscribe is not None:
+        unsubscribe()
+    _SUBSCRIPTIONS[key] = subscribe(callback, directory)
+
+
+def search_index(entity, rebuild: bool = False) -> TrigramIndex:
+    """Devuelve el índice de trigramas de ``nombre`` de una clase.
+
+    La primera vez (o con ``rebuild``) se construye desde la tabla; después
+    se mantiene con los cambios de las tablas de ``output_dir``. Si
+    ``output_dir`` cambia, el índice se vuelve a construir para el nuevo
+    directorio.
+
+    Args:
+        entity: ``Hotel`` o ``Customer``.
+        rebuild: Reconstruir el índice desde la tabla.
+
+    Returns:
+        TrigramIndex: Índice de la clase.
+    """
+    directory = Path(entity.output_dir)
+    index = entity.search_index
+    if index is None or index.directory != directory:
+        index = entity.search_index = TrigramIndex(entity.table_name,
+                                                   directory=directory)
+        resubscribe((entity, 'search'), index.apply, directory)
+        rebuild = True
+    if rebuild:
+        index.rebuild(load_table(entity))
+    return index
+
+
+def bulk_update(entity, changes: Dict[int, Dict]) -> int:
+    """Actualiza muchos registros con una sola escritura por archivo.
+
+    Un hotel cuya ``habitaciones_disponibles`` cambia sin un
+    ``inventario`` nuevo descarta el suyo si ya no coincide
+    (``hotel_rooms.sync_inventory``).
+
+    Args:
+        entity: ``Hotel``, ``Customer`` o ``Reservation``.
+        changes: ``{id: {campo: valor}}`` con los campos a reemplazar.
+
+    Returns:
+        int: Número de registros actualizados.
+    """
+    if Session.current() is None:
+        try:
+            with Session():
+                return bulk_update(entity, changes)
+        except OSError:
+            return 0
+
+    schema = SCHEMAS.get(entity.table_name)
+    for record_id, change in changes.items():
+        problem = None if schema is None else schema.check(change,
+                                                           partial=True)
+        if problem is not None:
+            print(f"Error: Cambio inválido para el id {record_id}: "
+                  f"{problem}")
+            return 0
+    updated = 0
+    for table_file in table_files(entity):
+        if not file_exists(table_file):
+            continue
+        success, records = load_records(table_file, entity.table_name)
+        if not success:
+            continue
+        dead = tombstones(table_file).ids
+        modified = []
+        with phase("mutate"):
+            for record in records:
+                if record['id'] in changes and record['id'] not in dead:
+                    change = changes[record['id']]
+                    modified.append((dict(record), record))
+                    record.update(change)
+                    if ('habitaciones_disponibles' in change
+                            and 'inventario' not in change):
+                        sync_inventory(record)
+        if modified:
+            write_json(table_file, records)
+            updated += len(modified)
+            for before, record in modified:
+                emit_change(entity, 'modify', record['id'], before, record)
+    return updated
@@ -0,0 +1,155 @@
+"""
+Borrado lógico de registros con lápidas (tombstones).
+
+Con ``soft_delete`` activo, ``Hotel.delete``, ``Customer.delete`` y
+``Reservation.cancel`` no reescriben la tabla: agregan el id del registro
+a un archivo de lápidas junto a ella (``Hotels.json`` ->
+``Hotels.tombstones``, una línea por id), que es una escritura O(1). Las
+lecturas omiten los registros con lápida y los ids con lápida no se
+vuelven a asignar.
+
+La compactación reescribe la tabla sin los registros muertos y vacía el
+archivo de lápidas. Se hace bajo demanda (``compact_tombstones``) o al
+borrar, cuando los muertos superan ``compact_ratio`` de la tabla, así el
+costo de reescribir se reparte entre muchos borrados. El archivo vaciado
+conserva en su primera línea (``# max N``) el mayor id borrado, para que
+los ids de los registros compactados tampoco se vuelvan a asignar.
+
+Las lápidas de cada archivo se leen una vez y se vuelven a leer sólo si
+el archivo cambió (inodo, fecha de modificación y tamaño), igual que los
+documentos de ``hotel_storage``.
+"""
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from hotel_storage import (append_bytes, file_signature, read_bytes,
+                           replace_bytes)
+
+SUFFIX = ".tombstones"
+_MAX_PREFIX = "# max "
+
+
+class Tombstones:
+    """Ids borrados de un archivo de tabla.
+
+    Attributes:
+        path: Archivo de lápidas.
+    """
+
+    def __init__(self, table_file: Path):
+        self.path = Path(table_file).with_suffix(SUFFIX)
+        self._ids: Set[int] = set()
+        self._pending: Set[int] = set()
+        self._max_id = 0
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._lock = threading.Lock()
+
+    def __contains__(self, record_id) -> bool:
+        with self._lock:
+            self._refresh()
+            return record_id in self._ids or record_id in self._pending
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._ids | self._pending)
+
+    @property
+    def ids(self) -> Set[int]:
+        """Copia de los ids borrados, escritos o pendientes."""
+        with self._lock:
+            self._refresh()
+            return self._ids | self._pending
+
+    @property
+    def max_id(self) -> int:
+        """Mayor id borrado, aunque ya se haya compactado (0 si ninguno)."""
+        with self._lock:
+            self._refresh()
+            return max(self._max_id, max(self._pending, default=0))
+
+    def mark(self, record_id: int) -> None:
+        """Marca un id como borrado sólo en memoria."""
+        with self._lock:
+            self._pending.add(record_id)
+
+    def unmark(self, record_id: int) -> None:
+        """Descarta una marca pendiente (p. ej. si la sesión se revirtió)."""
+        with self._lock:
+            self._pending.discard(record_id)
+
+    def persist(self, record_id: int) -> None:
+        """Agrega el id al archivo de lápidas."""
+        raw = f"{record_id}\n".encode('utf-8')
+        with self._lock:
+            self._refresh()
+            append_bytes(self.path, raw)
+            self._pending.discard(record_id)
+            self._ids.add(record_id)
+            self._max_id = max(self._max_id, record_id)
+            self._signature = file_signature(self.path, missing_ok=True)
+
+    def clear(self, record_ids: Iterable[int]) -> None:
+        """Quita lápidas de registros que ya no están en la tabla.
+
+        El mayor id borrado se conserva en el archivo aunque se quite su
+        lápida.
+        """
+        with self._lock:
+            self._refresh()
+            record_ids = set(record_ids)
+            self._ids -= record_ids
+            self._pending -= record_ids
+            self._max_id = max(self._max_id, max(record_ids, default=0))
+            if not self._ids and not self._max_id:
+                if self.path.exists():
+                    self.path.unlink()
+                self._signature = None
+                return
+            lines = [f"{_MAX_PREFIX}{self._max_id}"]
+            lines.extend(str(record_id) for record_id in sorted(self._ids))
+            replace_bytes(self.path, "".join(
+                line + "\n" for line in lines).encode('utf-8'))
+            self._signature = file_signature(self.path, missing_ok=True)
+
+    def _refresh(self) -> None:
+        signature = file_signature(self.path, missing_ok=True)
+        if signature == self._signature:
+            return
+        self._signature = signature
+        self._ids = set()
+        self._max_id = 0
+        if signature is None:
+            return
+        for line in read_bytes(self.path).decode('utf-8').splitlines():
+            if line.startswith(_MAX_PREFIX):
+                line = line[len(_MAX_PREFIX):]
+                if line.isdigit():
+                    self._max_id = max(self._max_id, int(line))
+                continue
+            try:
+                record_id = int(line)
+            except ValueError:
+                continue
+            self._ids.add(record_id)
+            self._max_id = max(self._max_id, record_id)
+
+
+_REGISTRY: Dict[Path, Tombstones] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def tombstones(table_file: Path) -> Tombstones:
+    """Devuelve las lápidas de un archivo de tabla."""
+    table_file = Path(table_file)
+    with _REGISTRY_LOCK:
+        if table_file not in _REGISTRY:
+            _REGISTRY[table_file] = Tombstones(table_file)
+        return _REGISTRY[table_file]
+
+
+def reset() -> None:
+    """Olvida las lápidas cargadas (se vuelven a leer de disco)."""
+    with _REGISTRY_LOCK:
+        _REGISTRY.clear()
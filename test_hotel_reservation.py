@@ -0,0 +1,2219 @@
+import unittest
+import http.client
+import json
+import multiprocessing
+import os
+import threading
+import time
+import shutil
+from pathlib import Path
+from io import StringIO
+import sys
+from unittest import mock
+
+import hotel_availability
+import hotel_bloom
+import hotel_changes
+import hotel_check
+import hotel_checkpoint
+import hotel_durability
+import hotel_holds
+import hotel_idempotency
+import hotel_import
+import hotel_load
+import hotel_metrics
+import hotel_records
+import hotel_replay
+import hotel_rooms
+import hotel_schema
+import hotel_search
+import hotel_server
+import hotel_shards
+import hotel_storage
+import hotel_tombstones
+from hotel_reservation import Hotel, Customer, Reservation, Session
+from hotel_reservation import ShardLayout, bulk_insert, bulk_update
+from hotel_reservation import shard_table
+from hotel_reservation import compact_tombstones, search_index
+from hotel_reservation import export_ordered, id_range, scan_range
+from hotel_reservation import filter_stats, load_table
+from hotel_cli import main as cli_main
+
+
+class ReservationTestCase(unittest.TestCase):
+
+    test_dir = Path("TestResultsReservation")
+
+    def setUp(self):
+        Hotel.output_dir = self.test_dir
+        Customer.output_dir = self.test_dir
+        Reservation.output_dir = self.test_dir
+        Hotel.shards = Customer.shards = Reservation.shards = None
+        for entity in (Hotel, Customer, Reservation):
+            entity.soft_delete = False
+            entity.compact_ratio = 0.25
+        Hotel.record_cache_size = Customer.record_cache_size = None
+        Hotel.bloom_error_rate = Customer.bloom_error_rate = 0.01
+        Hotel.availability = None
+        Hotel.aggregates = None
+        Hotel.search_index = Customer.search_index = None
+        Hotel.holds = hotel_holds.HoldRegistry()
+        Reservation._idempotency = None
+        Reservation.idempotency_capacity = 10000
+        hotel_changes.FEED.reset()
+        hotel_storage.invalidate()
+        hotel_tombstones.reset()
+        hotel_records.reset()
+        hotel_bloom.reset()
+        hotel_shards.reset()
+        if self.test_dir.exists():
+            shutil.rmtree(self.test_dir)
+        self.test_dir.mkdir(parents=True, exist_ok=True)
+        hotel_metrics.reset_stats()
+
+        self.captured_output = StringIO()
+        sys.stdout = self.captured_output
+
+    def tearDown(self):
+        sys.stdout = sys.__stdout__
+        Hotel.shards = Customer.shards = Reservation.shards = None
+        if self.test_dir.exists():
+            shutil.rmtree(self.test_dir)
+
+    def read_table(self, name):
+        with open(self.test_dir / f"{name}.json", 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+
+class TestMetrics(ReservationTestCase):
+
+    def test_stats_counts_calls_and_errors(self):
+        hotel = Hotel("Hotel", "Puebla", 1)
+        hotel.create()
+        hotel.reserve_room(1)
+        hotel.reserve_room(1)
+
+        stats = hotel_metrics.stats()['Hotel.reserve_room']
+        self.assertEqual(stats['calls'], 2)
+        self.assertEqual(stats['errors'], 1)
+        self.assertEqual(stats['latency']['count'], 2)
+        self.assertGreaterEqual(stats['latency']['p99'],
+                                stats['latency']['p50'])
+
+    def test_stats_split_into_phases(self):
+        hotel = Hotel("Hotel", "Puebla", 5)
+        hotel.create()
+        hotel_storage.invalidate()
+        hotel.reserve_room(1)
+
+        phases = hotel_metrics.stats()['Hotel.reserve_room']['phases']
+        for name in hotel_metrics.PHASES:
+            self.assertIn(name, phases)
+            self.assertEqual(phases[name]['count'], 1)
+
+    def test_nested_operations_are_recorded(self):
+        Hotel("Hotel", "Puebla", 5).create()
+        Customer("Ana", "ana@email.com", "123").create()
+        Reservation(1, 1).create()
+
+        stats = hotel_metrics.stats()
+        self.assertEqual(stats['Reservation.create']['calls'], 1)
+        self.assertEqual(stats['Hotel.reserve_room']['calls'], 1)
+        self.assertEqual(stats['Customer.display_info']['errors'], 0)
+
+    def test_histogram_percentiles(self):
+        histogram = hotel_metrics.Histogram()
+        for _ in range(99):
+            histogram.observe(0.001)
+        histogram.observe(2.0)
+
+        self.assertLessEqual(histogram.percentile(0.5), 0.001)
+        self.assertGreater(histogram.percentile(0.999), 1.0)
+        self.assertEqual(histogram.percentile(1.0), 2.0)
+
+    def test_dump_prometheus(self):
+        hotel = Hotel("Hotel", "Puebla", 5)
+        hotel.create()
+
+        path = hotel_metrics.dump_prometheus(self.test_dir / "metrics.prom")
+        text = path.read_text(encoding='utf-8')
+        self.assertIn('hotel_operation_calls_total'
+                      '{operation="Hotel.create"} 1', text)
+        self.assertIn('hotel_operation_latency_seconds_bucket'
+                      '{operation="Hotel.create",le="+Inf"} 1', text)
+        self.assertIn('phase="write"', text)
+
+
+class TestIOAccounting(ReservationTestCase):
+
+    def test_reservation_create_io_is_attributed_to_logical_op(self):
+        Hotel("Hotel", "Puebla", 5).create()
+        Customer("Ana", "ana@email.com", "123").create()
+        hotel_metrics.reset_stats()
+        created = (self.test_dir / "Changes.jsonl").stat().st_size
+
+        Reservation(1, 1).create()
+
+        io = hotel_metrics.stats()['Reservation.create']['io']
+        self.assertEqual(io['calls'], 1)
+        # Customers y Hotels ya están en el caché de documentos: sólo se
+        # escriben Hotels, Reservations y el registro de cambios.
+        self.assertEqual(io['total']['files_touched'], 3)
+        self.assertEqual(io['total']['opens'], 4)
+        written = sum(
+            (self.test_dir / name).stat().st_size
+            for name in ("Hotels.json", "Reservations.json",
+                         "Changes.jsonl")) - created
+        self.assertEqual(io['total']['bytes_written'], written)
+        self.assertEqual(
+            hotel_metrics.stats()['Hotel.reserve_room']['io']['calls'], 0)
+
+    def test_io_regressions(self):
+        Hotel("Hotel", "Puebla", 5).create()
+
+        self.assertEqual(hotel_metrics.io_regressions(
+            {'Hotel.create': {'bytes_written': 1 << 20}}), {})
+        violations = hotel_metrics.io_regressions(
+            {'Hotel.create': {'bytes_written': 1}})
+        self.assertIn('bytes_written', violations['Hotel.create'])
+
+
+class TestSession(ReservationTestCase):
+
+    def test_session_writes_each_table_once(self):
+        with Session() as session:
+            hotel = Hotel("Hotel", "Puebla", 5)
+            hotel.create()
+            hotel.modify_info(nombre="Hotel Nuevo")
+            customer = Customer("Ana", "ana@email.com", "123")
+            customer.create()
+            for _ in range(3):
+                Reservation(customer.id, hotel.id).create()
+            Reservation(0, 0, reservation_id=2).cancel()
+            self.assertFalse((self.test_dir / "Hotels.json").exists())
+            self.assertEqual(len(session.dirty), 3)
+
+        io = hotel_metrics.stats()['Session.flush']['io']
+        # Una escritura por tabla y una al registro de cambios.
+        self.assertEqual(io['total']['opens'], 4)
+        hotels = self.read_table("Hotels")
+        self.assertEqual(hotels[0]['nombre'], "Hotel Nuevo")
+        self.assertEqual(hotels[0]['habitaciones_disponibles'], 3)
+        reservations = self.read_table("Reservations")
+        self.assertEqual([r['id'] for r in reservations], [1, 3])
+
+    def test_session_reads_each_table_once(self):
+        Hotel("Hotel", "Puebla", 5).create()
+        hotel_storage.invalidate()
+        hotel_metrics.reset_stats()
+
+        with Session():
+            hotel = Hotel("", "", 0, hotel_id=1)
+            hotel.reserve_room(1)
+            hotel.reserve_room(2)
+            hotel.display_info()
+
+        stats = hotel_metrics.stats()
+        self.assertEqual(stats['Hotel.reserve_room']['io']['total']['opens'],
+                         1)
+        self.assertEqual(stats['Hotel.display_info']['io']['total']['opens'],
+                         0)
+
+    def test_session_rolls_back_on_exception(self):
+        Hotel("Hotel", "Puebla", 5).create()
+
+        with self.assertRaises(ValueError):
+            with Session():
+                Hotel("", "", 0, hotel_id=1).reserve_room(1)
+                Hotel("Otro", "Veracruz", 10).create()
+                raise ValueError("fallo")
+
+        hotels = self.read_table("Hotels")
+        self.assertEqual(len(hotels), 1)
+        self.assertEqual(hotels[0]['habitaciones_disponibles'], 5)
+
+    def test_failed_flush_raises_and_rolls_back(self):
+        Hotel("Hotel", "Puebla", 5).create()
+        Customer("Ana", "ana@email.com", "123").create()
+
+        with mock.patch('hotel_storage.atomic_write',
+                        side_effect=OSError("disco lleno")):
+            with self.assertRaises(OSError):
+                with Session():
+                    self.assertTrue(Reservation(1, 1).create())
+
+        self.assertFalse((self.test_dir / "Reservations.json").exists())
+        self.assertEqual(
+            self.read_table("Hotels")[0]['habitaciones_disponibles'], 5)
+        self.assertFalse(Reservation(0, 0, reservation_id=1).cancel())
+        self.assertEqual(bulk_update(Hotel, {1: {'nombre': 'Otro'}}), 1)
+        with mock.patch('hotel_storage.atomic_write',
+                        side_effect=OSError("disco lleno")):
+            self.assertEqual(bulk_update(Hotel, {1: {'nombre': 'X'}}), 0)
+        self.assertEqual(self.read_table("Hotels")[0]['nombre'], 'Otro')
+
+    def test_sessions_cannot_be_nested(self):
+        with Session():
+            with self.assertRaises(RuntimeError):
+                with Session():
+                    pass
+
+
+class TestDurability(ReservationTestCase):
+
+    def tearDown(self):
+        hotel_durability.set_durability(hotel_durability.DURABILITY_NONE)
+        super().tearDown()
+
+    def test_failed_write_keeps_previous_table(self):
+        hotel = Hotel("Hotel", "Puebla", 5)
+        hotel.create()
+
+        with mock.patch('hotel_durability.os.replace',
+                        side_effect=OSError("disco lleno")):
+            self.assertFalse(hotel.modify_info(nombre="Otro"))
+
+        self.assertEqual(self.read_table("Hotels")[0]['nombre'], "Hotel")
+        self.assertEqual(sorted(p.name for p in self.test_dir.iterdir()),
+                         ["Changes.jsonl", "Hotels.json"])
+
+    def test_fsync_per_commit_counts_fsyncs(self):
+        hotel_durability.set_durability(
+            hotel_durability.DURABILITY_FSYNC)
+        Hotel("Hotel", "Puebla", 5).create()
+
+        io = hotel_metrics.stats()['Hotel.create']['io']
+        # Archivo y directorio de Hotels.json, más el registro de cambios.
+        self.assertEqual(io['total']['fsyncs'], 3)
+
+    def test_group_commit_shares_fsync_cycle(self):
+        hotel_durability.set_durability(
+            hotel_durability.DURABILITY_GROUP, group_commit_ms=200)
+        committer = hotel_durability._Config.committer
+        results = []
+        writers = [threading.Thread(
+            target=lambda n=n: results.append(hotel_durability.atomic_write(
+                self.test_dir / f"tabla{n}.json", b"[]")))
+            for n in range(8)]
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join()
+
+        self.assertEqual(hotel_durability.get_durability(),
+                         hotel_durability.DURABILITY_GROUP)
+        # Cada escritor hace fsync de su temporal; el directorio se
+        # sincroniza una vez por ciclo para todos.
+        self.assertEqual(results, [1] * 8)
+        self.assertLessEqual(committer.cycles, 2)
+        self.assertEqual(committer.fsyncs, committer.cycles)
+
+    def test_group_commit_does_not_delay_a_single_writer(self):
+        hotel_durability.set_durability(
+            hotel_durability.DURABILITY_GROUP, group_commit_ms=2000)
+        committer = hotel_durability._Config.committer
+        start = time.monotonic()
+        for number in range(3):
+            hotel_durability.atomic_write(
+                self.test_dir / f"tabla{number}.json", b"[]")
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(committer.cycles, 3)
+
+    def test_group_commit_waits_for_a_cycle_that_includes_the_file(self):
+        committer = hotel_durability.GroupCommitter(1)
+        first, second = self.test_dir / "a.json", self.test_dir / "b.json"
+        first.write_bytes(b"[]")
+        second.write_bytes(b"[]")
+        synced, acknowledged = [], []
+        started, release = threading.Event(), threading.Event()
+        original = committer._sync
+
+        def slow_sync(pending):
+            synced.append(set(pending))
+            started.set()
+            release.wait(5)
+            original(pending)
+        committer._sync = slow_sync
+
+        writer = threading.Thread(target=committer.commit, args=(first,))
+        writer.start()
+        started.wait(5)
+        late = threading.Thread(target=lambda: (
+            committer.commit(second), acknowledged.append(list(synced))))
+        late.start()
+        time.sleep(0.05)
+        release.set()
+        writer.join(5)
+        late.join(5)
+        committer.stop()
+
+        self.assertEqual(synced[0], {first})
+        self.assertIn(second, acknowledged[0][-1])
+
+    def test_invalid_durability_level(self):
+        with self.assertRaises(ValueError):
+            hotel_durability.set_durability("siempre")
+
+
+class TestSharding(ReservationTestCase):
+
+    def test_hash_layout_routes_to_one_shard(self):
+        Hotel.shards = ShardLayout(count=2)
+        Customer.shards = ShardLayout(count=2)
+        Reservation.shards = ShardLayout(count=2)
+        for name in ("A", "B", "C"):
+            Hotel(name, "Puebla", 5).create()
+        Customer("Ana", "ana@email.com", "123").create()
+
+        self.assertEqual(len(self.read_table("Hotels.000")), 1)
+        self.assertEqual(len(self.read_table("Hotels.001")), 2)
+        self.assertFalse((self.test_dir / "Hotels.json").exists())
+
+        hotel_metrics.reset_stats()
+        hotel = Hotel("", "", 0, hotel_id=2)
+        self.assertTrue(hotel.reserve_room(1))
+        io = hotel_metrics.stats()['Hotel.reserve_room']['io']
+        # El shard del hotel y el registro de cambios.
+        self.assertEqual(io['total']['files_touched'], 2)
+
+        self.assertTrue(Reservation(1, 3).create())
+        self.assertEqual(self.read_table("Reservations.001")[0]['hotel_id'],
+                         3)
+        self.assertTrue(Reservation(0, 0, reservation_id=1).cancel())
+        self.assertEqual(self.read_table("Hotels.001")[1]
+                         ['habitaciones_disponibles'], 5)
+
+    def test_range_layout(self):
+        Customer.shards = ShardLayout(strategy="range", range_size=2)
+        for index in range(5):
+            Customer(f"C{index}", "c@email.com", "1").create()
+
+        self.assertEqual([c['id'] for c in self.read_table("Customers.002")],
+                         [5])
+        self.assertTrue(Customer("", "", "", customer_id=3).display_info())
+        self.assertTrue(Customer("", "", "", customer_id=4).delete())
+        self.assertEqual([c['id'] for c in self.read_table("Customers.001")],
+                         [3])
+
+    def test_estado_layout_moves_hotel_between_shards(self):
+        Hotel.shards = ShardLayout(count=1, by_estado=True)
+        hotel = Hotel("Hotel", "Nuevo León", 5)
+        hotel.create()
+        self.assertTrue((self.test_dir / "Hotels.nuevo-leon.000.json")
+                        .exists())
+
+        self.assertTrue(hotel.modify_info(estado="Puebla"))
+
+        self.assertEqual(self.read_table("Hotels.nuevo-leon.000"), [])
+        self.assertEqual(self.read_table("Hotels.puebla.000")[0]['id'], 1)
+        self.assertTrue(Hotel("", "", 0, hotel_id=1).reserve_room(1))
+
+    def test_failed_move_keeps_the_source_shard(self):
+        Hotel.shards = ShardLayout(count=1, by_estado=True)
+        hotel = Hotel("Hotel", "Nuevo León", 5)
+        hotel.create()
+
+        with mock.patch('hotel_durability.os.replace',
+                        side_effect=OSError("disco lleno")):
+            self.assertFalse(hotel.modify_info(estado="Puebla"))
+
+        info = Hotel("", "", 0, hotel_id=1).display_info()
+        self.assertEqual(info['estado'], "Nuevo León")
+        self.assertFalse((self.test_dir / "Hotels.puebla.000.json")
+                         .exists())
+        self.assertTrue(Hotel("", "", 0, hotel_id=1).reserve_room(1))
+
+    def test_estado_map_is_appended_and_kept_in_memory(self):
+        Hotel.shards = ShardLayout(count=1, by_estado=True)
+        for name in ("A", "B", "C"):
+            Hotel(name, "Puebla", 5).create()
+        Hotel("D", "Jalisco", 5).create()
+
+        self.assertEqual(self.read_table("Hotels.meta"), {'next_id': 5})
+        lines = (self.test_dir / "Hotels.estados.jsonl").read_text(
+            encoding='utf-8').splitlines()
+        self.assertEqual(lines[-1], '[4, "Jalisco"]')
+        hotel_metrics.reset_stats()
+        self.assertTrue(Hotel("", "", 0, hotel_id=4).reserve_room(1))
+        io = hotel_metrics.stats()['Hotel.reserve_room']['io']
+        # El shard del hotel y el registro de cambios, sin el mapa.
+        self.assertEqual(io['total']['files_touched'], 2)
+
+        hotel_shards.reset()
+        (self.test_dir / "Hotels.estados.jsonl").unlink()
+        self.assertTrue(Hotel("", "", 0, hotel_id=4).modify_info(
+            estado="Puebla"))
+        self.assertEqual([h['id'] for h in self.read_table(
+            "Hotels.puebla.000")], [1, 2, 3, 4])
+
+    def test_shard_existing_table(self):
+        for name in ("A", "B", "C"):
+            Hotel(name, "Puebla", 5).create()
+
+        self.assertTrue(shard_table(Hotel, ShardLayout(count=2)))
+
+        self.assertFalse((self.test_dir / "Hotels.json").exists())
+        self.assertEqual(self.read_table("Hotels.meta")['next_id'], 4)
+        hotel = Hotel("D", "Puebla", 5)
+        hotel.create()
+        self.assertEqual(hotel.id, 4)
+
+    def test_invalid_layout(self):
+        with self.assertRaises(ValueError):
+            ShardLayout(strategy="random")
+
+
+class TestBulkImport(ReservationTestCase):
+
+    def test_bulk_insert_appends_contiguous_ids(self):
+        Hotel("Existente", "Puebla", 5).create()
+        hotel_metrics.reset_stats()
+
+        ids = bulk_insert(Hotel, [
+            {'nombre': 'A', 'estado': 'Puebla', 'habitaciones': 3,
+             'habitaciones_disponibles': 3},
+            {'nombre': 'B', 'estado': 'Veracruz', 'habitaciones': 4,
+             'habitaciones_disponibles': 4},
+        ])
+
+        self.assertEqual(ids, [2, 3])
+        self.assertEqual([h['id'] for h in self.read_table("Hotels")],
+                         [1, 2, 3])
+        io = hotel_metrics.stats()['Session.flush']['io']
+        self.assertEqual(io['total']['opens'], 2)
+
+    def test_bulk_insert_into_shards(self):
+        Customer.shards = ShardLayout(count=2)
+        Customer("Ana", "ana@email.com", "1").create()
+
+        ids = bulk_insert(Customer, [
+            {'nombre': f'C{i}', 'email': 'c@email.com', 'telefono': '1'}
+            for i in range(3)])
+
+        self.assertEqual(ids, [2, 3, 4])
+        self.assertEqual(self.read_table("Customers.meta")['next_id'], 5)
+        self.assertEqual([c['id'] for c in self.read_table("Customers.000")],
+                         [2, 4])
+
+    def test_import_csv_reports_rejected_rows(self):
+        source = self.test_dir / "hoteles.csv"
+        source.write_text(
+            "nombre,estado,habitaciones\n"
+            "  Hotel  Uno ,Puebla,10\n"
+            "Hotel Dos,Veracruz,muchas\n"
+            "Hotel Tres,Jalisco,5\n", encoding='utf-8')
+
+        summary = hotel_import.import_file('hotels', source, chunk_size=2)
+
+        self.assertEqual(summary['rows'], 3)
+        self.assertEqual(summary['imported'], 2)
+        self.assertEqual(summary['errors'][0][0], 3)
+        hotels = self.read_table("Hotels")
+        self.assertEqual(hotels[0]['nombre'], "Hotel Uno")
+        self.assertEqual(hotels[1]['habitaciones_disponibles'], 5)
+
+    def test_import_jsonl_with_process_pool(self):
+        source = self.test_dir / "clientes.jsonl"
+        lines = [json.dumps({'nombre': f'Cliente {i}',
+                             'email': f'C{i}@Email.com',
+                             'telefono': '(222) 770-9000'})
+                 for i in range(10)]
+        lines.insert(3, "{roto")
+        source.write_text("\n".join(lines), encoding='utf-8')
+
+        summary = hotel_import.import_file('customers', source, workers=2,
+                                           chunk_size=3)
+
+        self.assertEqual(summary['imported'], 10)
+        self.assertEqual(summary['rejected'], 1)
+        customers = self.read_table("Customers")
+        self.assertEqual([c['id'] for c in customers], list(range(1, 11)))
+        self.assertEqual(customers[0]['email'], "c0@email.com")
+        self.assertEqual(customers[0]['telefono'], "2227709000")
+
+
+class TestConsistencyCheck(ReservationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        Hotel("A", "Puebla", 10).create()
+        Hotel("B", "Veracruz", 10).create()
+        Customer("Ana", "ana@email.com", "1").create()
+        Reservation(1, 1).create()
+        Reservation(1, 1).create()
+        Hotel("", "", 0, hotel_id=2).reserve_room(1)
+
+    def test_detects_drift(self):
+        report = hotel_check.check()
+
+        self.assertEqual(report['mismatches'], [
+            {'hotel_id': 2, 'ocupadas': 1, 'reservaciones': 0}])
+        self.assertEqual(report['orphans'], {})
+        self.assertEqual(report['repaired'], 0)
+
+    def test_parallel_count_over_shards(self):
+        for index in range(3):
+            Reservation(1, 2).create()
+        shard_table(Reservation, ShardLayout(count=3))
+
+        counts = hotel_check.count_reservations(workers=2)
+
+        self.assertEqual(counts, {1: 2, 2: 3})
+
+    def test_parallel_count_over_byte_ranges(self):
+        for index in range(7):
+            Reservation(1, 2).create()
+        Reservation(0, 0, reservation_id=3).cancel()
+
+        for workers in (2, 3, 5):
+            counts = hotel_check.count_reservations(workers=workers)
+            self.assertEqual(counts, {1: 2, 2: 6})
+        path = self.test_dir / "Reservations.json"
+        size = path.stat().st_size
+        for middle in range(0, size, 7):
+            counts = hotel_check.count_range(path, 0, middle)
+            counts.update(hotel_check.count_range(path, middle, size))
+            self.assertEqual(counts, {1: 2, 2: 6})
+
+    def test_repair_clamps_overbooked_hotel(self):
+        reservations = self.read_table("Reservations")
+        reservations += [{'id': 100 + index, 'customer_id': 1,
+                          'hotel_id': 2} for index in range(12)]
+        with open(self.test_dir / "Reservations.json", 'w',
+                  encoding='utf-8') as file:
+            json.dump(reservations, file, indent=2)
+
+        report = hotel_check.check(repair=True)
+
+        self.assertEqual(report['overbooked'], [
+            {'hotel_id': 2, 'habitaciones': 10, 'reservaciones': 12}])
+        self.assertEqual(
+            self.read_table("Hotels")[1]['habitaciones_disponibles'], 0)
+
+    def test_repair_in_one_write(self):
+        hotel_metrics.reset_stats()
+
+        report = hotel_check.check(repair=True)
+
+        self.assertEqual(report['repaired'], 1)
+        self.assertEqual(
+            self.read_table("Hotels")[1]['habitaciones_disponibles'], 10)
+        io = hotel_metrics.stats()['Session.flush']['io']
+        self.assertEqual(io['total']['opens'], 2)
+        self.assertEqual(hotel_check.check()['mismatches'], [])
+
+    def test_repair_rebuilds_the_room_inventory(self):
+        Hotel("C", "Puebla", 3).create()
+        Reservation(1, 3).create()
+        # Dos apartados perdidos: el inventario los da por ocupados.
+        Hotel("", "", 0, hotel_id=3).reserve_room(1)
+        Hotel("", "", 0, hotel_id=3).reserve_room(1)
+
+        hotel_check.check(repair=True)
+
+        self.assertTrue(Reservation(1, 3).create())
+        self.assertTrue(Reservation(1, 3).create())
+        self.assertFalse(Reservation(1, 3).create())
+        rooms = sorted(r['habitacion'] for r in self.read_table(
+            "Reservations") if r['hotel_id'] == 3)
+        self.assertEqual(rooms, [1, 2, 3])
+        self.assertEqual(hotel_check.check()['mismatches'], [])
+
+    def test_bulk_update_drops_a_stale_inventory(self):
+        Hotel("C", "Puebla", 2).create()
+        Hotel("", "", 0, hotel_id=3).reserve_room(1)
+        Hotel("", "", 0, hotel_id=3).reserve_room(1)
+
+        bulk_update(Hotel, {3: {'habitaciones_disponibles': 2}})
+
+        self.assertNotIn('inventario', self.read_table("Hotels")[2])
+        self.assertTrue(Hotel("", "", 0, hotel_id=3).reserve_room(1))
+
+
+class TestStorage(ReservationTestCase):
+
+    def test_reservation_create_parses_each_table_once(self):
+        Hotel("Hotel", "Puebla", 5).create()
+        Customer("Ana", "ana@email.com", "123").create()
+        Reservation(1, 1).create()
+        hotel_storage.invalidate()
+        cache = hotel_storage.CACHE
+        cache.hits = cache.misses = 0
+
+        self.assertTrue(Reservation(1, 1).create())
+
+        # Customers, Hotels y Reservations se decodifican una vez; la
+        # segunda lectura de Hotels (reserve_room) sale del caché.
+        self.assertEqual(cache.misses, 3)
+        self.assertEqual(cache.hits, 1)
+
+    def test_external_change_is_read_again(self):
+        Hotel("Hotel", "Puebla", 5).create()
+        self.assertEqual(
+            Hotel("", "", 0, hotel_id=1).display_info()['nombre'], "Hotel")
+
+        hotels = self.read_table("Hotels")
+        hotels[0]['nombre'] = "Editado a mano"
+        with open(self.test_dir / "Hotels.json", 'w',
+                  encoding='utf-8') as file:
+            json.dump(hotels, file)
+
+        self.assertEqual(
+            Hotel("", "", 0, hotel_id=1).display_info()['nombre'],
+            "Editado a mano")
+
+    def test_returned_records_do_not_alias_the_cache(self):
+        Hotel("Hotel", "Puebla", 5).create()
+
+        Hotel("", "", 0, hotel_id=1).display_info()['nombre'] = "Otro"
+
+        self.assertEqual(
+            Hotel("", "", 0, hotel_id=1).display_info()['nombre'], "Hotel")
+
+    def test_read_apis_return_copies(self):
+        Hotel("Hotel", "Puebla", 5).create()
+        path = self.test_dir / "Hotels.json"
+
+        hotel_storage.read_document(path)[0]['nombre'] = "Otro"
+        load_table(Hotel)[0]['nombre'] = "Otro"
+        next(scan_range(Hotel))['nombre'] = "Otro"
+        Hotel.list()['items'][0]['nombre'] = "Otro"
+        Hotel("", "", 0, hotel_id=1).reserve_room(1)
+        info = Hotel("", "", 0, hotel_id=1).display_info()
+        info['nombre'] = "Otro"
+        info['inventario']['libres'].append(1)
+
+        self.assertEqual(hotel_storage.read_shared(path)[0]['nombre'],
+                         "Hotel")
+        self.assertEqual(
+            hotel_storage.read_shared(path)[0]['inventario']['libres'], [])
+
+    def test_rollback_discards_cached_changes(self):
+        Hotel("Hotel", "Puebla", 5).create()
+
+        with self.assertRaises(ValueError):
+            with Session():
+                Hotel("", "", 0, hotel_id=1).reserve_room(1)
+                raise ValueError("fallo")
+
+        hotel = Hotel("", "", 0, hotel_id=1).display_info()
+        self.assertEqual(hotel['habitaciones_disponibles'], 5)
+
+    def test_failed_write_discards_cached_changes(self):
+        hotel = Hotel("Hotel", "Puebla", 5)
+        hotel.create()
+
+        with mock.patch('hotel_durability.os.replace',
+                        side_effect=OSError("disco lleno")):
+            self.assertFalse(hotel.modify_info(nombre="Otro"))
+
+        self.assertEqual(
+            Hotel("", "", 0, hotel_id=1).display_info()['nombre'], "Hotel")
+
+
+def _append_changes(directory, count):
+    log = hotel_changes.ChangeLog(directory)
+    for _ in range(count):
+        log.append([("Hotels", "modify", 1, None, None)])
+
+
+class TestChangeFeed(ReservationTestCase):
+
+    def test_every_mutation_emits_an_event(self):
+        events = []
+        hotel_changes.subscribe(events.append)
+
+        hotel = Hotel("Hotel", "Puebla", 2)
+        hotel.create()
+        hotel.modify_info(nombre="Hotel Nuevo")
+        customer = Customer("Ana", "ana@email.com", "123")
+        customer.create()
+        customer.modify_info(telefono="456")
+        Reservation(customer.id, hotel.id).create()
+        Reservation(0, 0, reservation_id=1).cancel()
+        customer.delete()
+        hotel.delete()
+
+        self.assertEqual(
+            [(e.table, e.op) for e in events],
+            [("Hotels", "create"), ("Hotels", "modify"),
+             ("Customers", "create"), ("Customers", "modify"),
+             ("Hotels", "reserve"), ("Reservations", "create"),
+             ("Hotels", "release"), ("Reservations", "cancel"),
+             ("Customers", "delete"), ("Hotels", "delete")])
+        self.assertEqual([e.seq for e in events], list(range(1, 11)))
+        self.assertIsNone(events[0].before)
+        self.assertEqual(events[1].before['nombre'], "Hotel")
+        self.assertEqual(events[1].after['nombre'], "Hotel Nuevo")
+        self.assertEqual(events[4].before['habitaciones_disponibles'], 2)
+        self.assertEqual(events[4].after['habitaciones_disponibles'], 1)
+        self.assertEqual(events[7].before['habitacion'], 1)
+        self.assertIsNone(events[9].after)
+
+    def test_read_changes_from_cursor(self):
+        for name in ("A", "B", "C"):
+            Hotel(name, "Puebla", 5).create()
+
+        events = hotel_changes.read_changes(self.test_dir, cursor=1)
+
+        self.assertEqual([e.seq for e in events], [2, 3])
+        self.assertEqual([e.after['nombre'] for e in events], ["B", "C"])
+        self.assertEqual(
+            len(hotel_changes.read_changes(self.test_dir, limit=1)), 1)
+
+    def test_sequence_continues_after_restart(self):
+        Hotel("A", "Puebla", 5).create()
+        hotel_changes.FEED.reset()
+
+        Hotel("B", "Puebla", 5).create()
+
+        events = hotel_changes.read_changes(self.test_dir)
+        self.assertEqual([e.seq for e in events], [1, 2])
+
+    def test_interleaved_logs_do_not_repeat_seqs(self):
+        # Dos registros del mismo directorio, como dos procesos.
+        first = hotel_changes.ChangeLog(self.test_dir)
+        second = hotel_changes.ChangeLog(self.test_dir)
+        change = ("Hotels", "modify", 1, None, None)
+        for log in (first, second, first, second):
+            log.append([change, change])
+
+        events = hotel_changes.read_changes(self.test_dir)
+        self.assertEqual([e.seq for e in events], list(range(1, 9)))
+        self.assertEqual(second.position()[0], 8)
+        self.assertEqual(len(hotel_changes.read_changes(self.test_dir, 6)),
+                         2)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), "requiere fork")
+    def test_processes_sharing_a_directory_do_not_repeat_seqs(self):
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=_append_changes,
+                                   args=(self.test_dir, 50))
+                   for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        seqs = [e.seq for e in hotel_changes.read_changes(self.test_dir)]
+        self.assertEqual(sorted(seqs), list(range(1, 201)))
+
+    def test_session_publishes_on_flush_and_drops_on_rollback(self):
+        events = []
+        hotel_changes.subscribe(events.append)
+
+        with Session():
+            Hotel("A", "Puebla", 5).create()
+            Hotel("", "", 0, hotel_id=1).reserve_room(1)
+            self.assertEqual(events, [])
+        self.assertEqual([e.op for e in events], ["create", "reserve"])
+        self.assertEqual(events[0].after['habitaciones_disponibles'], 5)
+
+        with self.assertRaises(ValueError):
+            with Session():
+                Hotel("B", "Puebla", 5).create()
+                raise ValueError("fallo")
+        self.assertEqual(len(hotel_changes.read_changes(self.test_dir)), 2)
+
+    def test_failing_subscriber_does_not_break_operation(self):
+        def failing(event):
+            raise RuntimeError("caído")
+        events = []
+        hotel_changes.subscribe(failing)
+        unsubscribe = hotel_changes.subscribe(events.append)
+
+        self.assertTrue(Hotel("A", "Puebla", 5).create())
+        unsubscribe()
+        Hotel("B", "Puebla", 5).create()
+
+        self.assertEqual(len(events), 1)
+        self.assertIn("Error en suscriptor de cambios",
+                      self.captured_output.getvalue())
+
+
+class TestEstadoAggregates(ReservationTestCase):
+
+    def test_totals_follow_every_hotel_change(self):
+        Hotel("A", "Puebla", 5).create()
+        self.assertEqual(Hotel.estado_totals("Puebla"),
+                         {'hoteles': 1, 'habitaciones': 5,
+                          'disponibles': 5})
+
+        hotel = Hotel("B", "Veracruz", 3)
+        hotel.create()
+        Customer("Ana", "ana@email.com", "1").create()
+        Reservation(1, 2).create()
+        Reservation(1, 2).create()
+        Reservation(0, 0, reservation_id=1).cancel()
+        hotel.modify_info(habitaciones=4)
+        Hotel("C", "Veracruz", 2).create()
+        Hotel("", "", 0, hotel_id=3).modify_info(estado="Puebla")
+        Hotel("", "", 0, hotel_id=1).delete()
+
+        expected = {'Puebla': {'hoteles': 1, 'habitaciones': 2,
+                               'disponibles': 2},
+                    'Veracruz': {'hoteles': 1, 'habitaciones': 4,
+                                 'disponibles': 3}}
+        self.assertEqual(Hotel.estado_totals(), expected)
+        self.assertTrue(Hotel.rebuild_aggregates())
+        self.assertEqual(Hotel.estado_totals(), expected)
+        stats = hotel_metrics.stats()['Hotel.rebuild_aggregates']
+        self.assertEqual(stats['errors'], 0)
+
+    def test_totals_follow_output_dir(self):
+        Hotel("A", "Puebla", 5).create()
+        self.assertEqual(Hotel.estado_totals("Puebla")['hoteles'], 1)
+        other = self.test_dir / "otro"
+        Hotel.output_dir = other
+        Hotel("B", "Veracruz", 3).create()
+
+        self.assertEqual(Hotel.estado_totals(),
+                         {'Veracruz': {'hoteles': 1, 'habitaciones': 3,
+                                       'disponibles': 3}})
+        Hotel.output_dir = self.test_dir
+        Hotel("C", "Puebla", 2).create()
+        self.assertEqual(Hotel.estado_totals("Puebla")['hoteles'], 2)
+        self.assertNotIn('Veracruz', Hotel.estado_totals())
+
+    def test_queries_do_not_read_the_table(self):
+        Hotel("A", "Puebla", 5).create()
+        Hotel.estado_totals()
+        hotel_metrics.reset_stats()
+
+        Hotel("", "", 0, hotel_id=1).reserve_room(1)
+        totals = Hotel.estado_totals("Puebla")
+
+        self.assertEqual(totals['disponibles'], 4)
+        io = hotel_metrics.stats()['Hotel.estado_totals']['io']
+        self.assertEqual(io['total']['opens'], 0)
+
+    def test_session_changes_apply_on_flush(self):
+        Hotel("A", "Puebla", 5).create()
+        Hotel.estado_totals()
+
+        with Session():
+            Hotel("", "", 0, hotel_id=1).reserve_room(1)
+            self.assertEqual(
+                Hotel.estado_totals("Puebla")['disponibles'], 5)
+
+        self.assertEqual(Hotel.estado_totals("Puebla")['disponibles'], 4)
+        self.assertEqual(Hotel.estado_totals("Jalisco")['hoteles'], 0)
+
+
+class TestNameSearch(ReservationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for nombre in ("Ana González Pérez", "Ana Gómez Ruiz",
+                       "Juan Pérez López", "Mariana Hernández Cruz"):
+            Customer(nombre, "c@email.com", "1").create()
+
+    def test_misspelled_and_partial_names(self):
+        results = Customer.search("ana gonzales")
+
+        self.assertEqual(results[0]['id'], 1)
+        self.assertEqual(results[0]['nombre'], "Ana González Pérez")
+        self.assertEqual([r['id'] for r in Customer.search("hernand")],
+                         [4])
+        self.assertEqual(Customer.search("Ana González Pérez")[0]['score'],
+                         1.0)
+        self.assertEqual(Customer.search("zzz"), [])
+
+    def test_results_are_ranked_and_limited(self):
+        results = Customer.search("ana perez", limit=2)
+
+        self.assertEqual([r['id'] for r in results], [1, 2])
+        self.assertGreater(results[0]['score'], results[1]['score'])
+        with self.assertRaises(ValueError):
+            Customer.search("ana", limit=0)
+
+    def test_index_follows_changes(self):
+        self.assertEqual(Customer.search("juan")[0]['id'], 3)
+
+        Customer("", "", "", customer_id=3).modify_info(nombre="Julio Paz")
+        Customer("", "", "", customer_id=1).delete()
+        Customer("Juana Ríos", "j@email.com", "1").create()
+
+        self.assertEqual([r['id'] for r in Customer.search("julio")], [3])
+        self.assertEqual([r['nombre'] for r in Customer.search("juana")],
+                         ["Juana Ríos"])
+        self.assertNotIn(1, [r['id'] for r in Customer.search("gonzalez")])
+
+    def test_hotels_are_indexed_separately(self):
+        Hotel("Gran Hotel Puebla", "Puebla", 5).create()
+        Hotel("Hotel Playa Azul", "Veracruz", 5).create()
+
+        self.assertEqual([r['id'] for r in Hotel.search("playa")], [2])
+        self.assertEqual(Hotel.search("gonzalez"), [])
+
+    def test_empty_result_is_not_an_error(self):
+        self.assertEqual(Customer.search("zzz"), [])
+
+        stats = hotel_metrics.stats()['Customer.search']
+        self.assertEqual((stats['calls'], stats['errors']), (1, 0))
+
+    def test_index_follows_output_dir(self):
+        self.assertEqual(Customer.search("juan")[0]['id'], 3)
+        other = self.test_dir / "otro"
+        Customer.output_dir = other
+        Customer("Pedro Juárez", "p@email.com", "1").create()
+
+        self.assertEqual([r['nombre'] for r in Customer.search("juan")],
+                         ["Pedro Juárez"])
+        Customer.output_dir = self.test_dir
+        Customer("Juan Soto", "j@email.com", "1").create()
+        self.assertEqual(len(Customer.search("juan")), 2)
+        Customer.output_dir = other
+        self.assertEqual(len(Customer.search("juan")), 1)
+
+    def test_rebuild_reads_the_table(self):
+        Customer.search("ana")
+        index = search_index(Customer, rebuild=True)
+
+        self.assertEqual(len(index), 4)
+
+    def test_trigrams(self):
+        self.assertEqual(hotel_search.words("Ána, ANA y Núñez"),
+                         ["ana", "y", "nunez"])
+        self.assertEqual(hotel_search.trigrams("ana"),
+                         {"  a", " an", "ana", "na "})
+
+
+class TestTombstones(ReservationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        Hotel.soft_delete = Customer.soft_delete = True
+        Reservation.soft_delete = True
+        Hotel.compact_ratio = Customer.compact_ratio = 1.0
+        Reservation.compact_ratio = 1.0
+        for number in range(1, 5):
+            Hotel(f"Hotel {number}", "Puebla", 5).create()
+
+    def test_delete_only_appends_a_tombstone(self):
+        before = (self.test_dir / "Hotels.json").read_bytes()
+        hotel_metrics.reset_stats()
+
+        self.assertTrue(Hotel("", "", 0, hotel_id=2).delete())
+
+        self.assertEqual((self.test_dir / "Hotels.json").read_bytes(),
+                         before)
+        self.assertEqual(
+            (self.test_dir / "Hotels.tombstones").read_text(), "2\n")
+        io = hotel_metrics.stats()['Hotel.delete']['io']['total']
+        self.assertEqual(io['files_touched'], 2)
+
+    def test_reads_skip_dead_records(self):
+        Hotel("", "", 0, hotel_id=2).delete()
+
+        self.assertEqual(Hotel("", "", 0, hotel_id=2).display_info(), {})
+        self.assertFalse(Hotel("", "", 0, hotel_id=2).delete())
+        self.assertFalse(Hotel("", "", 0, hotel_id=2).reserve_room(1))
+        self.assertEqual([h['id'] for h in Hotel.list()['items']],
+                         [1, 3, 4])
+        page = Hotel.list(limit=1)
+        self.assertEqual(Hotel.list(page['next_cursor'], 1)['items'][0]
+                         ['id'], 3)
+        self.assertEqual(bulk_update(
+            Hotel, {2: {'nombre': "X"}, 3: {'nombre': "Y"}}), 1)
+
+    def test_ids_are_not_reused(self):
+        Hotel("", "", 0, hotel_id=4).delete()
+        hotel = Hotel("Nuevo", "Puebla", 5)
+
+        self.assertTrue(hotel.create())
+
+        self.assertEqual(hotel.id, 5)
+
+    def test_ids_are_not_reused_after_compaction(self):
+        Customer.soft_delete = True
+        for number in range(1, 5):
+            Customer(f"C{number}", "c@email.com", "1").create()
+        Customer("", "", "", customer_id=4).delete()
+        Customer("", "", "", customer_id=3).delete()
+        self.assertEqual(compact_tombstones(Customer), 2)
+        self.assertEqual([c['id'] for c in self.read_table("Customers")],
+                         [1, 2])
+        hotel_tombstones.reset()
+
+        customer = Customer("Nuevo", "n@email.com", "1")
+        self.assertTrue(customer.create())
+
+        self.assertEqual(customer.id, 5)
+
+    def test_compaction_past_the_ratio(self):
+        Hotel.compact_ratio = 0.5
+        Hotel("", "", 0, hotel_id=1).delete()
+        Hotel("", "", 0, hotel_id=2).delete()
+        self.assertEqual(len(self.read_table("Hotels")), 4)
+
+        Hotel("", "", 0, hotel_id=3).delete()
+
+        self.assertEqual([h['id'] for h in self.read_table("Hotels")], [4])
+        self.assertEqual(
+            (self.test_dir / "Hotels.tombstones").read_text(), "# max 3\n")
+
+    def test_compact_on_demand(self):
+        Customer("Ana", "ana@email.com", "1").create()
+        Reservation(1, 1).create()
+        self.assertTrue(Reservation("", "", reservation_id=1).cancel())
+        self.assertEqual(
+            Hotel("", "", 0, hotel_id=1).display_info()
+            ['habitaciones_disponibles'], 5)
+
+        self.assertEqual(compact_tombstones(Reservation), 1)
+
+        self.assertEqual(self.read_table("Reservations"), [])
+        self.assertEqual(compact_tombstones(Reservation), 0)
+
+    def test_rollback_discards_the_tombstone(self):
+        with self.assertRaises(ValueError):
+            with Session():
+                Hotel("", "", 0, hotel_id=2).delete()
+                self.assertEqual(
+                    Hotel("", "", 0, hotel_id=2).display_info(), {})
+                raise ValueError("fallo")
+
+        self.assertEqual(
+            Hotel("", "", 0, hotel_id=2).display_info()['id'], 2)
+        self.assertFalse((self.test_dir / "Hotels.tombstones").exists())
+
+    def test_consistency_check_ignores_cancelled(self):
+        Customer("Ana", "ana@email.com", "1").create()
+        Reservation(1, 1).create()
+        Reservation(1, 1).create()
+        Reservation("", "", reservation_id=1).cancel()
+
+        self.assertEqual(hotel_check.count_file(
+            self.test_dir / "Reservations.json"), {1: 1})
+        self.assertEqual(hotel_check.check()['mismatches'], [])
+
+
+class TestCheckpoint(ReservationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        Hotel("A", "Puebla", 5).create()
+        Hotel("B", "Veracruz", 5).create()
+        Customer("Ana", "ana@email.com", "1").create()
+        Reservation(1, 1).create()
+
+    def cold_read(self, table):
+        return hotel_storage.read_document(self.test_dir / f"{table}.json")
+
+    def test_recover_replays_changes_after_the_checkpoint(self):
+        self.assertEqual(hotel_checkpoint.write_checkpoint(self.test_dir),
+                         {'Hotels': 2, 'Customers': 1, 'Reservations': 1})
+        Reservation(1, 2).create()
+        Reservation("", "", reservation_id=1).cancel()
+        Hotel("", "", 0, hotel_id=2).modify_info(nombre="B2")
+        Customer("Luis", "luis@email.com", "2").create()
+        hotel_storage.invalidate()
+
+        recovered = hotel_checkpoint.recover(self.test_dir)
+
+        self.assertEqual(recovered,
+                         {'Hotels': 2, 'Customers': 2, 'Reservations': 1})
+        cache = hotel_storage.CACHE
+        cache.misses = 0
+        for table in ("Hotels", "Customers", "Reservations"):
+            self.assertEqual(self.cold_read(table), self.read_table(table))
+        self.assertEqual(cache.misses, 0)
+
+    def test_table_changed_outside_the_log_is_read_from_json(self):
+        hotel_checkpoint.write_checkpoint(self.test_dir)
+        hotels = self.read_table("Hotels")
+        hotels[0]['nombre'] = "Editado a mano"
+        with open(self.test_dir / "Hotels.json", 'w',
+                  encoding='utf-8') as file:
+            json.dump(hotels, file)
+        hotel_storage.invalidate()
+
+        recovered = hotel_checkpoint.recover(self.test_dir)
+
+        self.assertNotIn('Hotels', recovered)
+        self.assertIn('Customers', recovered)
+        self.assertEqual(self.cold_read("Hotels")[0]['nombre'],
+                         "Editado a mano")
+
+    def test_write_after_the_last_change_is_read_from_json(self):
+        hotel_checkpoint.write_checkpoint(self.test_dir)
+        Customer("Luis", "luis@email.com", "2").create()
+        table = self.test_dir / "Customers.json"
+        customers = self.read_table("Customers")
+        customers[1]['nombre'] = "Sin registrar"
+        with open(table, 'w', encoding='utf-8') as file:
+            json.dump(customers, file)
+        # La fecha del archivo no sirve para compararla con los eventos.
+        os.utime(table, (0, 0))
+        hotel_storage.invalidate()
+
+        recovered = hotel_checkpoint.recover(self.test_dir)
+
+        self.assertNotIn('Customers', recovered)
+        self.assertIn('Hotels', recovered)
+        self.assertEqual(self.cold_read("Customers")[1]['nombre'],
+                         "Sin registrar")
+
+    def test_interleaved_processes_are_replayed(self):
+        # Otro proceso que leyó el registro antes de los últimos cambios.
+        other = hotel_changes.ChangeLog(self.test_dir)
+        other.last_seq()
+        Hotel("C", "Puebla", 5).create()
+        hotel_checkpoint.write_checkpoint(self.test_dir)
+        with mock.patch.object(hotel_changes.FEED, 'log',
+                               return_value=other):
+            Hotel("D", "Puebla", 5).create()
+        hotel_storage.invalidate()
+
+        recovered = hotel_checkpoint.recover(self.test_dir)
+
+        self.assertEqual(recovered['Hotels'], 4)
+        self.assertEqual([h['id'] for h in self.cold_read("Hotels")],
+                         [1, 2, 3, 4])
+
+    def test_without_checkpoint_nothing_is_recovered(self):
+        self.assertEqual(hotel_checkpoint.recover(self.test_dir), {})
+        (self.test_dir / "Checkpoint.marshal").write_bytes(b"no es marshal")
+        self.assertEqual(hotel_checkpoint.recover(self.test_dir), {})
+
+    def test_read_changes_from_offset(self):
+        seq, offset = hotel_changes.FEED.log(self.test_dir).position()
+        Customer("Luis", "luis@email.com", "2").create()
+
+        events = hotel_changes.read_changes(self.test_dir, seq,
+                                            offset=offset)
+
+        self.assertEqual([(e.table, e.op, e.id) for e in events],
+                         [("Customers", "create", 2)])
+
+    def test_server_engine_checkpoint(self):
+        checkpointer = hotel_checkpoint.Checkpointer(
+            hotel_server.BookingEngine().checkpoint)
+
+        checkpointer.stop()
+
+        self.assertEqual(checkpointer.checkpoints, 1)
+        self.assertTrue((self.test_dir / "Checkpoint.marshal").exists())
+
+
+class TestRecordCache(ReservationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for number in range(1, 6):
+            Customer(f"Cliente {number}", f"c{number}@email.com",
+                     "1").create()
+        Customer.record_cache_size = 2
+        self.table = self.test_dir / "Customers.json"
+
+    def info(self, customer_id):
+        return Customer("", "", "", customer_id=customer_id).display_info()
+
+    def cache(self):
+        return hotel_records.cache_stats()[str(self.table)]
+
+    def test_reads_one_record_at_a_time(self):
+        hotel_storage.invalidate()
+        hotel_metrics.reset_stats()
+
+        self.assertEqual(self.info(3)['nombre'], "Cliente 3")
+
+        self.assertEqual(self.info(9), {})
+        self.assertEqual(self.cache()['indexed'], 5)
+        io = hotel_metrics.stats()['Customer.display_info']['io']['total']
+        # El índice recorre el archivo una vez; el registro se lee solo.
+        self.assertLess(io['bytes_read'],
+                        2 * self.table.stat().st_size)
+        self.assertNotIn(self.table, hotel_storage.CACHE._entries)
+
+    def test_lru_evicts_and_counts_hits(self):
+        self.info(1)
+        self.info(2)
+        self.info(1)
+        self.info(3)
+        self.info(2)
+
+        stats = self.cache()
+        self.assertEqual(stats['records'], 2)
+        self.assertEqual((stats['hits'], stats['misses']), (1, 4))
+        self.assertEqual(stats['hit_rate'], 0.2)
+
+    def test_changes_and_deletes_are_seen(self):
+        self.info(2)
+        Customer("", "", "", customer_id=2).modify_info(nombre="Otro")
+        self.assertEqual(self.info(2)['nombre'], "Otro")
+
+        Customer.soft_delete = True
+        Customer("", "", "", customer_id=2).delete()
+        self.assertEqual(self.info(2), {})
+
+    def test_other_formats_are_indexed(self):
+        customers = list(reversed(self.read_table("Customers")))
+        with open(self.table, 'w', encoding='utf-8') as file:
+            json.dump(customers, file)
+
+        self.assertEqual(self.info(4)['email'], "c4@email.com")
+        self.assertEqual(self.info(1)['email'], "c1@email.com")
+
+    def test_reservation_uses_the_cache(self):
+        Hotel.record_cache_size = 10
+        Hotel("Hotel", "Puebla", 5).create()
+
+        self.assertTrue(Reservation(3, 1).create())
+
+        self.assertEqual(self.cache()['misses'], 1)
+        self.assertEqual(
+            self.read_table("Hotels")[0]['habitaciones_disponibles'], 4)
+
+
+class TestIdRange(ReservationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for number in range(1, 7):
+            Customer(f"Cliente {number}", f"c{number}@email.com",
+                     "1").create()
+
+    def ids(self, *args):
+        return [record['id'] for record in scan_range(Customer, *args)]
+
+    def test_range_is_inclusive_and_ordered(self):
+        self.assertEqual(self.ids(2, 4), [2, 3, 4])
+        self.assertEqual(self.ids(5), [5, 6])
+        self.assertEqual(self.ids(None, 1), [1])
+        self.assertEqual(self.ids(7, 9), [])
+        self.assertEqual(id_range(Customer), (1, 6))
+        self.assertEqual(id_range(Hotel), (None, None))
+
+    def test_unordered_file_and_tombstones(self):
+        customers = list(reversed(self.read_table("Customers")))
+        with open(self.test_dir / "Customers.json", 'w',
+                  encoding='utf-8') as file:
+            json.dump(customers, file)
+        Customer.soft_delete = True
+        Customer("", "", "", customer_id=6).delete()
+        Customer("", "", "", customer_id=3).delete()
+
+        self.assertEqual(self.ids(2, 6), [2, 4, 5])
+        self.assertEqual(id_range(Customer), (1, 5))
+
+    def test_shards_are_merged_in_order(self):
+        Hotel.shards = ShardLayout(count=3)
+        for number in range(1, 9):
+            Hotel(f"Hotel {number}", "Puebla", 1).create()
+
+        self.assertEqual(
+            [h['id'] for h in scan_range(Hotel, 3, 7)], [3, 4, 5, 6, 7])
+        self.assertEqual(id_range(Hotel), (1, 8))
+        self.assertEqual([h['id'] for h in Hotel.list(4, 2)['items']],
+                         [5, 6])
+
+    def test_session_and_bounded_reads(self):
+        with Session():
+            Customer("Nuevo", "n@email.com", "1").create()
+            self.assertEqual(self.ids(6), [6, 7])
+        Customer.record_cache_size = 2
+        self.assertEqual(self.ids(3, 5), [3, 4, 5])
+        self.assertEqual(id_range(Customer), (1, 7))
+
+    def test_export_ordered(self):
+        output = self.test_dir / "export.jsonl"
+
+        self.assertEqual(export_ordered(Customer, output, 2, 3), 2)
+
+        lines = output.read_text(encoding='utf-8').splitlines()
+        self.assertEqual([json.loads(line)['nombre'] for line in lines],
+                         ["Cliente 2", "Cliente 3"])
+        cli_main(["export", "customers", str(output),
+                  "--from", "5"])
+        self.assertEqual(len(output.read_text().splitlines()), 2)
+
+
+class TestSchema(ReservationTestCase):
+
+    def write_hotels(self, hotels):
+        (self.test_dir / "Hotels.json").write_text(json.dumps(hotels),
+                                                   encoding='utf-8')
+
+    def test_malformed_records_are_quarantined_at_load(self):
+        Hotel("Hotel", "Puebla", 5).create()
+        Hotel("Malo", "Puebla", 5).create()
+        Customer("Ana", "ana@email.com", "1").create()
+        hotels = self.read_table("Hotels")
+        hotels[1]['habitaciones_disponibles'] = "5"
+        self.write_hotels(hotels)
+        for _ in range(2):
+            hotel_storage.invalidate()
+            self.assertEqual(
+                Hotel("", "", 0, hotel_id=1).display_info()['id'], 1)
+
+        self.assertTrue(Reservation(1, 1).create())
+        self.assertFalse(Reservation(1, 2).create())
+        self.assertTrue(Hotel("Otro", "Puebla", 2).create())
+
+        self.assertIn("Invalid data format in Hotels.json: registro 2: "
+                      "'habitaciones_disponibles' debe ser int, no str",
+                      self.captured_output.getvalue())
+        self.assertEqual([h['id'] for h in self.read_table("Hotels")],
+                         [1, 3])
+        lines = (self.test_dir / "Hotels.quarantine.jsonl").read_text(
+            encoding='utf-8').splitlines()
+        self.assertEqual([json.loads(line) for line in lines],
+                         [{'registro': hotels[1],
+                           'problema': "'habitaciones_disponibles' debe "
+                                       "ser int, no str"}])
+
+    def test_tables_are_validated_once(self):
+        Hotel("Hotel", "Puebla", 5).create()
+        Customer("Ana", "ana@email.com", "1").create()
+        with mock.patch.object(hotel_schema.HOTEL, '_invalid',
+                               wraps=hotel_schema.HOTEL._invalid
+                               ) as invalid:
+            for _ in range(3):
+                self.assertTrue(Reservation(1, 1).create())
+            Hotel("", "", 0, hotel_id=1).display_info()
+
+        self.assertEqual(invalid.call_count, 1)
+
+    def test_invalid_values_are_rejected(self):
+        Hotel("Hotel", "Puebla", 5).create()
+
+        self.assertFalse(Hotel("Otro", "Puebla", "3").create())
+        self.assertFalse(
+            Hotel("", "", 0, hotel_id=1).modify_info(habitaciones=True))
+        self.assertEqual(bulk_update(Hotel, {1: {'nombre': None}}), 0)
+        self.assertEqual(bulk_insert(Customer, [{'nombre': "Ana"}]), [])
+
+        self.assertIn("falta el campo 'email'",
+                      self.captured_output.getvalue())
+        self.assertEqual(len(self.read_table("Hotels")), 1)
+        self.assertEqual(self.read_table("Hotels")[0]['habitaciones'], 5)
+
+    def test_bounded_reads_check_the_record(self):
+        Customer("Ana", "ana@email.com", "1").create()
+        customers = self.read_table("Customers")
+        customers[0]['telefono'] = 1
+        with open(self.test_dir / "Customers.json", 'w',
+                  encoding='utf-8') as file:
+            json.dump(customers, file, indent=2)
+        Customer.record_cache_size = 2
+
+        self.assertEqual(
+            Customer("", "", "", customer_id=1).display_info(), {})
+        self.assertIn("'telefono' debe ser str, no int",
+                      self.captured_output.getvalue())
+
+    def test_optional_fields_and_booleans(self):
+        schema = hotel_schema.RESERVATION
+        schema.validate([{'id': 1, 'customer_id': 1, 'hotel_id': 1},
+                         {'id': 2, 'customer_id': 1, 'hotel_id': 1,
+                          'habitacion': None, 'extra': "x"}])
+
+        with self.assertRaises(hotel_schema.SchemaError) as raised:
+            schema.validate([{'id': 1, 'customer_id': 1, 'hotel_id': 1},
+                             {'id': 2, 'customer_id': True,
+                              'hotel_id': 1}])
+        self.assertEqual(str(raised.exception),
+                         "registro 2: 'customer_id' debe ser int, no bool")
+        self.assertEqual(schema.check([]), "no es un objeto")
+
+
+class TestIdFilter(ReservationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        Hotel("Hotel", "Puebla", 5).create()
+        for number in range(1, 4):
+            Customer(f"Cliente {number}", f"c{number}@email.com",
+                     "1").create()
+        self.table = self.test_dir / "Customers.json"
+
+    def info(self, customer_id):
+        return Customer("", "", "", customer_id=customer_id).display_info()
+
+    def stats(self):
+        return filter_stats()[str(self.table)]
+
+    def test_unknown_ids_are_rejected_without_reading(self):
+        self.assertTrue(Reservation(2, 1).create())
+        hotel_storage.invalidate()
+        hotel_metrics.reset_stats()
+
+        self.assertFalse(Reservation(99, 1).create())
+        self.assertFalse(Reservation(2, 99).create())
+
+        io = hotel_metrics.stats()['Reservation.create']['io']
+        # Sólo se leyó Customers.json para el cliente 2, que sí existe.
+        self.assertEqual(io['total']['bytes_read'],
+                         self.table.stat().st_size)
+        self.assertIn("Cliente con ID 99 no existe",
+                      self.captured_output.getvalue())
+        self.assertEqual(self.stats()['rejected'], 1)
+
+    def test_own_creates_do_not_rebuild(self):
+        self.assertEqual(self.info(1)['nombre'], "Cliente 1")
+        Customer("Nuevo", "n@email.com", "1").create()
+        bulk_insert(Customer, [{'nombre': "Otro", 'email': "o@email.com",
+                                'telefono': "1"}])
+
+        self.assertEqual(self.info(4)['nombre'], "Nuevo")
+        self.assertEqual(self.info(5)['nombre'], "Otro")
+        self.assertEqual(self.stats()['builds'], 1)
+
+    def test_outside_writes_rebuild(self):
+        self.assertEqual(self.info(7), {})
+        customers = self.read_table("Customers")
+        customers.append({'id': 7, 'nombre': "A mano", 'email': "",
+                          'telefono': ""})
+        with open(self.table, 'w', encoding='utf-8') as file:
+            json.dump(customers, file)
+
+        self.assertEqual(self.info(7)['nombre'], "A mano")
+        self.assertEqual(self.stats()['builds'], 2)
+
+    def test_session_creates_are_seen(self):
+        with Session():
+            customer = Customer("Nuevo", "n@email.com", "1")
+            customer.create()
+            self.assertTrue(Reservation(customer.id, 1).create())
+            # Otro hilo construye el filtro leyendo el archivo antes de
+            # que se escriba la sesión.
+            hotel_storage.invalidate()
+            reader = threading.Thread(target=self.info, args=(1,))
+            reader.start()
+            reader.join()
+
+        self.assertEqual(self.stats()['builds'], 1)
+        self.assertEqual(self.info(customer.id)['nombre'], "Nuevo")
+
+    def test_bounded_reads_and_disabled_filter(self):
+        Customer.record_cache_size = 2
+        self.assertEqual(self.info(9), {})
+        self.assertEqual(self.stats()['ids'], 3)
+
+        hotel_bloom.reset()
+        Customer.bloom_error_rate = None
+        self.assertEqual(self.info(9), {})
+        self.assertEqual(filter_stats(), {})
+
+    def test_false_positive_rate(self):
+        bloom = hotel_bloom.BloomFilter(10000, 0.01)
+        bloom.update(range(1, 10001))
+
+        self.assertTrue(all(item in bloom for item in range(1, 10001)))
+        false_positives = sum(item in bloom
+                              for item in range(10001, 110001))
+        self.assertLess(false_positives / 100000, 0.02)
+
+
+class TestBookingServer(ReservationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.server = hotel_server.make_server(port=0)
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       daemon=True)
+        self.thread.start()
+        self.connection = http.client.HTTPConnection(
+            "127.0.0.1", self.server.server_address[1])
+
+    def tearDown(self):
+        self.connection.close()
+        self.server.shutdown()
+        self.server.server_close()
+        super().tearDown()
+
+    def request(self, method, path, body=None, headers=None):
+        payload = json.dumps(body).encode('utf-8') if body else None
+        self.connection.request(method, path, payload,
+                                {'Content-Type': 'application/json',
+                                 **(headers or {})})
+        response = self.connection.getresponse()
+        return response.status, json.loads(response.read())
+
+    def test_booking_flow_over_one_connection(self):
+        status, reply = self.request('POST', '/hotels', {
+            'nombre': 'Hotel', 'estado': 'Puebla', 'habitaciones': 1})
+        self.assertEqual((status, reply['data']), (201, {'id': 1}))
+        self.request('POST', '/customers', {
+            'nombre': 'Ana', 'email': 'ana@email.com', 'telefono': '1'})
+
+        status, reply = self.request('POST', '/reservations',
+                                     {'customer_id': 1, 'hotel_id': 1})
+        self.assertEqual(status, 201)
+        status, reply = self.request('POST', '/reservations',
+                                     {'customer_id': 1, 'hotel_id': 1})
+        self.assertEqual(status, 422)
+        self.assertIn("No hay habitaciones disponibles",
+                      " ".join(reply['mensajes']))
+
+        status, reply = self.request('GET', '/hotels/1')
+        self.assertEqual(reply['data']['habitaciones_disponibles'], 0)
+        self.assertEqual(
+            self.read_table("Hotels")[0]['habitaciones_disponibles'], 0)
+
+        status, _ = self.request('DELETE', '/reservations/1')
+        self.assertEqual(status, 200)
+        self.assertEqual(self.read_table("Reservations"), [])
+
+    def test_idempotent_retry(self):
+        self.request('POST', '/hotels', {
+            'nombre': 'Hotel', 'estado': 'Puebla', 'habitaciones': 2})
+        self.request('POST', '/customers', {
+            'nombre': 'Ana', 'email': 'ana@email.com', 'telefono': '1'})
+
+        replies = [self.request('POST', '/reservations',
+                                {'customer_id': 1, 'hotel_id': 1},
+                                {'Idempotency-Key': 'pedido-1'})
+                   for _ in range(3)]
+        self.assertEqual({(status, reply['data']['id'])
+                          for status, reply in replies}, {(201, 1)})
+        self.assertEqual(len(self.read_table("Reservations")), 1)
+
+    def test_list_pages(self):
+        for number in range(3):
+            self.request('POST', '/hotels', {
+                'nombre': f'H{number}', 'estado': 'Puebla',
+                'habitaciones': 1})
+        status, reply = self.request('GET', '/hotels?limit=2')
+        self.assertEqual(status, 200)
+        self.assertEqual(reply['data']['next_cursor'], 2)
+        status, reply = self.request('GET', '/hotels?cursor=2&limit=2')
+        self.assertEqual([h['id'] for h in reply['data']['items']], [3])
+        self.assertEqual(self.request('GET', '/hotels?limit=x')[0], 400)
+
+    def test_search_by_name(self):
+        self.request('POST', '/customers', {
+            'nombre': 'Ana González', 'email': 'ana@email.com',
+            'telefono': '1'})
+
+        status, reply = self.request('GET', '/customers?q=gonzales')
+
+        self.assertEqual(status, 200)
+        self.assertEqual(reply['data']['items'][0]['id'], 1)
+
+    def test_estado_totals(self):
+        self.request('POST', '/hotels', {
+            'nombre': 'Hotel', 'estado': 'Puebla', 'habitaciones': 2})
+        self.request('POST', '/customers', {
+            'nombre': 'Ana', 'email': 'ana@email.com', 'telefono': '1'})
+        self.request('POST', '/reservations',
+                     {'customer_id': 1, 'hotel_id': 1})
+
+        status, reply = self.request('GET', '/estados')
+
+        self.assertEqual(status, 200)
+        self.assertEqual(reply['data']['estados']['Puebla']['disponibles'],
+                         1)
+
+    def test_empty_results_are_successes(self):
+        status, reply = self.request('GET', '/hotels?q=nada')
+        self.assertEqual((status, reply['data']['items']), (200, []))
+        self.assertEqual(self.request('GET', '/estados')[0], 200)
+
+        self.assertFalse(hotel_server._failed([]))
+        self.assertFalse(hotel_server._failed(0))
+        self.assertTrue(hotel_server._failed(None))
+        self.assertTrue(hotel_server._failed(False))
+        self.assertTrue(hotel_server._failed({}))
+
+    def test_modify_and_errors(self):
+        self.request('POST', '/hotels', {
+            'nombre': 'Hotel', 'estado': 'Puebla', 'habitaciones': 1})
+
+        status, _ = self.request('PATCH', '/hotels/1', {'nombre': 'Nuevo'})
+        self.assertEqual(status, 200)
+        self.assertEqual(self.read_table("Hotels")[0]['nombre'], 'Nuevo')
+        self.assertEqual(self.request('GET', '/hotels/9')[0], 404)
+        self.assertEqual(self.request('GET', '/rooms')[0], 404)
+        self.assertEqual(self.request('POST', '/hotels', {'nombre': 'X'})[0],
+                         400)
+        status, reply = self.request('GET', '/stats')
+        self.assertEqual(reply['data']['Hotel.modify_info']['calls'], 1)
+
+
+class TestReplay(ReservationTestCase):
+
+    OPERATIONS = [
+        {'op': 'create_hotel', 'nombre': 'Hotel', 'estado': 'Puebla',
+         'habitaciones': 2},
+        {'op': 'create_customer', 'nombre': 'Ana', 'email': 'ana@email.com',
+         'telefono': '1'},
+        {'op': 'reserve', 'customer_id': 1, 'hotel_id': 1},
+        {'op': 'reserve', 'customer_id': 1, 'hotel_id': 1},
+        {'op': 'cancel', 'reservation_id': 1},
+        {'op': 'modify_hotel', 'id': 1, 'nombre': 'Nuevo'},
+        {'op': 'modify_customer', 'id': 1, 'email': 'ana@nuevo.com'},
+    ]
+
+    def lines(self):
+        return [json.dumps(operation) for operation in self.OPERATIONS]
+
+    def test_replay_applies_operations(self):
+        summary = hotel_replay.replay(self.lines())
+
+        self.assertEqual(summary['operations'], 7)
+        self.assertEqual(summary['succeeded'], 7)
+        self.assertEqual(summary['flushes'], 1)
+        hotel = self.read_table("Hotels")[0]
+        self.assertEqual((hotel['nombre'], hotel['habitaciones_disponibles']),
+                         ('Nuevo', 1))
+        self.assertEqual(self.read_table("Customers")[0]['email'],
+                         'ana@nuevo.com')
+        self.assertEqual([r['id'] for r in self.read_table("Reservations")],
+                         [2])
+        self.assertEqual(hotel_metrics.stats()['Session.flush']['calls'], 1)
+
+    def test_flush_every(self):
+        summary = hotel_replay.replay(self.lines(), flush_every=3)
+
+        self.assertEqual(summary['flushes'], 3)
+        self.assertEqual(self.read_table("Hotels")[0]['nombre'], 'Nuevo')
+
+    def test_bad_lines_are_reported(self):
+        lines = self.lines()[:1] + [
+            'no es json', '[1]', json.dumps({'op': 'fly'}),
+            json.dumps({'op': 'reserve', 'hotel_id': 1}),
+            json.dumps({'op': 'delete_hotel', 'id': 9}), '']
+        summary = hotel_replay.replay(lines)
+
+        self.assertEqual(summary['operations'], 6)
+        self.assertEqual((summary['succeeded'], summary['failed']), (1, 5))
+        self.assertEqual([line for line, _ in summary['errors']],
+                         [2, 3, 4, 5])
+        self.assertEqual(len(self.read_table("Hotels")), 1)
+
+    def test_failed_write_is_not_reported_as_success(self):
+        with mock.patch('hotel_storage.atomic_write',
+                        side_effect=OSError("disco lleno")):
+            summary = hotel_replay.replay(self.lines(), flush_every=3)
+
+        self.assertEqual((summary['succeeded'], summary['failed']), (0, 3))
+        self.assertEqual(summary['flushes'], 0)
+        self.assertEqual(summary['errors'][0][0], 3)
+        self.assertFalse((self.test_dir / "Hotels.json").exists())
+
+    def test_unordered_table_falls_back_to_scan(self):
+        hotels = [{'id': i, 'nombre': 'H', 'estado': 'Puebla',
+                   'habitaciones': 1, 'habitaciones_disponibles': 1}
+                  for i in (3, 1, 2)]
+        (self.test_dir / "Hotels.json").write_text(json.dumps(hotels),
+                                                   encoding='utf-8')
+        summary = hotel_replay.replay([
+            json.dumps({'op': 'modify_hotel', 'id': 1, 'nombre': 'Uno'}),
+            json.dumps({'op': 'delete_hotel', 'id': 9})])
+
+        self.assertEqual((summary['succeeded'], summary['failed']), (1, 1))
+        self.assertEqual([h['nombre'] for h in self.read_table("Hotels")],
+                         ['H', 'Uno', 'H'])
+
+    def test_command_line(self):
+        source = self.test_dir / "operaciones.jsonl"
+        source.write_text("\n".join(self.lines()), encoding='utf-8')
+
+        self.assertEqual(cli_main(
+            ["replay", str(source), "--flush-every", "2"]), 0)
+        self.assertIn("Operaciones: 7, exitosas: 7",
+                      self.captured_output.getvalue())
+        self.assertEqual(len(self.read_table("Reservations")), 1)
+
+
+class TestLoadGenerator(ReservationTestCase):
+
+    def test_single_worker_keeps_counts_consistent(self):
+        hotel_ids, customer_ids = hotel_load.seed(hotels=2, rooms=3,
+                                                  customers=5)
+        self.assertEqual((hotel_ids, customer_ids), ([1, 2], [1, 2, 3, 4, 5]))
+
+        summary = hotel_load.run_load(hotel_ids, customer_ids, workers=1,
+                                      operations=40, seed_value=7)
+
+        self.assertEqual(summary['operations'], 40)
+        self.assertEqual(summary['created'] + summary['rejected']
+                         + summary['cancelled'] + summary['cancel_failed'],
+                         40)
+        self.assertGreater(summary['rejected'], 0)
+        self.assertLessEqual(summary['latency']['p50'],
+                             summary['latency']['p99'])
+        self.assertEqual(len(self.read_table("Reservations")),
+                         summary['created'] - summary['cancelled'])
+        self.assertEqual(hotel_load.verify(hotel_ids),
+                         {'negative': [], 'overbooked': [], 'drift': []})
+
+    def test_verify_reports_violations(self):
+        hotel_ids, _ = hotel_load.seed(hotels=2, rooms=1, customers=1)
+        hotels = self.read_table("Hotels")
+        hotels[0]['habitaciones_disponibles'] = -1
+        (self.test_dir / "Hotels.json").write_text(json.dumps(hotels),
+                                                   encoding='utf-8')
+        reservations = [{'id': i, 'customer_id': 1, 'hotel_id': 1}
+                        for i in (1, 2)]
+        (self.test_dir / "Reservations.json").write_text(
+            json.dumps(reservations), encoding='utf-8')
+
+        report = hotel_load.verify(hotel_ids)
+
+        self.assertEqual([e['hotel_id'] for e in report['negative']], [1])
+        self.assertEqual([e['hotel_id'] for e in report['overbooked']], [1])
+        self.assertEqual(report['drift'], [])
+
+    def test_histogram_merge(self):
+        first, second = hotel_metrics.Histogram(), hotel_metrics.Histogram()
+        first.observe(0.001)
+        second.observe(0.2)
+        first.merge(second)
+        self.assertEqual((first.count, first.maximum), (2, 0.2))
+        with self.assertRaises(ValueError):
+            first.merge(hotel_metrics.Histogram(buckets=(1.0,)))
+
+
+class TestAvailabilityCounters(ReservationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        Hotel("Hotel", "Puebla", 2).create()
+        Customer("Ana", "ana@email.com", "1").create()
+        self.counters = hotel_availability.AvailabilityCounters.create()
+        Hotel.availability = self.counters
+
+    def tearDown(self):
+        Hotel.availability = None
+        self.counters.close()
+        self.counters.unlink()
+        super().tearDown()
+
+    def test_display_info_applies_counters_to_a_copy(self):
+        Hotel("", "", 0, hotel_id=1).reserve_room(1)
+
+        info = Hotel("", "", 0, hotel_id=1).display_info()
+
+        self.assertEqual(info['habitaciones_disponibles'], 1)
+        path = self.test_dir / "Hotels.json"
+        self.assertEqual(
+            hotel_storage.read_shared(path)[0]['habitaciones_disponibles'],
+            2)
+
+    def test_reserve_uses_counters_until_persist(self):
+        self.assertTrue(Reservation(1, 1).create())
+        self.assertEqual(
+            self.read_table("Hotels")[0]['habitaciones_disponibles'], 2)
+        hotel = Hotel("", "", 0, hotel_id=1)
+        self.assertEqual(hotel.display_info()['habitaciones_disponibles'], 1)
+
+        self.assertEqual(self.counters.persist(), 1)
+        self.assertEqual(
+            self.read_table("Hotels")[0]['habitaciones_disponibles'], 1)
+        self.assertEqual(self.counters.persist(), 0)
+
+    def test_failed_persist_is_retried(self):
+        self.assertTrue(Reservation(1, 1).create())
+
+        with mock.patch('hotel_storage.atomic_write',
+                        side_effect=OSError("disco lleno")):
+            self.assertEqual(self.counters.persist(), 0)
+
+        self.assertEqual(self.counters.persist(), 1)
+        self.assertEqual(
+            self.read_table("Hotels")[0]['habitaciones_disponibles'], 1)
+
+    def test_limits(self):
+        hotel = Hotel("", "", 0, hotel_id=1)
+        self.assertFalse(hotel.cancel_reservation(1))
+        self.assertTrue(hotel.reserve_room(1))
+        self.assertTrue(hotel.reserve_room(1))
+        self.assertFalse(hotel.reserve_room(1))
+        self.assertEqual(self.counters.get(1), (0, 2))
+        self.assertTrue(hotel.cancel_reservation(1))
+        self.assertEqual(hotel.habitaciones_disponibles, 1)
+
+    def test_hotel_changes_update_counters(self):
+        Hotel("", "", 0, hotel_id=1).reserve_room(1)
+        self.assertTrue(Hotel("", "", 0, hotel_id=1).modify_info(
+            habitaciones=5))
+        self.assertEqual(self.counters.get(1), (4, 5))
+        self.assertEqual(
+            self.read_table("Hotels")[0]['habitaciones_disponibles'], 4)
+
+        hotel = Hotel("Nuevo", "Jalisco", 3)
+        hotel.create()
+        self.assertEqual(self.counters.get(hotel.id), (3, 3))
+        hotel.delete()
+        self.assertIsNone(self.counters.get(hotel.id))
+        self.assertIsNone(self.counters.reserve(hotel.id))
+        self.assertIsNone(self.counters.get(10 ** 9))
+
+    def test_estado_totals_follow_counters(self):
+        self.assertEqual(Hotel.estado_totals("Puebla")['disponibles'], 2)
+
+        self.assertTrue(Reservation(1, 1).create())
+
+        self.assertEqual(Hotel.estado_totals("Puebla"),
+                         {'hoteles': 1, 'habitaciones': 2,
+                          'disponibles': 1})
+
+    def test_rebuild_does_not_touch_cached_records(self):
+        self.assertTrue(Reservation(1, 1).create())
+
+        self.assertTrue(Hotel.rebuild_aggregates())
+
+        self.assertEqual(Hotel.estado_totals("Puebla")['disponibles'], 1)
+        cached = hotel_storage.read_shared(self.test_dir / "Hotels.json")
+        self.assertEqual(cached[0]['habitaciones_disponibles'], 2)
+
+    def test_asynchronous_persist(self):
+        self.counters.start(interval=0.01)
+        Hotel("", "", 0, hotel_id=1).reserve_room(1)
+        deadline = time.monotonic() + 5
+        while (self.read_table("Hotels")[0]['habitaciones_disponibles'] != 1
+               and time.monotonic() < deadline):
+            time.sleep(0.01)
+        self.assertEqual(
+            self.read_table("Hotels")[0]['habitaciones_disponibles'], 1)
+        self.counters.stop()
+
+    def test_processes_share_counters(self):
+        summary = hotel_load.run_load([1], [1], workers=2, operations=10,
+                                      cancel_ratio=0.0,
+                                      counters=self.counters)
+
+        self.assertEqual(summary['created'], 2)
+        self.assertEqual(summary['rejected'], 18)
+        self.assertEqual(self.counters.get(1), (0, 2))
+
+
+class TestRoomInventory(ReservationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        Hotel("Hotel", "Puebla", 3).create()
+        Customer("Ana", "ana@email.com", "1").create()
+
+    def test_reservations_get_rooms(self):
+        first, second = Reservation(1, 1), Reservation(1, 1)
+        first.create()
+        second.create()
+        self.assertEqual((first.habitacion, second.habitacion), (1, 2))
+        self.assertEqual([r['habitacion']
+                          for r in self.read_table("Reservations")], [1, 2])
+
+        first.cancel()
+        third = Reservation(1, 1)
+        third.create()
+        self.assertEqual(third.habitacion, 1)
+        hotel = self.read_table("Hotels")[0]
+        self.assertEqual(hotel_rooms.free_rooms(hotel), [3])
+        self.assertEqual(hotel['habitaciones_disponibles'], 1)
+
+    def test_records_without_inventory(self):
+        hotels = self.read_table("Hotels")
+        hotels[0]['habitaciones_disponibles'] = 1
+        (self.test_dir / "Hotels.json").write_text(json.dumps(hotels),
+                                                   encoding='utf-8')
+        hotel = Hotel("", "", 0, hotel_id=1)
+
+        self.assertEqual(hotel.reserve_room(1), 3)
+        self.assertFalse(hotel.reserve_room(1))
+        self.assertTrue(hotel.cancel_reservation(1))
+        self.assertEqual(hotel.reserve_room(1), 2)
+
+    def test_resize_keeps_occupied_rooms(self):
+        hotel = Hotel("", "", 0, hotel_id=1)
+        for _ in range(3):
+            hotel.reserve_room(1)
+        hotel.cancel_reservation(1, 1)
+        hotel.cancel_reservation(1, 2)
+
+        self.assertTrue(hotel.modify_info(habitaciones=1))
+        record = self.read_table("Hotels")[0]
+        self.assertEqual(record['inventario']['fuera'], [3])
+        self.assertEqual(record['habitaciones_disponibles'], 0)
+
+        hotel.modify_info(habitaciones=5)
+        assigned = [hotel.reserve_room(1) for _ in range(4)]
+        self.assertEqual(sorted(assigned), [1, 2, 4, 5])
+        self.assertFalse(hotel.reserve_room(1))
+        self.assertTrue(hotel.cancel_reservation(1, 3))
+        self.assertEqual(hotel.reserve_room(1), 3)
+
+    def test_rebuild_from_reservations(self):
+        record = {'habitaciones': 5, 'habitaciones_disponibles': 1}
+
+        hotel_rooms.rebuild_inventory(record, [None, 4, 7, 2])
+
+        self.assertEqual(hotel_rooms.free_rooms(record), [3, 5])
+        self.assertEqual(record['inventario']['fuera'], [7])
+        self.assertEqual(hotel_rooms.allocate_room(record), 3)
+        hotel_rooms.release_room(record)
+        self.assertEqual(hotel_rooms.free_rooms(record), [1, 5])
+
+    def test_shrink_then_release_above_limit(self):
+        record = {'habitaciones': 4, 'habitaciones_disponibles': 4}
+        rooms = [hotel_rooms.allocate_room(record) for _ in range(4)]
+        self.assertEqual(rooms, [1, 2, 3, 4])
+        hotel_rooms.release_room(record, 2)
+        hotel_rooms.resize_rooms(record, 2)
+        record['habitaciones'] = 2
+        self.assertEqual(record['inventario']['fuera'], [3, 4])
+
+        hotel_rooms.release_room(record, 4)
+        hotel_rooms.resize_rooms(record, 6)
+        record['habitaciones'] = 6
+        self.assertEqual(hotel_rooms.free_rooms(record), [2, 4, 5, 6])
+
+
+class TestRoomHolds(ReservationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.now = 1000.0
+        Hotel.holds = hotel_holds.HoldRegistry(clock=lambda: self.now)
+        Hotel("Hotel", "Puebla", 2).create()
+        Customer("Ana", "ana@email.com", "1").create()
+        self.hotel = Hotel("", "", 0, hotel_id=1)
+
+    def available(self):
+        return self.read_table("Hotels")[0]['habitaciones_disponibles']
+
+    def test_confirm_converts_hold(self):
+        hold_id = self.hotel.hold_room(1, ttl=60)
+        self.assertTrue(hold_id)
+        self.assertEqual(self.available(), 1)
+
+        reservation_id = self.hotel.confirm_hold(hold_id)
+        self.assertEqual(reservation_id, 1)
+        self.assertEqual(self.read_table("Reservations"),
+                         [{'id': 1, 'customer_id': 1, 'hotel_id': 1,
+                           'habitacion': 1}])
+        self.assertEqual(self.available(), 1)
+        self.assertFalse(self.hotel.confirm_hold(hold_id))
+        self.assertEqual(len(Hotel.holds), 0)
+
+    def test_rolled_back_hold_is_discarded(self):
+        with self.assertRaises(ValueError):
+            with Session():
+                self.assertTrue(self.hotel.hold_room(1, ttl=60))
+                raise ValueError("fallo")
+        self.assertEqual(len(Hotel.holds), 0)
+        self.assertTrue(Reservation(1, 1).create())
+
+        self.now += 61
+        self.assertEqual(Hotel.expire_holds(), 0)
+        self.assertEqual(self.available(), 1)
+
+    def test_expired_holds_release_rooms(self):
+        first = self.hotel.hold_room(1, ttl=60)
+        self.hotel.hold_room(1, ttl=600)
+        self.assertFalse(self.hotel.hold_room(1))
+
+        self.now += 61
+        self.assertFalse(self.hotel.confirm_hold(first))
+        self.assertEqual(self.available(), 1)
+        self.assertEqual(len(Hotel.holds), 1)
+        self.assertTrue(self.hotel.hold_room(1))
+
+        self.now += 1000
+        self.assertEqual(Hotel.expire_holds(), 2)
+        self.assertEqual(self.available(), 2)
+
+    def test_unknown_customer_cannot_hold(self):
+        self.assertFalse(self.hotel.hold_room(99))
+        self.assertEqual(self.available(), 2)
+        self.assertEqual(len(Hotel.holds), 0)
+
+    def test_release_hold(self):
+        hold_id = self.hotel.hold_room(1)
+        self.assertFalse(Hotel("", "", 0, hotel_id=2).release_hold(hold_id))
+        self.assertTrue(self.hotel.release_hold(hold_id))
+        self.assertEqual(self.available(), 2)
+        self.assertFalse(self.hotel.release_hold(hold_id))
+
+    def test_timing_wheel(self):
+        wheel = hotel_holds.TimingWheel(tick=1.0, size=8, start=0.0)
+        for key in range(1000):
+            wheel.schedule(key, 5.0 + key % 3)
+        wheel.schedule('far', 100.0)
+        wheel.schedule('gone', 5.0)
+        self.assertTrue(wheel.cancel('gone'))
+
+        self.assertEqual(wheel.advance(4.9), [])
+        self.assertEqual(len(wheel.advance(5.0)), 334)
+        self.assertEqual(len(wheel.advance(7.5)), 666)
+        self.assertEqual(wheel.advance(99.0), [])
+        self.assertEqual(wheel.advance(1000.0), ['far'])
+        self.assertEqual(len(wheel), 0)
+
+
+class TestIdempotency(ReservationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        Hotel("Hotel", "Puebla", 5).create()
+        Customer("Ana", "ana@email.com", "1").create()
+        Customer("Luis", "luis@email.com", "2").create()
+
+    def available(self):
+        return self.read_table("Hotels")[0]['habitaciones_disponibles']
+
+    def test_retry_returns_first_result(self):
+        first, retry = Reservation(1, 1), Reservation(1, 1)
+        self.assertTrue(first.create(idempotency_key="pedido-1"))
+        self.assertTrue(retry.create(idempotency_key="pedido-1"))
+
+        self.assertEqual((retry.id, retry.habitacion), (first.id, 1))
+        self.assertEqual(len(self.read_table("Reservations")), 1)
+        self.assertEqual(self.available(), 4)
+        self.assertEqual(
+            hotel_metrics.stats()['Hotel.reserve_room']['calls'], 1)
+
+        self.assertFalse(Reservation(2, 1).create(idempotency_key="pedido-1"))
+        self.assertTrue(Reservation(1, 1).create(idempotency_key="pedido-2"))
+        self.assertEqual(self.available(), 3)
+
+    def test_keys_survive_restart(self):
+        Reservation(1, 1).create(idempotency_key="pedido-1")
+        Reservation._idempotency = None
+
+        retry = Reservation(1, 1)
+        self.assertTrue(retry.create(idempotency_key="pedido-1"))
+        self.assertEqual(retry.id, 1)
+        self.assertEqual(len(self.read_table("Reservations")), 1)
+
+    def test_rolled_back_session_forgets_key(self):
+        with self.assertRaises(RuntimeError):
+            with Session():
+                Reservation(1, 1).create(idempotency_key="pedido-1")
+                raise RuntimeError("falla")
+        self.assertFalse((self.test_dir / "Idempotency.jsonl").exists())
+
+        with Session():
+            Reservation(1, 1).create(idempotency_key="pedido-1")
+            Reservation(1, 1).create(idempotency_key="pedido-1")
+        self.assertEqual(len(self.read_table("Reservations")), 1)
+        self.assertTrue((self.test_dir / "Idempotency.jsonl").exists())
+
+    def test_failed_write_forgets_key(self):
+        with mock.patch('hotel_storage.atomic_write',
+                        side_effect=OSError("disco lleno")):
+            with self.assertRaises(OSError):
+                with Session():
+                    Reservation(1, 1).create(idempotency_key="pedido-1")
+        self.captured_output.seek(0)
+        self.captured_output.truncate(0)
+
+        self.assertTrue(Reservation(1, 1).create(idempotency_key="pedido-1"))
+
+        output = self.captured_output.getvalue()
+        self.assertIn("Reservación creada", output)
+        self.assertNotIn("ya creada", output)
+        self.assertEqual(len(self.read_table("Reservations")), 1)
+
+    def test_failed_key_write_keeps_the_reservation(self):
+        with mock.patch.object(hotel_idempotency.IdempotencyCache,
+                               'persist',
+                               side_effect=OSError("disco lleno")):
+            self.assertTrue(
+                Reservation(1, 1).create(idempotency_key="pedido-1"))
+        self.assertIn("sólo se recordará", self.captured_output.getvalue())
+
+        retry = Reservation(1, 1)
+        self.assertTrue(retry.create(idempotency_key="pedido-1"))
+        self.assertEqual(retry.id, 1)
+        self.assertEqual(len(self.read_table("Reservations")), 1)
+        self.assertEqual(self.available(), 4)
+
+    def test_key_in_flight_is_rejected(self):
+        cache = Reservation._idempotency_cache()
+        self.assertTrue(cache.claim("pedido-1"))
+        self.assertFalse(cache.claim("pedido-1"))
+
+        self.assertFalse(Reservation(1, 1).create(idempotency_key="pedido-1"))
+        self.assertIn("en curso", self.captured_output.getvalue())
+        self.assertEqual(self.available(), 5)
+
+        cache.release("pedido-1")
+        self.assertTrue(Reservation(1, 1).create(idempotency_key="pedido-1"))
+        self.assertFalse(cache.claim("pedido-1"))
+        self.assertEqual(self.available(), 4)
+
+    def test_cache_is_bounded(self):
+        path = self.test_dir / "keys.jsonl"
+        cache = hotel_idempotency.IdempotencyCache(path, capacity=2)
+        for number in range(5):
+            cache.remember(f"k{number}", {'id': number})
+            cache.persist(f"k{number}", {'id': number})
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("k0"))
+        self.assertEqual(cache.get("k4"), {'id': 4})
+        lines = path.read_text(encoding='utf-8').splitlines()
+        self.assertLessEqual(len(lines), 4)
+
+        reloaded = hotel_idempotency.IdempotencyCache(path, capacity=2)
+        self.assertEqual(reloaded.get("k3"), {'id': 3})
+        self.assertIsNone(reloaded.get("k1"))
+
+
+class TestPagination(ReservationTestCase):
+
+    def test_pages_follow_cursor(self):
+        bulk_insert(Hotel, [{'nombre': f"H{n}", 'estado': 'Puebla',
+                             'habitaciones': 1,
+                             'habitaciones_disponibles': 1}
+                            for n in range(25)])
+        ids, cursor, pages = [], None, 0
+        while True:
+            page = Hotel.list(cursor=cursor, limit=10)
+            ids.extend(record['id'] for record in page['items'])
+            pages += 1
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(ids, list(range(1, 26)))
+        self.assertEqual(pages, 3)
+        self.assertEqual(Hotel.list(cursor=25), {'items': [],
+                                                 'next_cursor': None})
+        self.assertEqual(Reservation.list(), {'items': [],
+                                              'next_cursor': None})
+        with self.assertRaises(ValueError):
+            Customer.list(limit=0)
+
+    def test_deep_page_reads_only_its_records(self):
+        bulk_insert(Customer, [{'nombre': f"C{n}", 'email': 'c@e.com',
+                                'telefono': '1'} for n in range(5000)])
+        self.assertEqual(Customer.list(limit=5)['next_cursor'], 5)
+        hotel_metrics.reset_stats()
+
+        page = Customer.list(cursor=4900, limit=5)
+
+        self.assertEqual([r['id'] for r in page['items']],
+                         [4901, 4902, 4903, 4904, 4905])
+        self.assertEqual(page['next_cursor'], 4905)
+        io = hotel_metrics.stats()['Customer.list']['io']['total']
+        self.assertLess(io['bytes_read'], 1000)
+
+    def test_records_without_integer_id_are_skipped(self):
+        with open(self.test_dir / "Hotels.json", 'w',
+                  encoding='utf-8') as file:
+            json.dump([{'id': "x"}, {'id': 2, 'nombre': "B"}], file)
+
+        page = Hotel.list()
+
+        self.assertEqual([r['id'] for r in page['items']], [2])
+
+    def test_session_and_shards(self):
+        with Session():
+            for number in range(3):
+                Hotel(f"H{number}", "Puebla", 1).create()
+            page = Hotel.list(cursor=1, limit=1)
+            self.assertEqual([r['id'] for r in page['items']], [2])
+            self.assertEqual(page['next_cursor'], 2)
+
+        shard_table(Hotel, ShardLayout(2))
+        page = Hotel.list(limit=2)
+        self.assertEqual([r['id'] for r in page['items']], [1, 2])
+        self.assertEqual(Hotel.list(cursor=2)['items'][0]['id'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)